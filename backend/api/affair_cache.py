@@ -0,0 +1,105 @@
+"""
+Cache des affaires par (application, client) pour search_affairs
+
+Le sélecteur d'affaires de TaskModal relance la recherche à chaque frappe
+pour le même client. La liste des affaires du client est chargée une fois
+(index compte_id), puis filtrée et classée en mémoire. Elle est invalidée par
+une sonde agrégée (COUNT / MAX(id) / MAX(dateModification)) sur le même
+index, exécutée au plus toutes les PROBE_INTERVAL secondes.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from django.db.models import Count, Max
+
+from .client_index import normalize
+from .myclic_model import Affaire
+from .ttl_cache import TTLCache
+
+PROBE_INTERVAL = 15
+
+FIELDS = ('id', 'nom', 'descriptif', 'statut')
+
+
+class _AffairList:
+    """Affaires d'un client, avec la signature de la dernière sonde"""
+
+    def __init__(self, signature, affairs: List[Dict[str, Any]]):
+        self.signature = signature
+        self.affairs = affairs
+        self.names = [normalize(affair['nom']) for affair in affairs]
+        self.checked_at = time.monotonic()
+        self.lock = threading.Lock()
+
+
+_lists = TTLCache(ttl=3600, maxsize=5000)
+
+
+def _queryset(application_id: Optional[int], compte_id: int):
+    return Affaire.objects.filter(compte_id=compte_id, application_id=application_id)
+
+
+def _probe(application_id: Optional[int], compte_id: int):
+    probe = _queryset(application_id, compte_id).aggregate(
+        count=Count('id'), max_id=Max('id'), max_modified=Max('date_modification')
+    )
+    return probe['count'], probe['max_id'], probe['max_modified']
+
+
+def _load(application_id: Optional[int], compte_id: int) -> _AffairList:
+    signature = _probe(application_id, compte_id)
+    affairs = list(_queryset(application_id, compte_id).values(*FIELDS))
+    return _AffairList(signature, affairs)
+
+
+def _get_list(application_id: Optional[int], compte_id: int) -> _AffairList:
+    key = (application_id, compte_id)
+    entry = _lists.get_or_set(key, lambda: _load(application_id, compte_id))
+
+    if time.monotonic() - entry.checked_at < PROBE_INTERVAL:
+        return entry
+
+    # Un seul thread sonde la base, les autres servent la liste courante
+    if not entry.lock.acquire(blocking=False):
+        return entry
+    try:
+        if _probe(application_id, compte_id) == entry.signature:
+            entry.checked_at = time.monotonic()
+            return entry
+        fresh = _load(application_id, compte_id)
+        _lists.set(key, fresh)
+        return fresh
+    finally:
+        entry.lock.release()
+
+
+def search_affairs(application_id: Optional[int], compte_id: int, query: str = '',
+                   limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Recherche les affaires d'un client, servie depuis la mémoire après le premier appel
+
+    Classement : nom commençant par la requête, puis mot du nom commençant par
+    la requête, puis simple inclusion (équivalent de nom__icontains).
+    """
+    entry = _get_list(application_id, compte_id)
+    normalized_query = normalize(query)
+
+    if not normalized_query:
+        return [dict(affair) for affair in entry.affairs[:limit]]
+
+    ranked = []
+    for affair, name in zip(entry.affairs, entry.names):
+        position = name.find(normalized_query)
+        if position < 0:
+            continue
+        if position == 0:
+            rank = 0
+        elif not name[position - 1].isalnum():
+            rank = 1
+        else:
+            rank = 2
+        ranked.append((rank, name, affair))
+
+    ranked.sort(key=lambda item: (item[0], item[1]))
+    return [dict(affair) for _, _, affair in ranked[:limit]]
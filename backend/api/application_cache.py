@@ -0,0 +1,33 @@
+"""
+Cache des applications MyClic renvoyées au login
+
+Application est un modèle legacy très large : seules les colonnes exposées
+au frontend sont chargées, puis gardées par worker pendant APPLICATION_TTL
+secondes. Au pic de connexions du matin, les employés d'une même
+application partagent ainsi une seule requête MySQL.
+"""
+from typing import Any, Dict, Optional
+
+from .myclic_model import Application
+from .ttl_cache import TTLCache
+
+APPLICATION_TTL = 900
+
+APPLICATION_FIELDS = ('id', 'entreprise', 'adresse', 'telephone', 'mail_resp')
+
+_applications = TTLCache(ttl=APPLICATION_TTL, maxsize=2000)
+
+
+def get_application(application_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Retourne les colonnes exposées d'une application, ou None si inconnue"""
+    if application_id is None:
+        return None
+    return _applications.get_or_set(
+        application_id,
+        lambda: Application.objects.filter(id=application_id).values(*APPLICATION_FIELDS).first()
+    )
+
+
+def invalidate_application(application_id: int):
+    """Invalide l'entrée en cache d'une application"""
+    _applications.delete(application_id)
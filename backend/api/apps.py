@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .authentication import invalidate_user_on_change
+        from .models import User
+
+        # Invalider le cache d'authentification quand un utilisateur est modifié
+        post_save.connect(invalidate_user_on_change, sender=User, dispatch_uid='api.invalidate_user_cache')
+        post_delete.connect(invalidate_user_on_change, sender=User, dispatch_uid='api.invalidate_user_cache_delete')
@@ -0,0 +1,52 @@
+"""
+Authentification JWT avec cache des utilisateurs par worker
+
+JWTAuthentication charge la ligne User depuis PostgreSQL à chaque requête.
+Ici l'utilisateur résolu est gardé quelques secondes dans un cache mémoire,
+indexé par (id utilisateur, date d'émission du jeton) : un nouveau jeton
+donne une nouvelle entrée. Toute sauvegarde ou suppression d'un User
+(configure, UserUpdateApplicationIdView, admin...) invalide ses entrées dans
+le worker courant ; les autres workers se resynchronisent au plus tard après
+USER_CACHE_TTL secondes. Une révocation (is_active=False) ou un changement
+d'application faits dans un autre worker n'y prennent donc effet qu'après
+ce délai (60 s au plus).
+
+Chaque requête reçoit sa propre copie de l'utilisateur en cache : une vue
+qui modifie request.user avant de l'enregistrer n'expose pas l'objet à
+moitié modifié aux requêtes concurrentes.
+"""
+import copy
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .ttl_cache import TTLCache
+
+USER_CACHE_TTL = 60
+
+_users = TTLCache(ttl=USER_CACHE_TTL, maxsize=10000)
+
+
+def invalidate_user(user_id):
+    """Invalide les entrées en cache d'un utilisateur"""
+    user_id = str(user_id)
+    _users.delete_matching(lambda key: key[0] == user_id)
+
+
+def invalidate_user_on_change(sender, instance, **kwargs):
+    """Signal post_save / post_delete du modèle User"""
+    invalidate_user(instance.pk)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication servant l'utilisateur depuis un cache mémoire à courte durée de vie"""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = (str(user_id), validated_token.get('iat'))
+        user = _users.get_or_set(key, lambda: super(CachedJWTAuthentication, self).get_user(validated_token))
+        # L'instance en cache n'est jamais remise aux vues
+        return copy.copy(user)
@@ -0,0 +1,306 @@
+"""
+Synchronisation en masse entre la base MySQL Baïkal et la table User
+
+Les tables users / principals / calendarinstances de Baïkal sont chargées en
+quelques requêtes, comparées à la table User par opérations d'ensembles sur
+les colonnes clés (email, user_id), puis les écarts sont appliqués par
+bulk_create / bulk_update en lots. La réconciliation des calendriers est
+exécutée par application (tenant), en parallèle.
+"""
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db.models import Count
+
+from .baikal_models import (
+    BaikalUser, BaikalPrincipal, BaikalCalendarInstance, BaikalCalendarObject, binary_to_str,
+)
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_PREFIX = 'principals/'
+
+
+def _email_from_principaluri(uri) -> str:
+    uri = binary_to_str(uri)
+    return uri[len(PRINCIPAL_PREFIX):] if uri.startswith(PRINCIPAL_PREFIX) else uri
+
+
+def _split_displayname(displayname: str):
+    """'Prénom Nom' -> ('Prénom', 'Nom')"""
+    parts = (displayname or '').strip().split(' ', 1)
+    return parts[0], parts[1] if len(parts) > 1 else ''
+
+
+class BaikalDBService:
+    """Moteur de synchronisation en masse Baïkal <-> User"""
+
+    def __init__(self, batch_size: int = 500, workers: int = 4, application_id: Optional[int] = None):
+        """
+        Args:
+            batch_size: Taille des lots bulk_create / bulk_update
+            workers: Nombre de tenants synchronisés en parallèle
+            application_id: Restreindre la synchronisation à une application
+                (et l'affecter aux utilisateurs créés)
+        """
+        self.batch_size = batch_size
+        self.workers = workers
+        self.application_id = application_id
+
+    @contextmanager
+    def _timed(self, timings: Dict[str, float], name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = round(time.perf_counter() - started, 3)
+
+    # -------------------------
+    # Utilisateurs
+    # -------------------------
+    def _tenant_user_ids(self) -> Optional[Set[int]]:
+        """user_id MyClic des User de self.application_id, None sans application"""
+        if self.application_id is None:
+            return None
+        return set(
+            User.objects.filter(application_id=self.application_id, user_id__isnull=False)
+            .values_list('user_id', flat=True)
+        )
+
+    def _load_baikal_accounts(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Comptes Baïkal (users + principals) indexés par email
+
+        Avec une application, seuls les comptes dont le principal porte le
+        user_id d'un User de cette application sont retenus : Baïkal est
+        partagé entre tenants et ne connaît pas l'application d'un compte.
+        """
+        usernames = {
+            binary_to_str(username)
+            for username in BaikalUser.objects.values_list('username', flat=True)
+        }
+        tenant_user_ids = self._tenant_user_ids()
+
+        accounts = {}
+        for uri, email, displayname, user_id in BaikalPrincipal.objects.values_list(
+            'uri', 'email', 'displayname', 'user_id'
+        ):
+            uri_email = _email_from_principaluri(uri)
+            # Ignorer les sous-principals (calendar-proxy-read, ...)
+            if '/' in uri_email:
+                continue
+            if tenant_user_ids is not None and user_id not in tenant_user_ids:
+                continue  # Compte d'un autre tenant (ou tenant inconnu)
+            key = email or uri_email
+            if key in usernames:
+                accounts[key] = {'displayname': displayname or '', 'user_id': user_id}
+
+        if tenant_user_ids is None:
+            # Comptes sans principal : seulement l'identifiant de connexion (tenant inconnu)
+            for username in usernames - accounts.keys():
+                accounts[username] = {'displayname': '', 'user_id': None}
+        return accounts
+
+    def _count_users(self, emails: List[str]) -> int:
+        """Nombre de User existants parmi emails (requêtes par lots de batch_size)"""
+        return sum(
+            User.objects.filter(email__in=emails[i:i + self.batch_size]).count()
+            for i in range(0, len(emails), self.batch_size)
+        )
+
+    def sync_users_from_baikal(self) -> Dict[str, Any]:
+        """
+        Crée / met à jour les User à partir des comptes Baïkal
+
+        Avec une application, seuls ses comptes sont créés (avec son
+        application_id) ou mis à jour ; l'application_id des User existants
+        n'est jamais modifié. Sans application (application_id None), tous
+        les comptes sont lus et les User créés ne sont rattachés à aucun
+        tenant.
+
+        Returns:
+            {'users_created', 'users_updated', 'errors', 'timings'}
+        """
+        stats = {'users_created': 0, 'users_updated': 0, 'errors': [], 'timings': {}}
+        timings = stats['timings']
+
+        try:
+            with self._timed(timings, 'load'):
+                accounts = self._load_baikal_accounts()
+                existing = {
+                    user.email: user
+                    for user in User.objects.only('id', 'email', 'username', 'user_id', 'prenom', 'nom', 'application_id')
+                }
+
+            baikal_emails = set(accounts)
+            local_emails = set(existing)
+
+            with self._timed(timings, 'create'):
+                to_create = []
+                unusable_password = make_password(None)
+                for email in sorted(baikal_emails - local_emails):
+                    prenom, nom = _split_displayname(accounts[email]['displayname'])
+                    to_create.append(User(
+                        email=email,
+                        username=email,
+                        password=unusable_password,
+                        prenom=prenom,
+                        nom=nom,
+                        user_id=accounts[email]['user_id'],
+                        application_id=self.application_id,
+                    ))
+                # ignore_conflicts : les lignes en conflit (créées entre-temps) ne sont pas signalées,
+                # les créations réelles sont comptées avant / après
+                emails = [user.email for user in to_create]
+                before = self._count_users(emails)
+                User.objects.bulk_create(to_create, batch_size=self.batch_size, ignore_conflicts=True)
+                stats['users_created'] = self._count_users(emails) - before
+
+            with self._timed(timings, 'update'):
+                to_update = []
+                for email in baikal_emails & local_emails:
+                    user = existing[email]
+                    if self.application_id is not None and user.application_id != self.application_id:
+                        continue  # User d'un autre tenant, ou tenant inconnu : non modifié
+                    user_id = accounts[email]['user_id']
+                    if user_id is not None and user.user_id != user_id:
+                        user.user_id = user_id
+                        to_update.append(user)
+                User.objects.bulk_update(to_update, ['user_id'], batch_size=self.batch_size)
+                stats['users_updated'] = len(to_update)
+
+        except Exception as e:
+            logger.error(f"Erreur synchronisation utilisateurs Baïkal: {e}", exc_info=True)
+            stats['errors'].append(str(e))
+
+        logger.info(
+            f"Synchronisation utilisateurs: {stats['users_created']} créés, "
+            f"{stats['users_updated']} mis à jour ({timings})"
+        )
+        return stats
+
+    # -------------------------
+    # Calendriers (par tenant)
+    # -------------------------
+    def _sync_tenant(self, application_id: Optional[int], users: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Réconcilie principals / calendarinstances d'une application avec ses User
+
+        - signale les User sans principal ou sans calendrier Baïkal
+        - reporte User.user_id sur principals.user_id et calendarinstances.user_id
+        - compte les événements des calendriers de l'application
+        """
+        stats = {'application_id': application_id, 'users_synced': 0, 'total_events': 0,
+                 'principals_updated': 0, 'instances_updated': 0, 'errors': []}
+        started = time.perf_counter()
+
+        try:
+            user_ids_by_email = {user['email']: user['user_id'] for user in users}
+            uris = [f"{PRINCIPAL_PREFIX}{email}".encode('utf-8') for email in user_ids_by_email]
+
+            principals = list(BaikalPrincipal.objects.filter(uri__in=uris).only('id', 'uri', 'user_id'))
+            instances = list(BaikalCalendarInstance.objects.filter(
+                principaluri__in=uris
+            ).only('id', 'calendarid', 'principaluri', 'user_id'))
+
+            principal_emails = {_email_from_principaluri(p.uri) for p in principals}
+            instance_emails = {_email_from_principaluri(i.principaluri) for i in instances}
+
+            for email in sorted(user_ids_by_email.keys() - principal_emails):
+                stats['errors'].append(f"Principal Baïkal manquant pour {email}")
+            for email in sorted(principal_emails - instance_emails):
+                stats['errors'].append(f"Aucun calendrier Baïkal pour {email}")
+
+            principals_to_update = []
+            for principal in principals:
+                user_id = user_ids_by_email.get(_email_from_principaluri(principal.uri))
+                if user_id is not None and principal.user_id != user_id:
+                    principal.user_id = user_id
+                    principals_to_update.append(principal)
+
+            instances_to_update = []
+            for instance in instances:
+                user_id = user_ids_by_email.get(_email_from_principaluri(instance.principaluri))
+                if user_id is not None and instance.user_id != user_id:
+                    instance.user_id = user_id
+                    instances_to_update.append(instance)
+
+            BaikalPrincipal.objects.bulk_update(
+                principals_to_update, ['user_id'], batch_size=self.batch_size
+            )
+            BaikalCalendarInstance.objects.bulk_update(
+                instances_to_update, ['user_id'], batch_size=self.batch_size
+            )
+            stats['principals_updated'] = len(principals_to_update)
+            stats['instances_updated'] = len(instances_to_update)
+
+            calendar_ids = {instance.calendarid for instance in instances}
+            if calendar_ids:
+                stats['total_events'] = BaikalCalendarObject.objects.filter(
+                    calendarid__in=calendar_ids
+                ).aggregate(total=Count('id'))['total']
+
+            stats['users_synced'] = len(principal_emails & instance_emails)
+
+        except Exception as e:
+            logger.error(f"Erreur synchronisation application {application_id}: {e}", exc_info=True)
+            stats['errors'].append(f"Application {application_id}: {e}")
+        finally:
+            # Les threads ouvrent leurs propres connexions : les refermer
+            connections.close_all()
+
+        stats['duration'] = round(time.perf_counter() - started, 3)
+        return stats
+
+    def _users_by_tenant(self) -> Dict[Optional[int], List[Dict[str, Any]]]:
+        users = User.objects.filter(is_active=True)
+        if self.application_id is not None:
+            users = users.filter(application_id=self.application_id)
+
+        tenants = defaultdict(list)
+        for user in users.values('email', 'user_id', 'application_id'):
+            tenants[user['application_id']].append(user)
+        return tenants
+
+    def sync_all_users(self, tenants: Optional[Iterable[Optional[int]]] = None) -> Dict[str, Any]:
+        """
+        Réconcilie les calendriers Baïkal de toutes les applications en parallèle
+
+        Returns:
+            {'users_synced', 'total_events', 'principals_updated', 'instances_updated',
+             'errors', 'tenants', 'timings'}
+        """
+        stats = {'users_synced': 0, 'total_events': 0, 'principals_updated': 0,
+                 'instances_updated': 0, 'errors': [], 'tenants': [], 'timings': {}}
+
+        with self._timed(stats['timings'], 'load'):
+            users_by_tenant = self._users_by_tenant()
+            if tenants is not None:
+                tenants = set(tenants)
+                users_by_tenant = {k: v for k, v in users_by_tenant.items() if k in tenants}
+
+        with self._timed(stats['timings'], 'tenants'):
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+                futures = [
+                    executor.submit(self._sync_tenant, application_id, users)
+                    for application_id, users in users_by_tenant.items()
+                ]
+                for future in as_completed(futures):
+                    tenant_stats = future.result()
+                    stats['tenants'].append(tenant_stats)
+                    for key in ('users_synced', 'total_events', 'principals_updated', 'instances_updated'):
+                        stats[key] += tenant_stats[key]
+                    stats['errors'].extend(tenant_stats['errors'])
+
+        logger.info(
+            f"Synchronisation calendriers: {stats['users_synced']} utilisateurs, "
+            f"{len(stats['tenants'])} application(s) ({stats['timings']})"
+        )
+        return stats
@@ -6,6 +6,15 @@ sans dupliquer les données dans PostgreSQL
 from django.db import models
 
 
+def binary_to_str(value) -> str:
+    """Décode une colonne VARBINARY de Baïkal (bytes/memoryview) en str"""
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value or ''
+
+
 class BaikalUser(models.Model):
     """Table users de Baikal"""
     id = models.AutoField(primary_key=True, db_column='id')
@@ -173,7 +173,7 @@ class BaikalEventSerializer(serializers.ModelSerializer):
     def get_calendar_source_name(self, obj):
         """Récupérer le nom du calendrier"""
         try:
-            calendar = BaikalCalendarInstance.objects.using('baikal').filter(
+            calendar = BaikalCalendarInstance.objects.filter(
                 calendarid=obj.calendarid
             ).first()
             if calendar:
@@ -185,7 +185,7 @@ class BaikalEventSerializer(serializers.ModelSerializer):
     def get_calendar_source_color(self, obj):
         """Récupérer la couleur du calendrier"""
         try:
-            calendar = BaikalCalendarInstance.objects.using('baikal').filter(
+            calendar = BaikalCalendarInstance.objects.filter(
                 calendarid=obj.calendarid
             ).first()
             if calendar:
@@ -0,0 +1,477 @@
+"""
+Transport HTTP vers Baïkal : concurrence adaptative, délais et disjoncteur
+
+Toutes les requêtes du client CalDAV (caldav.DAVClient et appels directs de
+BaikalCalDAVClient) passent par BaikalSession.request. Pour chaque hôte,
+par worker :
+
+- AIMDLimiter : nombre de requêtes simultanées limité ; la limite augmente
+  de 1/limite à chaque réponse rapide et réussie, et diminue de moitié
+  (au plus une fois par seconde) sur erreur, 5xx ou latence au-delà de
+  BAIKAL_TARGET_LATENCY. La file d'attente est bornée (QUEUE_FACTOR fois la
+  limite, QUEUE_TIMEOUT secondes) : au-delà, la requête est refusée
+  (BaikalOverloaded) plutôt que d'immobiliser le worker.
+- Délais : connexion et lecture bornées (BAIKAL_TIMEOUT) quand l'appelant
+  n'en fixe pas.
+- CircuitBreaker : après FAILURE_THRESHOLD échecs consécutifs, les appels
+  échouent immédiatement (BaikalUnavailable) pendant RESET_TIMEOUT
+  secondes, puis une seule requête d'essai décide de la reprise.
+
+Lectures idempotentes (IDEMPOTENT_METHODS : PROPFIND, REPORT, GET...) :
+
+- Nouvelles tentatives : après une erreur réseau, un délai dépassé ou une
+  réponse RETRY_STATUSES, au plus MAX_ATTEMPTS envois, espacés d'un délai
+  aléatoire (« full jitter ») entre 0 et RETRY_BASE_DELAY * 2^n, plafonné à
+  RETRY_MAX_DELAY. Jamais après BaikalUnavailable / BaikalOverloaded : le
+  disjoncteur ou la file ont déjà répondu.
+- Requête doublée (« hedging ») : si la réponse tarde au-delà du p95 observé
+  pour la méthode (LatencyWindow), une seconde requête identique part ; la
+  première réponse l'emporte, l'autre est fermée dès son arrivée (niquests
+  ne permet pas d'interrompre un envoi en cours). Le délai court depuis
+  l'envoi effectif ; si aucun thread de HEDGE_WORKERS ne se libère sous
+  HEDGE_MIN_DELAY, la requête part directement, sans doublon.
+- Budgets : chaque tentative ou doublon supplémentaire coûte un jeton au
+  RetryBudget de l'hôte (RETRY_BUDGET_RATIO jeton gagné par requête
+  réussie, plafonné) et à celui de la requête API en cours (RequestBudget,
+  posé par api.middleware.BaikalBudgetMiddleware). Sous panne franche, les
+  jetons s'épuisent : la charge envoyée à Baïkal n'est pas multipliée.
+"""
+import contextvars
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import niquests
+from django.conf import settings
+
+from config.db_router import pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 5
+QUEUE_FACTOR = 2
+QUEUE_TIMEOUT = 10
+BACKOFF = 0.5
+DECREASE_INTERVAL = 1.0
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PROPFIND', 'REPORT'})
+RETRY_STATUSES = frozenset({502, 503, 504})
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+# Jetons de nouvelle tentative / doublon : gain par requête réussie, réserve maximale (par hôte)
+RETRY_BUDGET_RATIO = 0.1
+RETRY_BUDGET_MAX = 10
+# Tentatives et doublons supplémentaires par requête API
+REQUEST_EXTRA_ATTEMPTS = 4
+# Latences conservées par méthode, minimum avant de doubler, délai minimal avant doublon
+LATENCY_SAMPLES = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+HEDGE_WORKERS = 32
+
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='baikal-hedge')
+
+
+class BaikalUnavailable(niquests.exceptions.ConnectionError):
+    """Baïkal ne répond plus : disjoncteur ouvert"""
+
+    def __init__(self, message: str, retry_after: float = RESET_TIMEOUT):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BaikalOverloaded(BaikalUnavailable):
+    """File d'attente vers Baïkal pleine : requête refusée sans être envoyée"""
+
+
+class AIMDLimiter:
+    """Limite de concurrence à augmentation additive / diminution multiplicative"""
+
+    def __init__(self, initial: float, minimum: float, maximum: float, target_latency: float):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.waiting = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _capacity(self) -> int:
+        return max(int(self.limit), 1)
+
+    def acquire(self, timeout: float):
+        """Réserve une place, en attendant au plus timeout secondes"""
+        with self._cond:
+            if self.in_flight < self._capacity():
+                self.in_flight += 1
+                return
+            if self.waiting >= math.ceil(self.limit * QUEUE_FACTOR):
+                raise BaikalOverloaded(
+                    f"File Baïkal pleine ({self.waiting} en attente, limite {self.limit:.1f})",
+                    retry_after=1,
+                )
+
+            deadline = time.monotonic() + timeout
+            self.waiting += 1
+            try:
+                while self.in_flight >= self._capacity():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise BaikalOverloaded(
+                            f"Attente Baïkal dépassée ({timeout:.0f}s, limite {self.limit:.1f})",
+                            retry_after=1,
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None, ok: bool = True):
+        """Libère une place ; latency None : requête non envoyée, limite inchangée"""
+        with self._cond:
+            self.in_flight -= 1
+            if latency is not None:
+                if not ok or latency > self.target_latency:
+                    now = time.monotonic()
+                    # Une seule diminution par rafale d'échecs
+                    if now - self._last_decrease >= DECREASE_INTERVAL:
+                        self.limit = max(self.minimum, self.limit * BACKOFF)
+                        self._last_decrease = now
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Disjoncteur fermé / ouvert / semi-ouvert (une requête d'essai)"""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def before_call(self, host: str) -> bool:
+        """
+        Lève BaikalUnavailable si l'appel ne doit pas être tenté
+
+        Returns:
+            True si l'appel est la requête d'essai du mode semi-ouvert
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout or self.probing:
+                raise BaikalUnavailable(
+                    f"Baïkal indisponible ({host}), nouvel essai dans {max(self.reset_timeout - elapsed, 1):.0f}s",
+                    retry_after=max(self.reset_timeout - elapsed, 1),
+                )
+            # Semi-ouvert : cette requête sert d'essai
+            self.probing = True
+            return True
+
+    def record(self, ok: bool, host: str):
+        with self._lock:
+            self.probing = False
+            if ok:
+                if self.opened_at is not None:
+                    logger.info(f"✅ Baïkal de nouveau disponible ({host})")
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.error(f"❌ Disjoncteur Baïkal ouvert ({host}) après {self.failures} échecs")
+                self.opened_at = time.monotonic()
+
+    def cancel_probe(self):
+        """Requête d'essai non envoyée (refusée par le limiteur)"""
+        with self._lock:
+            self.probing = False
+
+
+class RetryBudget:
+    """Réserve de jetons de l'hôte : les renvois restent une fraction des requêtes réussies"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, maximum: float = RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = float(maximum)
+        self.retries = 0
+        self.hedges = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self, kind: str) -> bool:
+        """Consomme un jeton pour un renvoi ('retries') ou un doublon ('hedges')"""
+        with self._lock:
+            if self.tokens < 1:
+                self.denied += 1
+                return False
+            self.tokens -= 1
+            setattr(self, kind, getattr(self, kind) + 1)
+            return True
+
+
+class RequestBudget:
+    """Tentatives supplémentaires accordées à une requête API (toutes lectures Baïkal confondues)"""
+
+    def __init__(self, extra_attempts: int = REQUEST_EXTRA_ATTEMPTS):
+        self.remaining = extra_attempts
+        self._lock = threading.Lock()
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+_request_budget: contextvars.ContextVar[Optional[RequestBudget]] = contextvars.ContextVar(
+    'baikal_request_budget', default=None
+)
+
+
+@contextmanager
+def request_budget(extra_attempts: int = REQUEST_EXTRA_ATTEMPTS) -> Iterator[RequestBudget]:
+    """
+    Budget des lectures Baïkal d'une requête API
+
+    Les threads lancés pour la requête le partagent s'ils reçoivent une copie
+    du contexte (contextvars.copy_context().run) ; hors budget (threads
+    d'arrière-plan), seul le RetryBudget de l'hôte s'applique.
+    """
+    budget = RequestBudget(extra_attempts)
+    token = _request_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _request_budget.reset(token)
+
+
+class LatencyWindow:
+    """Dernières latences réussies d'une méthode ; p95 recalculé tous les 10 échantillons"""
+
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self.samples = deque(maxlen=size)
+        self._p95 = None
+        self._added = 0
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            self.samples.append(latency)
+            self._added += 1
+            if len(self.samples) >= HEDGE_MIN_SAMPLES and (self._p95 is None or self._added % 10 == 0):
+                ordered = sorted(self.samples)
+                self._p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self._p95
+
+
+class _HostGuard:
+    __slots__ = ('limiter', 'breaker', 'budget', 'latencies')
+
+    def __init__(self):
+        maximum = getattr(settings, 'BAIKAL_MAX_CONCURRENCY', 16)
+        self.limiter = AIMDLimiter(
+            initial=max(maximum // 2, 1), minimum=1, maximum=maximum,
+            target_latency=getattr(settings, 'BAIKAL_TARGET_LATENCY', 3.0),
+        )
+        self.breaker = CircuitBreaker()
+        self.budget = RetryBudget()
+        self.latencies: Dict[str, LatencyWindow] = {}
+
+    def latency(self, method: str) -> LatencyWindow:
+        window = self.latencies.get(method)
+        if window is None:
+            window = self.latencies.setdefault(method, LatencyWindow())
+        return window
+
+
+_guards: Dict[str, _HostGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def guard_for(host: str) -> _HostGuard:
+    with _guards_lock:
+        guard = _guards.get(host)
+        if guard is None:
+            guard = _guards[host] = _HostGuard()
+        return guard
+
+
+def transport_stats() -> Dict[str, dict]:
+    """État des limiteurs et disjoncteurs du worker, par hôte"""
+    with _guards_lock:
+        guards = dict(_guards)
+    return {
+        host: {
+            'limit': round(guard.limiter.limit, 2),
+            'in_flight': guard.limiter.in_flight,
+            'waiting': guard.limiter.waiting,
+            'breaker': guard.breaker.state,
+            'consecutive_failures': guard.breaker.failures,
+            'retry_tokens': round(guard.budget.tokens, 2),
+            'retries': guard.budget.retries,
+            'hedges': guard.budget.hedges,
+            'budget_denied': guard.budget.denied,
+            'p95': {
+                method: round(window.p95, 3)
+                for method, window in list(guard.latencies.items()) if window.p95 is not None
+            },
+        }
+        for host, guard in guards.items()
+    }
+
+
+def _spend(guard: _HostGuard, kind: str) -> bool:
+    """Jeton de la requête API en cours (s'il y en a une), puis de l'hôte"""
+    budget = _request_budget.get()
+    if budget is not None and not budget.withdraw():
+        return False
+    return guard.budget.withdraw(kind)
+
+
+def _usable(future) -> bool:
+    return future.exception() is None and future.result().status_code not in RETRY_STATUSES
+
+
+def _discard(future):
+    """Ferme la réponse perdante d'une requête doublée"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class BaikalSession(niquests.Session):
+    """Session niquests soumise au limiteur, aux délais et au disjoncteur de l'hôte"""
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlsplit(str(url)).netloc
+        guard = guard_for(host)
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = (CONNECT_TIMEOUT, getattr(settings, 'BAIKAL_TIMEOUT', 60))
+
+        method = str(method).upper()
+        if method not in IDEMPOTENT_METHODS:
+            # Écriture CalDAV : Baïkal modifie sa base, les lectures suivantes vont au primaire
+            pin_to_primary('baikal')
+            return self._send(guard, host, method, url, args, kwargs)
+
+        attempt = 0
+        while True:
+            error = None
+            response = None
+            try:
+                response = self._hedged(guard, host, method, url, args, kwargs)
+            except BaikalUnavailable:
+                raise
+            except niquests.exceptions.RequestException as e:
+                error = e
+            if error is None and response.status_code not in RETRY_STATUSES:
+                return response
+
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS or not _spend(guard, 'retries'):
+                if error is not None:
+                    raise error
+                return response
+
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            logger.info(f"🔁 {method} {host} : nouvelle tentative {attempt + 1}/{MAX_ATTEMPTS} dans {delay:.2f}s ({reason})")
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    def _hedged(self, guard: _HostGuard, host: str, method: str, url, args, kwargs):
+        """Envoi doublé si la réponse tarde au-delà du p95 de la méthode"""
+        threshold = guard.latency(method).p95
+        if threshold is None:
+            return self._send(guard, host, method, url, args, kwargs)
+
+        started = threading.Event()
+
+        def send():
+            started.set()
+            return self._send(guard, host, method, url, args, kwargs)
+
+        primary = _hedge_executor.submit(send)
+        if not started.wait(HEDGE_MIN_DELAY) and primary.cancel():
+            # Exécuteur saturé : envoi direct, sans doublon
+            return self._send(guard, host, method, url, args, kwargs)
+        # Le délai avant doublon court depuis l'envoi, pas depuis la mise en file
+        started.wait()
+        try:
+            return primary.result(timeout=max(threshold, HEDGE_MIN_DELAY))
+        except FutureTimeout:
+            pass
+        if not _spend(guard, 'hedges'):
+            return primary.result()
+
+        logger.info(f"⏱️ {method} {host} au-delà du p95 ({threshold:.2f}s) : requête doublée")
+        hedge = _hedge_executor.submit(self._send, guard, host, method, url, args, kwargs)
+        pending = {primary, hedge}
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if _usable(f)), None)
+        if winner is None:
+            # Aucune réponse exploitable : celle du premier envoi (ou son erreur)
+            winner = primary
+        loser = hedge if winner is primary else primary
+        loser.add_done_callback(_discard)
+        return winner.result()
+
+    def _send(self, guard: _HostGuard, host: str, method: str, url, args, kwargs):
+        """Un envoi : disjoncteur, limiteur, puis requête"""
+        # Disjoncteur d'abord : échec immédiat, sans passer par la file
+        probe = guard.breaker.before_call(host)
+        try:
+            guard.limiter.acquire(QUEUE_TIMEOUT)
+        except BaikalOverloaded:
+            if probe:
+                guard.breaker.cancel_probe()
+            raise
+
+        started = time.monotonic()
+        ok = False
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            ok = response.status_code < 500
+            return response
+        finally:
+            latency = time.monotonic() - started
+            guard.limiter.release(latency, ok)
+            guard.breaker.record(ok, host)
+            if ok:
+                guard.budget.deposit()
+                guard.latency(method).add(latency)
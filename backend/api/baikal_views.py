@@ -3,6 +3,8 @@ Vues pour l'API Baikal
 Architecture CalDAV pure: Toutes les opérations via le client CalDAV
 """
 import logging
+import math
+import time
 import uuid
 import threading
 
@@ -11,14 +13,89 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
+from django.db import connections
+from django.views.decorators.gzip import gzip_page
+from config.db_router import carry_pinning, pin_to_primary
 from datetime import datetime, timedelta
 
 from .baikal_models import BaikalCalendarInstance
-from .caldav_service import BaikalCalDAVClient
-from .myclic_model import Compte, Affaire
+from . import (
+    affair_cache, client_index, conditional, events_cache, freebusy, label_cache, prefetch, resource_conflicts,
+)
+from .baikal_transport import BaikalUnavailable
+from .caldav_reports import DETAIL_FULL, PROFILES
+from .caldav_service import BaikalCalDAVClient, get_pooled_client, list_calendar_dicts
+from .event_ids import object_uri_from_url
+from .models import User
+from .ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Fenêtre maximale d'un calcul de disponibilités
+FREEBUSY_MAX_DAYS = 92
+
+# Dernière liste de calendriers servie par utilisateur (mode dégradé)
+_last_calendars = TTLCache(ttl=24 * 3600, maxsize=10000)
+
+
+def _unavailable_response(error):
+    """503 quand Baïkal est indisponible ou saturé (disjoncteur ouvert, file pleine)"""
+    logger.warning(f"Baïkal indisponible: {error}")
+    response = Response(
+        {'error': f'Serveur de calendriers indisponible, réessayez dans quelques instants ({error})'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(max(int(math.ceil(error.retry_after)), 1))
+    return response
+
+
+def _window_response(body, window, etag):
+    """
+    Réponse d'une fenêtre d'événements
+
+    À jour : ETag (304 possibles). Version périmée ou partielle : en-têtes de
+    fraîcheur, sans validateur ni mise en cache par le navigateur.
+    """
+    response = Response(body)
+    for name, value in window.headers().items():
+        response[name] = value
+    if window.stale or window.partial:
+        response['Cache-Control'] = 'no-store'
+        return response
+    return conditional.with_validator(response, etag)
+
+
+def _events_window(query_params):
+    """
+    Fenêtre start_date / end_date d'une liste d'événements
+
+    Dates ISO (Z accepté) ; une date absente ou invalide prend la valeur par
+    défaut, bornée au jour pour un ETag stable : aujourd'hui - 7 jours à
+    aujourd'hui + 31 jours.
+    """
+    start_date = end_date = None
+    start_date_str = query_params.get('start_date')
+    end_date_str = query_params.get('end_date')
+
+    if start_date_str:
+        try:
+            start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
+        except (ValueError, AttributeError):
+            pass
+
+    if end_date_str:
+        try:
+            end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
+        except (ValueError, AttributeError):
+            pass
+
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    if not start_date:
+        start_date = today - timedelta(days=7)
+    if not end_date:
+        end_date = today + timedelta(days=31)
+    return start_date, end_date
+
 
 class BaikalCalendarViewSet(viewsets.ViewSet):
     """
@@ -38,26 +115,40 @@ class BaikalCalendarViewSet(viewsets.ViewSet):
             logger.warning(f"Mot de passe Baikal non disponible pour {user.email}")
             return None
 
-        return BaikalCalDAVClient(
-            base_url=settings.BAIKAL_SERVER_URL,
-            user=user
-        )
+        # Client connecté réutilisé entre les requêtes de l'utilisateur
+        return get_pooled_client(user)
 
     def list(self, request):
         """Liste tous les calendriers de l'utilisateur via CalDAV"""
-        client = self._get_caldav_client()
-        if not client:
+        if not request.user.baikal_password:
+            logger.warning(f"Mot de passe Baikal non disponible pour {request.user.email}")
             return Response(
                 {'error': 'Client CalDAV non disponible. Veuillez configurer vos identifiants.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            # Récupérer la liste des calendriers avec détails
-            calendars = client.list_calendars()
-            return Response(calendars)
+            # ⚡ 304 si la liste n'a pas changé, sans ouvrir de session CalDAV
+            etag = conditional.CalendarState.load(request.user.email).calendars_etag()
+            cached = conditional.not_modified(request, etag)
+            if cached:
+                return cached
+
+            # Récupérer la liste des calendriers avec détails (lecture DB : pas de session CalDAV,
+            # la liste reste disponible quand Baïkal est lent ou arrêté)
+            calendars = list_calendar_dicts(request.user.email)
+            _last_calendars.set(request.user.email, (time.time(), calendars))
+            return conditional.with_validator(Response(calendars), etag)
         except Exception as e:
             logger.error(f"Erreur récupération calendriers: {e}", exc_info=True)
+            last = _last_calendars.get(request.user.email)
+            if last:
+                # Dernière liste lue, marquée périmée
+                fetched_at, calendars = last
+                response = Response(calendars)
+                response[events_cache.STALE_HEADER] = str(int(time.time() - fetched_at))
+                response['Cache-Control'] = 'no-store'
+                return response
             return Response(
                 {'error': f'Erreur lors de la récupération des calendriers: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -80,7 +171,7 @@ class BaikalCalendarViewSet(viewsets.ViewSet):
             )
 
         try:
-            cal = BaikalCalendarInstance.objects.using('baikal').get(id=pk)
+            cal = BaikalCalendarInstance.objects.get(id=pk)
             return Response({
                 'id': cal.id,
                 'calendarid': cal.calendarid,
@@ -213,121 +304,84 @@ class BaikalEventViewSet(viewsets.ViewSet):
             logger.warning(f"Mot de passe Baikal non disponible pour {user.email}")
             return None
 
-        return BaikalCalDAVClient(
-            base_url=settings.BAIKAL_SERVER_URL,
-            user=user
-        )
+        # Client connecté réutilisé entre les requêtes de l'utilisateur
+        return get_pooled_client(user)
 
-    def _format_event_for_frontend(self, event, calendar_name, event_id=None):
-        """Formate un événement CalDAV pour le frontend - SANS conversion timezone"""
-        # Gérer les dates et enlever le timezone pour éviter les décalages horaires
-        start_date = event.get('start')
-        end_date = event.get('end')
-
-        # Supprimer tout timezone et formater en string local
-        if start_date:
-            if hasattr(start_date, 'tzinfo') and start_date.tzinfo:
-                start_date = start_date.replace(tzinfo=None)
-            if hasattr(start_date, 'strftime'):
-                start_date = start_date.strftime('%Y-%m-%dT%H:%M:%S')
-
-        if end_date:
-            if hasattr(end_date, 'tzinfo') and end_date.tzinfo:
-                end_date = end_date.replace(tzinfo=None)
-            if hasattr(end_date, 'strftime'):
-                end_date = end_date.strftime('%Y-%m-%dT%H:%M:%S')
-
-        return {
-            'id': event_id or hash(event['id']),
-            'calendar_id': calendar_name,
-            'calendar_source': calendar_name,
-            'uid': event['id'],
-            'etag': '',
-            'url': event.get('url', ''),  # ✅ URL complète de l'événement pour PATCH/DELETE
-            'uri': event.get('url', ''),
-            'title': event.get('summary', 'Sans titre'),
-            'description': event.get('description', ''),
-            'start_date': start_date,
-            'end_date': end_date,
-            'is_completed': False,
-            'lastmodified': int(event['last_modified'].timestamp()) if event.get('last_modified') else None,
-            'calendar_source_name': calendar_name,
-            'calendar_source_color': '#005f82',
-        }
+    def _resolve_event_url(self, client, pk):
+        """Résout l'URL CalDAV d'un événement depuis son identifiant stable"""
+        event = client.get_event_by_id(pk, client.list_calendars())
+        return event['url'] if event else None
+
+    def _resource_conflicts(self, calendar_instance_id, proposals, exclude_keys=()):
+        """
+        Vérifie des occurrences proposées si le calendrier cible est une ressource
+
+        Returns:
+            (calendarid de la ressource ou None, liste des conflits)
+        """
+        calendarid = resource_conflicts.resource_calendar_id(calendar_instance_id)
+        if calendarid is None:
+            return None, []
+        return calendarid, resource_conflicts.find_conflicts(calendarid, proposals, exclude_keys)
+
+    @staticmethod
+    def _conflict_response(conflicts):
+        """409 listant les réservations en conflit (forcer avec "allow_conflicts": true)"""
+        return Response(
+            {'error': 'Ressource déjà réservée sur ce créneau', 'conflicts': conflicts},
+            status=status.HTTP_409_CONFLICT
+        )
 
     def list(self, request):
         """Liste tous les événements de tous les calendriers"""
-        client = self._get_caldav_client()
-        if not client:
-            return Response(
-                {'error': 'Client CalDAV non disponible. Veuillez configurer vos identifiants.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
         try:
             # Récupérer les filtres de dates
-            start_date_str = request.query_params.get('start_date')
-            end_date_str = request.query_params.get('end_date')
-
-            print(start_date_str)
-            print(end_date_str)
-
-            # Parser les dates
-            start_date = None
-            end_date = None
-
-            if start_date_str:
-                try:
-                    start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    pass
-
-            if end_date_str:
-                try:
-                    end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    pass
-
-            # Dates par défaut si non spécifiées
-            if not start_date:
-                start_date = datetime.now() - timedelta(days=7)
-            if not end_date:
-                end_date = datetime.now() + timedelta(days=30)
-
-            # Récupérer tous les calendriers
-            calendars = client.list_calendars()
+            start_date, end_date = _events_window(request.query_params)
 
             # Paramètre pour inclure tous les calendriers (mode groupe)
             include_all = request.query_params.get('include_all', False)
+            with_labels = request.query_params.get('with_labels') in ('1', 'true', 'True')
+            # Profil de détail (?detail=summary : sans description, lue via le détail de l'événement)
+            detail = request.query_params.get('detail') or request.query_params.get('fields') or DETAIL_FULL
+            if detail not in PROFILES:
+                return Response(
+                    {'error': f"Paramètre detail invalide (valeurs possibles: {', '.join(PROFILES)})"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-            print("include all", include_all)
-
-            # Récupérer les événements de chaque calendrier
-            all_events = []
-
-            for cal in calendars:
-                # Filtrer les ressources (description contient "Resource")
-                if cal.get('description') and 'Resource' in cal.get('description', ''):
-                    continue  # Ignorer les ressources
-
-                # En mode "include_all", on ignore le filtre display
-                if not include_all and (cal['display'] == 0 or cal['display'] == 'O'):
-                    continue  # Calendrier masqué
-                try:
-                    events = client.get_events(
-                        calendar=cal,
-                        start_date=start_date,
-                        end_date=end_date
-                    )
+            if not request.user.baikal_password:
+                logger.warning(f"Mot de passe Baikal non disponible pour {request.user.email}")
+                return Response(
+                    {'error': 'Client CalDAV non disponible. Veuillez configurer vos identifiants.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-                    all_events.extend(events)
+            # ⚡ 304 si aucun calendrier concerné n'a changé, sans CalDAV ni parsing
+            state = conditional.CalendarState.load(request.user.email)
+            etag = state.events_etag(start_date, end_date, include_all, with_labels, detail)
+            cached = conditional.not_modified(request, etag)
+            if cached:
+                return cached
+
+            # Cache par fenêtre (préchargé à la connexion) ; client CalDAV seulement en cas d'absence,
+            # dernière version réussie si Baïkal est lent ou indisponible
+            window = events_cache.load_events(
+                state, self._get_caldav_client, start_date, end_date, include_all,
+                max_wait=events_cache.SWR_WAIT, detail=detail,
+            )
+            all_events = window.events
 
+            # Fenêtres voisines chargées en arrière-plan pour la navigation suivante
+            prefetch.after_request(request.user, state, start_date, end_date, include_all, detail)
 
-                except Exception as e:
-                    logger.warning(f"Erreur récupération événements du calendrier {cal['name']}: {e}")
-                    continue
+            # Libellés client/affaire intégrés sur demande (?with_labels=1), sur des copies
+            if with_labels:
+                all_events = [event.copy() for event in all_events]
+                label_cache.embed_labels(request.user.application_id, all_events)
 
-            return Response(all_events)
+            return _window_response(all_events, window, etag)
+        except BaikalUnavailable as e:
+            return _unavailable_response(e)
         except Exception as e:
             logger.error(f"Erreur récupération événements: {e}", exc_info=True)
             return Response(
@@ -345,21 +399,17 @@ class BaikalEventViewSet(viewsets.ViewSet):
             )
 
         try:
-            # On doit chercher dans tous les calendriers
+            # ✅ Résolution directe par clé primaire calendarobjects (voir api.event_ids)
             calendars = client.list_calendars()
+            event = client.get_event_by_id(pk, calendars)
 
-            for cal in calendars:
-                try:
-                    events = client.get_events(cal['name'])
+            # Repli : lecture CalDAV par URL (identifiant non résolu dans calendarobjects)
+            event_url = request.query_params.get('url')
+            if not event and event_url:
+                event = client.get_event_by_url(event_url)
 
-                    # Chercher l'événement par ID (hash de l'UID)
-                    for idx, event in enumerate(events):
-                        event_id = hash(event['id'])
-                        if str(event_id) == str(pk) or str(idx + 1) == str(pk):
-                            formatted_event = self._format_event_for_frontend(event, cal['name'], event_id)
-                            return Response(formatted_event)
-                except:
-                    continue
+            if event:
+                return Response(event)
 
             return Response(
                 {'error': 'Événement non trouvé'},
@@ -407,6 +457,15 @@ class BaikalEventViewSet(viewsets.ViewSet):
             # Pour les dates multiples : un UID par événement
             shared_uid = str(uuid.uuid4()) if has_recurrence_id else None
 
+            # 🏢 Réservation de ressource : vérifier tout le lot en une passe
+            proposals = [
+                (_parse_wall_clock(event.get('start_date')), _parse_wall_clock(event.get('end_date')))
+                for event in events_data
+            ]
+            resource_id, conflicts = self._resource_conflicts(calendar_source_id, proposals)
+            if conflicts and not request.data.get('allow_conflicts'):
+                return self._conflict_response(conflicts)
+
             # ⚡ Préparer la réponse immédiate avec les données optimistes
             results = []
 
@@ -453,6 +512,19 @@ class BaikalEventViewSet(viewsets.ViewSet):
                 # Créer la réponse optimiste (comme si c'était déjà créé)
                 results.append(created_event)
 
+            # Inscrire les réservations avant leur création en arrière-plan
+            if resource_id is not None:
+                # Récurrence : toutes les occurrences partagent l'objet (et la clé) du même UID
+                written = {}
+                for result_event, proposal in zip(results, proposals):
+                    written.setdefault(f"{result_event['id']}.ics", []).append(proposal)
+                for key, intervals in written.items():
+                    resource_conflicts.record_write(resource_id, key, intervals)
+                for result_event in results:
+                    result_event['conflicts'] = []
+                for conflict in conflicts:
+                    results[conflict['index']]['conflicts'].append(conflict)
+
             # ⚡ Retourner immédiatement la réponse au frontend
             logger.info(f"⚡ Retour immédiat de {len(results)} événements au frontend")
 
@@ -580,9 +652,17 @@ class BaikalEventViewSet(viewsets.ViewSet):
 
                 except Exception as e:
                     logger.error(f"❌ Erreur globale arrière-plan: {e}", exc_info=True)
-
-            # Lancer le thread en arrière-plan
-            thread = threading.Thread(target=create_events_background, daemon=True)
+                finally:
+                    # Les réservations inscrites d'avance sont relues depuis Baïkal
+                    if resource_id is not None:
+                        resource_conflicts.invalidate(resource_id)
+                    # Rendre au pool les connexions empruntées par ce thread
+                    connections.close_all()
+
+            # Lancer le thread en arrière-plan ; les écritures à venir épinglent déjà
+            # baikal pour la relecture du frontend (config.db_router)
+            pin_to_primary('baikal')
+            thread = threading.Thread(target=carry_pinning(create_events_background), daemon=True)
             thread.start()
 
             # Retourner immédiatement les résultats optimistes
@@ -646,6 +726,12 @@ class BaikalEventViewSet(viewsets.ViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            # 🏢 Réservation de ressource : refuser un créneau déjà pris
+            proposal = (freebusy.to_wall_clock(start_dt), freebusy.to_wall_clock(end_dt))
+            resource_id, conflicts = self._resource_conflicts(calendar_source_id, [proposal])
+            if conflicts and not request.data.get('allow_conflicts'):
+                return self._conflict_response(conflicts)
+
             # Créer l'événement via CalDAV
             event_data = {
                 'title': title,
@@ -666,6 +752,9 @@ class BaikalEventViewSet(viewsets.ViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
+            if resource_id is not None:
+                resource_conflicts.record_write(resource_id, f"{result['id']}.ics", [proposal])
+
             print("uri", calendar_source_uri)
 
             url = f'https://www.myclic.fr/baikal/html/cal.php/calendars/{self.request.user.email}/{calendar_source_uri}/{result["id"]}.ics'
@@ -688,6 +777,7 @@ class BaikalEventViewSet(viewsets.ViewSet):
                 'calendar_source_color': calendar_source_color,
                 'calendar_source_id': calendar_source_id,
                 'calendar_source_uri': calendar_source_uri,
+                'conflicts': conflicts,
             }
 
             return Response(created_event, status=status.HTTP_201_CREATED)
@@ -709,10 +799,8 @@ class BaikalEventViewSet(viewsets.ViewSet):
             )
 
         try:
-            # ✅ Récupérer l'URL depuis le body de la requête
-            event_url = request.data.get('url')
-
-            print("url", event_url)
+            # ✅ Récupérer l'URL depuis le body de la requête, sinon la résoudre depuis l'identifiant
+            event_url = request.data.get('url') or self._resolve_event_url(client, pk)
 
             if not event_url:
                 return Response(
@@ -734,6 +822,24 @@ class BaikalEventViewSet(viewsets.ViewSet):
             if 'location' in request.data:
                 update_data['location'] = request.data['location']
 
+            # 🏢 Déplacement d'une réservation de ressource : vérifier le nouveau créneau
+            resource_id, conflicts, proposal = None, [], None
+            if 'start' in update_data or 'end' in update_data:
+                resource_id = resource_conflicts.resource_calendar_id(request.data.get('calendar_source_id'))
+            if resource_id is not None:
+                start_dt = _parse_wall_clock(update_data.get('start'))
+                end_dt = _parse_wall_clock(update_data.get('end'))
+                if start_dt is None or end_dt is None:
+                    current = client.get_event_by_url(event_url) or {}
+                    start_dt = start_dt or freebusy.to_wall_clock(current.get('start'))
+                    end_dt = end_dt or freebusy.to_wall_clock(current.get('end'))
+                proposal = (start_dt, end_dt)
+                conflicts = resource_conflicts.find_conflicts(
+                    resource_id, [proposal], exclude_keys=[object_uri_from_url(event_url)]
+                )
+                if conflicts and not request.data.get('allow_conflicts'):
+                    return self._conflict_response(conflicts)
+
             # Mettre à jour via CalDAV
             result = client.update_event(event_url, update_data)
 
@@ -743,8 +849,11 @@ class BaikalEventViewSet(viewsets.ViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
-            # Récupérer l'événement mis à jour pour retourner les données complètes
-            updated_event = client.get_event_by_url(event_url)
+            if resource_id is not None:
+                resource_conflicts.record_write(resource_id, object_uri_from_url(event_url), [proposal])
+
+            # Données complètes de l'événement mis à jour (état envoyé par le PUT, relu sinon)
+            updated_event = result.get('event') or client.get_event_by_url(event_url)
 
             # ✅ Préserver les informations du calendrier source depuis la requête
             calendar_source_name = request.data.get('calendar_source_name')
@@ -776,6 +885,7 @@ class BaikalEventViewSet(viewsets.ViewSet):
                     'calendar_source_id': calendar_source_id,
                     'calendar_source_color': calendar_source_color,
                     'calendar_source_uri': calendar_source_uri,
+                    'conflicts': conflicts,
                     'message': 'Événement mis à jour avec succès'
                 }
             else:
@@ -791,6 +901,7 @@ class BaikalEventViewSet(viewsets.ViewSet):
                     'calendar_source_id': calendar_source_id,
                     'calendar_source_color': calendar_source_color,
                     'calendar_source_uri': calendar_source_uri,
+                    'conflicts': conflicts,
                     'message': 'Événement mis à jour avec succès'
                 }
 
@@ -820,8 +931,13 @@ class BaikalEventViewSet(viewsets.ViewSet):
             # ✅ Récupérer l'URL depuis le body ou query params
             event_url = request.data.get('url') or request.query_params.get('url')
             recurrence_id = request.data.get('recurrence_id') or request.query_params.get('recurrence_id')
-            print('url', event_url)
-            print('recurrence_id', recurrence_id)
+
+            # ✅ Sans URL, résoudre l'événement directement depuis son identifiant stable
+            if not event_url:
+                event = client.get_event_by_id(pk, client.list_calendars())
+                if event:
+                    event_url = event['url']
+                    recurrence_id = recurrence_id or event['recurrence_id']
 
             if not event_url:
                 return Response(
@@ -864,6 +980,7 @@ class BaikalEventViewSet(viewsets.ViewSet):
 def search_clients(request):
     """
     Recherche de clients (comptes) avec genre=1 (strict)
+    Chaque mot saisi doit préfixer un mot du nom du client
     Paramètres:
     - q: terme de recherche (minimum 3 caractères)
     """
@@ -876,17 +993,13 @@ def search_clients(request):
         )
 
     try:
-        # Rechercher les comptes avec genre=1 et nom correspondant
-        clients = Compte.objects.using('myclic').filter(
-            application_id=request.user.application_id,
-            genre=1,
-            nom__icontains=search_query
-        ).values('id', 'nom', 'email', 'telephone')[:20]  # Limiter à 20 résultats
+        # Recherche par préfixe de tokens dans l'index mémoire (voir api.client_index)
+        clients = client_index.search_clients(request.user.application_id, search_query, limit=20)
 
         logger.info(f"Recherche clients pour '{search_query}': {len(clients)} résultats")
 
         return Response({
-            'clients': list(clients),
+            'clients': clients,
             'count': len(clients)
         })
 
@@ -917,22 +1030,23 @@ def search_affairs(request):
         )
 
     try:
-        # Rechercher les affaires liées au client via compte_id
-        affaires = Affaire.objects.using('myclic').filter(
-            compte_id=client_id,
-            application_id=request.user.application_id
+        client_id = int(client_id)
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'L\'ID du client est invalide'},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-        # Filtrer par terme de recherche si fourni
-        if search_query:
-            affaires = affaires.filter(nom__icontains=search_query)
-
-        affaires = affaires.values('id', 'nom', 'descriptif', 'statut')[:20]
+    try:
+        # Affaires du client servies depuis le cache mémoire (voir api.affair_cache)
+        affaires = affair_cache.search_affairs(
+            request.user.application_id, client_id, search_query, limit=20
+        )
 
         logger.info(f"Recherche affaires pour client {client_id}: {len(affaires)} résultats")
 
         return Response({
-            'affairs': list(affaires),
+            'affairs': affaires,
             'count': len(affaires)
         })
 
@@ -954,36 +1068,214 @@ def get_client_affair_info(request):
         client_id = request.GET.get('client_id')
         affair_id = request.GET.get('affair_id')
 
-        print(f"client_id: {client_id}, affair_id: {affair_id}")
+        labels = label_cache.resolve_labels(
+            request.user.application_id,
+            client_ids=[client_id] if client_id else [],
+            affair_ids=[affair_id] if affair_id else [],
+        )
 
         result = {}
-
-        # Récupérer le nom du client si l'ID est fourni
         if client_id:
-            print("is client id", client_id)
-            try:
-                client = Compte.objects.using('myclic').only('id', 'nom', 'email', 'telephone').get(id=client_id)
-                result['client'] = {
-                    'id': client.id,
-                    'nom': client.nom or '',
-                }
-            except Compte.DoesNotExist:
-                result['client'] = None
-
-        # Récupérer le nom de l'affaire si l'ID est fourni
+            result['client'] = next(iter(labels['clients'].values()), None)
         if affair_id:
-            print("is Affaired id", affair_id)
-            try:
-                affair = Affaire.objects.using('myclic').only('id', 'nom', 'descriptif').get(id=affair_id)
-                result['affair'] = {
-                    'id': affair.id,
-                    'nom': affair.nom or '',
-                }
-            except Affaire.DoesNotExist:
-                result['affair'] = None
+            result['affair'] = next(iter(labels['affairs'].values()), None)
 
         return Response(result, status=status.HTTP_200_OK)
 
     except Exception as e:
         logger.error(f"Erreur récupération info client/affaire: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def get_client_affair_info_batch(request):
+    """
+    Récupère en un seul appel les libellés de plusieurs clients et affaires
+    Body: { "pairs": [{"client_id": 1, "affair_id": 2}, ...] }
+      ou  { "client_ids": [...], "affair_ids": [...] }
+    """
+    try:
+        pairs = request.data.get('pairs') or []
+        client_ids = list(request.data.get('client_ids') or [])
+        affair_ids = list(request.data.get('affair_ids') or [])
+
+        for pair in pairs:
+            if isinstance(pair, dict):
+                client_ids.append(pair.get('client_id'))
+                affair_ids.append(pair.get('affair_id'))
+
+        if max(len(client_ids), len(affair_ids)) > label_cache.MAX_BATCH_IDS:
+            return Response(
+                {'error': f'Lot limité à {label_cache.MAX_BATCH_IDS} clients et {label_cache.MAX_BATCH_IDS} affaires'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        labels = label_cache.resolve_labels(
+            request.user.application_id,
+            client_ids=client_ids,
+            affair_ids=affair_ids,
+        )
+
+        return Response({
+            'clients': {str(k): v for k, v in labels['clients'].items()},
+            'affairs': {str(k): v for k, v in labels['affairs'].items()},
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Erreur récupération info client/affaire (lot): {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _parse_wall_clock(value):
+    """Parse une date ISO du frontend en heure murale Europe/Paris sans timezone"""
+    if not value:
+        return None
+    try:
+        return freebusy.to_wall_clock(datetime.fromisoformat(str(value).replace('Z', '+00:00')))
+    except ValueError:
+        return None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def get_freebusy(request):
+    """
+    Disponibilités communes de plusieurs calendriers / utilisateurs
+    Body: {
+        "start": "2026-02-01T00:00:00", "end": "2026-03-01T00:00:00",
+        "calendar_ids": [12, 15],            (instances visibles par l'utilisateur)
+        "user_emails": ["a@x.fr"],           (calendriers des collègues de la même application)
+        "duration": 60,                      (minutes, durée minimale d'un créneau libre)
+        "day_start": "08:00", "day_end": "18:00", "weekdays": [0, 1, 2, 3, 4]
+    }
+    """
+    start = _parse_wall_clock(request.data.get('start'))
+    end = _parse_wall_clock(request.data.get('end'))
+    if not start or not end or end <= start:
+        return Response(
+            {'error': 'Fenêtre invalide: "start" et "end" (ISO) sont requis, avec start < end'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if end - start > timedelta(days=FREEBUSY_MAX_DAYS):
+        return Response(
+            {'error': f'Fenêtre limitée à {FREEBUSY_MAX_DAYS} jours'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        duration = timedelta(minutes=int(request.data.get('duration', 60)))
+        day_start = datetime.strptime(request.data.get('day_start', '08:00'), '%H:%M').time()
+        day_end = datetime.strptime(request.data.get('day_end', '18:00'), '%H:%M').time()
+        weekdays = [int(d) for d in request.data.get('weekdays', [0, 1, 2, 3, 4])]
+        calendar_ids = {int(i) for i in request.data.get('calendar_ids') or []}
+    except (TypeError, ValueError) as e:
+        return Response({'error': f'Paramètre invalide: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    user_emails = set(request.data.get('user_emails') or [])
+
+    try:
+        fields = ('id', 'calendarid', 'displayname', 'defined_name', 'description')
+        calendars = []
+
+        # Calendriers demandés parmi ceux visibles par l'utilisateur
+        if calendar_ids:
+            calendars.extend(BaikalCalendarInstance.objects.filter(
+                id__in=calendar_ids,
+                principaluri__contains=request.user.email,
+            ).values(*fields))
+
+        # Calendriers des utilisateurs de la même application
+        if user_emails:
+            emails = User.objects.filter(
+                email__in=user_emails,
+                application_id=request.user.application_id,
+            ).values_list('email', flat=True)
+            calendars.extend(BaikalCalendarInstance.objects.filter(
+                principaluri__in=[f"principals/{email}".encode('utf-8') for email in emails],
+            ).exclude(description__contains='Resource').values(*fields))
+
+        unique_calendars = {}
+        for cal in calendars:
+            cal['displayname'] = cal['displayname'] or cal['defined_name'] or 'Calendrier'
+            unique_calendars[cal['id']] = cal
+
+        if not unique_calendars:
+            return Response(
+                {'error': 'Aucun calendrier accessible pour cette demande'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = freebusy.compute_freebusy(
+            list(unique_calendars.values()), start, end, duration,
+            day_start=day_start, day_end=day_end, weekdays=weekdays,
+        )
+        result.update({'start': start.isoformat(), 'end': end.isoformat(),
+                       'duration': int(duration.total_seconds() // 60)})
+        return Response(result)
+
+    except Exception as e:
+        logger.error(f"Erreur calcul disponibilités: {e}", exc_info=True)
+        return Response(
+            {'error': f'Erreur lors du calcul des disponibilités: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@gzip_page
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_bootstrap(request):
+    """
+    Premier affichage du tableau de bord en une requête
+    GET ?start_date=&end_date= (mêmes valeurs par défaut que la liste des événements)
+
+    Returns:
+        {"calendars": [...], "events": [... avec libellés client/affaire],
+         "start_date": ..., "end_date": ...}, compressé si le navigateur l'accepte
+    """
+    user = request.user
+    if not user.baikal_password:
+        logger.warning(f"Mot de passe Baikal non disponible pour {user.email}")
+        return Response(
+            {'error': 'Client CalDAV non disponible. Veuillez configurer vos identifiants.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    start_date, end_date = _events_window(request.query_params)
+
+    try:
+        state = conditional.CalendarState.load(user.email)
+        etag = state.bootstrap_etag(start_date, end_date)
+        cached = conditional.not_modified(request, etag)
+        if cached:
+            return cached
+
+        # Liste des calendriers lue une fois, réutilisée pour les événements (recherches CalDAV en parallèle)
+        calendars = list_calendar_dicts(user.email)
+        window = events_cache.load_events(
+            state, lambda: get_pooled_client(user), start_date, end_date, False,
+            calendars=calendars, max_wait=events_cache.SWR_WAIT,
+        )
+        prefetch.after_request(user, state, start_date, end_date, False)
+
+        # Libellés client/affaire intégrés, sur des copies des enregistrements en cache
+        events = [event.copy() for event in window.events]
+        label_cache.embed_labels(user.application_id, events)
+
+        return _window_response({
+            'calendars': calendars,
+            'events': events,
+            'start_date': start_date,
+            'end_date': end_date,
+            'stale': window.stale or window.partial,
+            'fetched_at': window.fetched_at_iso(),
+        }, window, etag)
+    except BaikalUnavailable as e:
+        return _unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Erreur chargement initial: {e}", exc_info=True)
+        return Response(
+            {'error': f'Erreur lors du chargement initial: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,219 @@
+"""
+Requêtes REPORT CalDAV construites et lues directement
+
+caldav.Calendar charge chaque réponse multistatus en entier avant de la
+parcourir. Ici les corps de requête sont écrits à la main et la réponse 207
+est lue au fil de l'eau (iter_multistatus) : chaque <D:response> est rendu
+dès qu'il est complet puis retiré de l'arbre, la mémoire reste bornée par
+la taille d'un objet quelle que soit la taille du lot.
+
+- calendar-multiget (RFC 4791 §7.9) : objets connus par leur href, avec
+  leur ETag, en une requête par calendrier (MULTIGET_CHUNK hrefs au plus
+  par requête).
+- calendar-query élagué (RFC 4791 §9.6, récupération partielle) : la
+  liste des événements en profil 'summary' ne demande que les propriétés
+  VEVENT affichées (PROFILES), sans DESCRIPTION (HTML du RichTextEditor).
+  Les serveurs qui ignorent la récupération partielle (sabre/dav, donc
+  Baïkal) renvoient l'objet complet : prune_vevent_properties applique
+  alors le même élagage avant tout parsing.
+"""
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import FrozenSet, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from xml.sax.saxutils import escape
+
+DAV = '{DAV:}'
+CALDAV = '{urn:ietf:params:xml:ns:caldav}'
+
+# hrefs par REPORT calendar-multiget
+MULTIGET_CHUNK = 200
+# Taille des blocs lus sur la réponse
+READ_CHUNK = 64 * 1024
+
+# Profils de la liste des événements (paramètre detail / fields)
+DETAIL_FULL = 'full'
+DETAIL_SUMMARY = 'summary'
+# Propriétés VEVENT demandées par profil, None : objet complet. Le profil
+# 'summary' garde les propriétés affichées et celles de l'expansion des récurrences.
+PROFILES = {
+    DETAIL_FULL: None,
+    DETAIL_SUMMARY: frozenset((
+        'UID', 'SUMMARY', 'LOCATION', 'DTSTART', 'DTEND', 'DURATION', 'RECURRENCE-ID',
+        'RRULE', 'RDATE', 'EXDATE', 'EXRULE', 'STATUS', 'CLIENT', 'AFFAIR', 'EVENTTYPE',
+    )),
+}
+
+# Propriétés d'un VEVENT récurrent (à déplier côté client, comme caldav.Calendar.search)
+RECURRENCE_PROPERTIES = frozenset(('RRULE', 'RDATE', 'EXDATE', 'EXRULE'))
+
+REPORT_HEADERS = {'Content-Type': 'application/xml; charset=utf-8', 'Depth': '1'}
+
+# (href, statut HTTP, ETag, calendar-data)
+MultistatusEntry = Tuple[str, int, Optional[str], Optional[str]]
+
+
+def href_key(url: str) -> str:
+    """Chemin décodé d'une URL ou d'un href, pour rapprocher requête et réponse"""
+    return unquote(urlsplit(url).path)
+
+
+def collection_url(url: str) -> str:
+    """URL du calendrier contenant un objet"""
+    return url.rsplit('/', 1)[0] + '/'
+
+
+def chunked(items: List, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def multiget_body(hrefs: Iterable[str]) -> bytes:
+    """Corps d'un REPORT calendar-multiget (ETag et calendar-data complet)"""
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<C:calendar-multiget xmlns:D="DAV:" xmlns:C="urn:ietf:params:xml:ns:caldav">',
+        '<D:prop><D:getetag/><C:calendar-data/></D:prop>',
+    ]
+    parts.extend(f'<D:href>{escape(href)}</D:href>' for href in hrefs)
+    parts.append('</C:calendar-multiget>')
+    return ''.join(parts).encode('utf-8')
+
+
+def _utc(value: datetime) -> str:
+    # Date sans timezone : heure locale du serveur (même convention que caldav)
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def calendar_query_body(start: datetime, end: datetime, properties: Optional[FrozenSet[str]]) -> bytes:
+    """
+    Corps d'un REPORT calendar-query des VEVENT d'une période
+
+    Args:
+        properties: Propriétés VEVENT à renvoyer (VTIMEZONE toujours
+            complet), None : objet complet
+    """
+    if properties is None:
+        calendar_data = '<C:calendar-data/>'
+    else:
+        calendar_data = ''.join((
+            '<C:calendar-data><C:comp name="VCALENDAR"><C:allprop/>',
+            '<C:comp name="VTIMEZONE"><C:allprop/><C:allcomp/></C:comp>',
+            '<C:comp name="VEVENT">',
+            ''.join(f'<C:prop name="{name}"/>' for name in sorted(properties)),
+            '</C:comp></C:comp></C:calendar-data>',
+        ))
+    return ''.join((
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<C:calendar-query xmlns:D="DAV:" xmlns:C="urn:ietf:params:xml:ns:caldav">',
+        '<D:prop><D:getetag/>', calendar_data, '</D:prop>',
+        '<C:filter><C:comp-filter name="VCALENDAR"><C:comp-filter name="VEVENT">',
+        f'<C:time-range start="{_utc(start)}" end="{_utc(end)}"/>',
+        '</C:comp-filter></C:comp-filter></C:filter>',
+        '</C:calendar-query>',
+    )).encode('utf-8')
+
+
+def prune_vevent_properties(data: str, properties: FrozenSet[str]) -> Tuple[str, bool]:
+    """
+    Retire des VEVENT les propriétés hors de properties et les composants
+    imbriqués (VALARM) ; le reste de l'objet (VTIMEZONE...) est conservé
+
+    Returns:
+        (objet élagué, True si un VEVENT porte une règle de récurrence)
+    """
+    kept = []
+    recurring = False
+    depth = 0  # 0 : hors VEVENT, 1 : dans un VEVENT, > 1 : composant imbriqué
+    skipping = False
+    for line in data.splitlines():
+        if line[:1] in (' ', '\t'):
+            # Ligne repliée : suit le sort de sa propriété
+            if not skipping:
+                kept.append(line)
+            continue
+        name = line.split(':', 1)[0].split(';', 1)[0].upper()
+        if name == 'BEGIN':
+            if depth:
+                depth += 1
+                skipping = True
+                continue
+            if line.split(':', 1)[-1].strip().upper() == 'VEVENT':
+                depth = 1
+            skipping = False
+        elif name == 'END' and depth:
+            depth -= 1
+            skipping = depth > 0
+            if skipping:
+                continue
+        elif depth > 1:
+            skipping = True
+        elif depth == 1:
+            skipping = name not in properties
+            recurring = recurring or name in RECURRENCE_PROPERTIES
+        else:
+            skipping = False
+        if not skipping:
+            kept.append(line)
+    return '\r\n'.join(kept) + '\r\n', recurring
+
+
+def _status_code(element) -> Optional[int]:
+    # "HTTP/1.1 200 OK"
+    if element is None or not element.text:
+        return None
+    try:
+        return int(element.text.split()[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _entry(response) -> Optional[MultistatusEntry]:
+    href = response.findtext(f'{DAV}href')
+    if not href:
+        return None
+    href = href.strip()
+
+    status = _status_code(response.find(f'{DAV}status'))
+    etag = data = None
+    for propstat in response.iterfind(f'{DAV}propstat'):
+        propstat_status = _status_code(propstat.find(f'{DAV}status'))
+        if propstat_status != 200:
+            status = status or propstat_status
+            continue
+        status = 200
+        prop = propstat.find(f'{DAV}prop')
+        if prop is None:
+            continue
+        etag = prop.findtext(f'{DAV}getetag') or etag
+        data = prop.findtext(f'{CALDAV}calendar-data') or data
+    return href, status or 200, etag, data
+
+
+def iter_multistatus(chunks: Iterable[bytes]) -> Iterator[MultistatusEntry]:
+    """
+    Parcourt une réponse 207 Multi-Status bloc par bloc
+
+    Args:
+        chunks: Blocs d'octets de la réponse (Response.iter_content)
+
+    Yields:
+        (href, statut, ETag, calendar-data) de chaque <D:response>
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            if element.tag == f'{DAV}response':
+                entry = _entry(element)
+                # Réponse lue : libérer la mémoire avant la suivante
+                if root is not None and element in root:
+                    root.remove(element)
+                if entry is not None:
+                    yield entry
+    parser.close()
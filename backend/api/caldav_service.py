@@ -1,22 +1,77 @@
+import contextvars
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from caldav import DAVClient
-from caldav.objects import Calendar
+from caldav.objects import Calendar, Event
 from datetime import datetime, timedelta, timezone
-import niquests
+from django.conf import settings
 from niquests.auth import HTTPDigestAuth
 from icalendar import Calendar as iCalendar, vDatetime, vDate
 from datetime import datetime
 import pytz
-from typing import List, Optional, Dict, Any
-
-from .baikal_models import BaikalCalendarInstance, BaikalCalendar
+from typing import Iterable, List, Optional, Dict, Any, Tuple
+from urllib.parse import urlsplit
+
+from .baikal_models import BaikalCalendarInstance, BaikalCalendar, BaikalCalendarObject, binary_to_str
+from .baikal_transport import BaikalSession, BaikalUnavailable
+from .caldav_reports import (
+    DETAIL_FULL, MULTIGET_CHUNK, PROFILES, READ_CHUNK, REPORT_HEADERS,
+    calendar_query_body, chunked, collection_url, href_key, iter_multistatus, multiget_body,
+    prune_vevent_properties,
+)
+from .event_ids import RECURRENCE_KEY_FORMAT, object_uri_from_url, parse_event_id, recurrence_key
+from .event_record import EventRecord, calendar_ref
+from . import parse_pool
+from .ical_extract import EXOTIC, fields_from_tuple, first_vevent_fields, vevent_fields
+from .ical_serialize import PARIS_TZ, serialize_events
+from .ttl_cache import TTLCache
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Recherches CalDAV simultanées par worker (toutes requêtes confondues)
+CALDAV_SEARCH_WORKERS = 6
+_search_executor = ThreadPoolExecutor(max_workers=CALDAV_SEARCH_WORKERS, thread_name_prefix='caldav-search')
+
+# Clients connectés réutilisés entre les requêtes d'un même utilisateur (par worker)
+CLIENT_TTL = 600
+_clients = TTLCache(ttl=CLIENT_TTL, maxsize=500)
+
+
+def list_calendar_dicts(username: str) -> List[Dict[str, Any]]:
+    """Calendriers visibles d'un utilisateur (lecture DB, sans session CalDAV), au format dict"""
+    calendars = BaikalCalendarInstance.objects.filter(
+        principaluri__contains=username
+    )
+    calendar_list = []
+    for cal in calendars:
+        # Filtrer les ressources (description contient "Resource")
+        # if cal.description and 'Resource' in cal.description:
+        #     continue
+
+        cal_parent = BaikalCalendar.objects.get(id=cal.calendarid)
+        if not cal_parent.is_visible:
+            continue
+        calendar_list.append({
+            'id': cal.id,
+            'calendarid': cal.calendarid,
+            'displayname': cal.displayname or cal.defined_name or 'Calendrier',
+            'principaluri': cal.principaluri,
+            'uri': cal.uri,
+            'description': cal.description,
+            'calendarcolor': cal.calendarcolor or '#005f82',
+            'defined_name': cal.defined_name,
+            'access': cal.access,
+            'share_href': cal.share_href,
+            'share_displayname': cal.share_displayname or '',
+            'display': cal.display,
+            'user_id': cal.user_id
+        })
+    return calendar_list
+
 
 class BaikalCalDAVClient:
     """Client CalDAV complet pour Baïkal"""
@@ -26,8 +81,8 @@ class BaikalCalDAVClient:
         self.username = user.email
         self.password = user.baikal_password
 
-        # Session avec authentification Digest
-        self._session = niquests.Session()
+        # Session avec authentification Digest (limiteur, délais et disjoncteur par hôte)
+        self._session = BaikalSession()
         self._session.auth = HTTPDigestAuth(user.email, user.baikal_password)
 
         # Client DAV avec notre session
@@ -36,48 +91,34 @@ class BaikalCalDAVClient:
 
         # Principal
         self.principal = self.client.principal()
+        # Calendriers CalDAV par nom, chargés au premier besoin (client réutilisé, voir get_pooled_client)
+        self._calendars_by_name = None
         logger.info(f"Connecté à Baïkal: {self.username}")
 
     def list_calendars(self):
         """Liste tous les calendriers disponibles via le principal CalDAV, au format dict pour le frontend/backend."""
-        calendars = BaikalCalendarInstance.objects.using('baikal').filter(
-            principaluri__contains=self.username
-        )
-        calendar_list = []
-        for cal in calendars:
-            # Filtrer les ressources (description contient "Resource")
-            # if cal.description and 'Resource' in cal.description:
-            #     continue
-
-            cal_parent = BaikalCalendar.objects.using('baikal').get(id=cal.calendarid)
-            if not cal_parent.is_visible:
-                continue
-            calendar_list.append({
-                'id': cal.id,
-                'calendarid': cal.calendarid,
-                'displayname': cal.displayname or cal.defined_name or 'Calendrier',
-                'principaluri': cal.principaluri,
-                'uri': cal.uri,
-                'description': cal.description,
-                'calendarcolor': cal.calendarcolor or '#005f82',
-                'defined_name': cal.defined_name,
-                'access': cal.access,
-                'share_href': cal.share_href,
-                'share_displayname': cal.share_displayname or '',
-                'display': cal.display,
-                'user_id': cal.user_id
-            })
-        return calendar_list
+        return list_calendar_dicts(self.username)
+
+    def load_caldav_calendars(self) -> Dict[str, Calendar]:
+        """(Re)charge les calendriers CalDAV du principal, indexés par nom"""
+        by_name = {}
+        for cal in self.principal.calendars():
+            for name in (getattr(cal, 'displayname', None), getattr(cal, 'name', None)):
+                if name:
+                    by_name[name] = cal
+        self._calendars_by_name = by_name
+        return by_name
 
     def get_calendar_by_name(self, name: str) -> Optional[Calendar]:
         """Récupère un calendrier spécifique par son nom exact"""
-        for cal in self.principal.calendars():
-            if getattr(cal, 'name', None) == name or getattr(cal, 'displayname', None) == name:
-                return cal
-        return None
+        by_name = self._calendars_by_name
+        if by_name is None or name not in by_name:
+            # Calendrier créé ou renommé depuis le dernier chargement
+            by_name = self.load_caldav_calendars()
+        return by_name.get(name)
 
     def get_events(self, calendar, start_date: datetime = None,
-                   end_date: datetime = None) -> List[Dict[str, Any]]:
+                   end_date: datetime = None) -> List[EventRecord]:
         """
         Récupère les événements d'un calendrier avec des filtres
 
@@ -85,97 +126,290 @@ class BaikalCalDAVClient:
             calendar:calendrier
             start_date: Date de début (défaut: aujourd'hui - 7 jours)
             end_date: Date de fin (défaut: aujourd'hui + 30 jours)
-            limit: Nombre maximum d'événements à retourner
 
         Returns:
-            Liste d'événements formatés
+            Liste d'EventRecord (convertis en JSON au rendu)
         """
-        calendar_obj = calendar
-        calendar_name = calendar["displayname"]
-        calendar = self.get_calendar_by_name(calendar_name)
-        if not calendar:
-            logger.error(f"Calendrier '{calendar_name}' non trouvé")
-            return []
+        return self.get_events_many([calendar], start_date, end_date)
+
+    def get_events_many(self, calendars: List[Dict[str, Any]], start_date: datetime = None,
+                        end_date: datetime = None, failed: Optional[List[int]] = None,
+                        detail: str = DETAIL_FULL) -> List[EventRecord]:
+        """
+        Récupère les événements de plusieurs calendriers, extraits en un seul lot
+
+        Les calendriers sont interrogés en parallèle (CALDAV_SEARCH_WORKERS
+        requêtes à la fois par worker), puis les objets sont extraits ensemble
+        (api.parse_pool) : au-delà du seuil adaptatif, l'extraction est
+        répartie sur plusieurs processus. Un calendrier en erreur est ignoré ;
+        son id est ajouté à failed si la liste est fournie.
 
+        detail : profil de caldav_reports.PROFILES ; hors 'full', seules les
+        propriétés du profil sont lues et la description vaut None (à lire
+        via le détail de l'événement).
+        """
+        properties = PROFILES[detail]
         # Dates par défaut
         if not start_date:
             start_date = datetime.now() - timedelta(days=7)
         if not end_date:
             end_date = datetime.now() + timedelta(days=30)
 
-        try:
-            # Recherche des événements avec la nouvelle API
-            events = calendar.search(start=start_date, end=end_date, event=True, expand=True)
-            logger.info(f"Trouvé {len(events)} événement(s) dans '{calendar_name}'")
+        # Recherches CalDAV lancées en parallèle (un REPORT par calendrier)
+        searches = []
+        for calendar_obj in calendars:
+            calendar_name = calendar_obj["displayname"]
+            calendar = self.get_calendar_by_name(calendar_name)
+            if not calendar:
+                logger.error(f"Calendrier '{calendar_name}' non trouvé")
+                if failed is not None:
+                    failed.append(calendar_obj['id'])
+                continue
+            # Copie du contexte : les recherches partagent le budget de la requête (baikal_transport)
+            run = contextvars.copy_context().run
+            if properties is None:
+                search = _search_executor.submit(
+                    run, calendar.search, start=start_date, end=end_date, event=True, expand=True
+                )
+            else:
+                # Profil allégé : REPORT limité aux propriétés du profil
+                search = _search_executor.submit(
+                    run, self._search_pruned, calendar, start_date, end_date, properties
+                )
+            searches.append((calendar_obj, search))
+
+        # (calendrier source, objet caldav, id calendarobjects) dans l'ordre des calendriers
+        found = []
+        for calendar_obj, search in searches:
+            calendar_name = calendar_obj["displayname"]
+            try:
+                events = search.result()
+                logger.info(f"Trouvé {len(events)} événement(s) dans '{calendar_name}'")
+
+                # Identifiants calendarobjects en une seule requête (index calendarid, uri)
+                object_ids = self._object_ids_by_uri(
+                    calendar_obj.get('calendarid'),
+                    [object_uri_from_url(event.url) for event in events]
+                )
+                found.extend(
+                    (calendar_obj, event, object_ids.get(object_uri_from_url(event.url)))
+                    for event in events
+                )
+            except BaikalUnavailable:
+                # Pas de liste partielle (elle serait mise en cache) : l'appelant répond 503
+                raise
+            except Exception as e:
+                logger.error(f"Erreur récupération événements de '{calendar_name}': {e}")
+                if failed is not None:
+                    failed.append(calendar_obj['id'])
+                continue
 
-            # Formater les événements
-            formatted_events = []
-            for event in events:  # Limiter le nombre
-                try:
-                    cal = event.icalendar_instance
-                    vevent = None
+        # Extraction ciblée (éventuellement en parallèle), icalendar pour les cas inhabituels
+        extracted = parse_pool.extract_many([event.data for _, event, _ in found])
 
-                    # Trouver le composant VEVENT
-                    for component in cal.walk():
-                        if component.name == "VEVENT":
-                            vevent = component
-                            break
-
-                    if not vevent:
-                        continue
+        formatted_events = []
+        for (calendar_obj, event, object_id), values in zip(found, extracted):
+            try:
+                if values == EXOTIC:
+                    fields = first_vevent_fields(event.icalendar_instance)
+                else:
+                    fields = fields_from_tuple(values) if values is not None else None
 
-                    if vevent.get('summary') == "ddd" or vevent.get('summary') == "Exemple":
-                        print(vevent)
-
-                    # Parser les dates et enlever le timezone pour éviter les décalages horaires
-                    start_date = self._parse_ical_date(vevent.get('dtstart')) if vevent.get('dtstart') else None
-                    end_date = self._parse_ical_date(vevent.get('dtend')) if vevent.get('dtend') else None
-
-                    # Enlever le timezone des dates (garder l'heure telle quelle)
-                    if start_date and hasattr(start_date, 'tzinfo') and start_date.tzinfo:
-                        start_date = start_date.replace(tzinfo=None)
-                    if end_date and hasattr(end_date, 'tzinfo') and end_date.tzinfo:
-                        end_date = end_date.replace(tzinfo=None)
-
-                    # Parser le recurrence-id proprement
-                    recurrence_id = ''
-                    if vevent.get('recurrence-id'):
-                        recurrence_id_parsed = self._parse_ical_date(vevent.get('recurrence-id'))
-                        if recurrence_id_parsed:
-                            # Enlever le timezone et formater en ISO
-                            if hasattr(recurrence_id_parsed, 'tzinfo') and recurrence_id_parsed.tzinfo:
-                                recurrence_id_parsed = recurrence_id_parsed.replace(tzinfo=None)
-                            recurrence_id = recurrence_id_parsed.isoformat() if hasattr(recurrence_id_parsed, 'isoformat') else str(recurrence_id_parsed)
-
-
-                    formatted_event = {
-                        'id': str(vevent.get('uid', event.url)),
-                        'title': str(vevent.get('summary', 'Sans titre')),
-                        'description': str(vevent.get('description', '')),
-                        'location': str(vevent.get('location', '')),
-                        'type': str(vevent.get('eventtype', 'agenda_event')),
-                        'start_date': start_date,
-                        'end_date': end_date,
-                        # 'lastmodified': self._parse_ical_date(vevent.get('last-modified')) if vevent.get('last-modified') else None,
-                        'url': str(event.url),
-                        "client_id": str(vevent.get('CLIENT', '')),
-                        "affair_id": str(vevent.get('AFFAIR', '')),
-                        'calendar_source_name': calendar_name,
-                        'calendar_source_id': calendar_obj['id'],
-                        'calendar_source_uri': calendar_obj['uri'],
-                        'calendar_source_color': calendar_obj["calendarcolor"],
-                        'recurrence_id': recurrence_id
-                    }
-                    formatted_events.append(formatted_event)
-                except Exception as e:
-                    logger.warning(f"Erreur formatage événement: {e}")
+                if fields is None:
                     continue
 
-            return formatted_events
+                record = self._format_fields(
+                    fields, url=str(event.url), calendar_obj=calendar_obj, object_id=object_id
+                )
+                if properties is not None:
+                    # Description non lue (et non vide) : chargée à l'ouverture de l'événement
+                    record.description = None
+                formatted_events.append(record)
+            except Exception as e:
+                logger.warning(f"Erreur formatage événement: {e}")
+                continue
+
+        return formatted_events
+
+    def _search_pruned(self, calendar: Calendar, start_date: datetime, end_date: datetime,
+                       properties) -> List[Event]:
+        """
+        Équivalent de calendar.search(start, end, event=True, expand=True)
+        limité aux propriétés VEVENT demandées (api.caldav_reports)
+
+        Les objets sont élagués avant d'être construits ; seuls les objets
+        récurrents (ou à plusieurs VEVENT) passent par icalendar pour être
+        dépliés et séparés, comme dans caldav.
+        """
+        response = self._session.request(
+            'REPORT', str(calendar.url), data=calendar_query_body(start_date, end_date, properties),
+            headers=REPORT_HEADERS, stream=True,
+        )
+        try:
+            if response.status_code != 207:
+                raise RuntimeError(f"REPORT calendar-query: HTTP {response.status_code}")
+            entries = [
+                (href, data)
+                for href, status, _, data in iter_multistatus(response.iter_content(READ_CHUNK))
+                if status == 200 and data
+            ]
+        finally:
+            response.close()
+
+        events = []
+        for href, data in entries:
+            url = calendar.url.join(href)
+            if url == calendar.url:
+                continue
+            data, recurring = prune_vevent_properties(data, properties)
+            if 'BEGIN:VEVENT' not in data:
+                continue
+            event = Event(self.client, url=url, data=data, parent=calendar)
+            if recurring:
+                event.expand_rrule(start_date, end_date)
+            if recurring or data.count('BEGIN:VEVENT') > 1:
+                events.extend(event.split_expanded())
+            else:
+                events.append(event)
+        return events
+
+    def _format_fields(self, fields: Dict[str, Any], url: str, calendar_obj: Dict[str, Any],
+                       object_id: Optional[int] = None) -> EventRecord:
+        """
+        Construit l'enregistrement compact d'un VEVENT (converti en JSON au rendu)
+
+        Args:
+            fields: Propriétés extraites (extract_vevent ou vevent_fields),
+                dates en heure murale sans timezone
+            url: URL CalDAV de l'objet
+            calendar_obj: Calendrier source (dict de list_calendars)
+            object_id: Clé primaire calendarobjects, pour l'identifiant stable
+        """
+        recurrence_id = fields['recurrence_id'].isoformat() if fields['recurrence_id'] else ''
+
+        return EventRecord(
+            object_id=object_id,
+            uid=fields['uid'] if fields['uid'] is not None else url,
+            title=fields['summary'] if fields['summary'] is not None else 'Sans titre',
+            description=fields['description'] or '',
+            location=fields['location'] or '',
+            type=fields['eventtype'] if fields['eventtype'] is not None else 'agenda_event',
+            start_date=fields['dtstart'],
+            end_date=fields['dtend'],
+            url=url,
+            client_id=fields['client'] or '',
+            affair_id=fields['affair'] or '',
+            recurrence_id=recurrence_id,
+            calendar=calendar_ref(calendar_obj),
+        )
+
+    def _object_ids_by_uri(self, calendarid: Optional[int], uris: List[str]) -> Dict[str, int]:
+        """
+        Résout les clés primaires calendarobjects d'un lot d'URIs d'un calendrier
 
+        Returns:
+            Dictionnaire {uri: id}
+        """
+        if not calendarid or not uris:
+            return {}
+
+        try:
+            rows = BaikalCalendarObject.objects.filter(
+                calendarid=calendarid,
+                uri__in=[uri.encode('utf-8') for uri in set(uris)]
+            ).values_list('uri', 'id')
+            return {binary_to_str(uri): object_id for uri, object_id in rows}
         except Exception as e:
-            logger.error(f"Erreur récupération événements: {e}")
-            return []
+            logger.warning(f"Résolution des identifiants calendarobjects impossible: {e}")
+            return {}
+
+    def get_event_by_id(self, event_id, calendars: List[Dict[str, Any]]) -> Optional[EventRecord]:
+        """
+        Récupère un événement par son identifiant stable (voir api.event_ids)
+
+        L'objet est lu directement par clé primaire dans calendarobjects (ou
+        par URI pour les identifiants de repli "u..."), puis l'occurrence est
+        sélectionnée par sa clé RECURRENCE-ID. Une occurrence issue de
+        l'expansion de la RRULE n'existe pas dans l'objet stocké : elle est
+        reconstruite depuis le VEVENT maître.
+
+        Args:
+            event_id: Identifiant produit par make_event_id
+            calendars: Calendriers accessibles à l'utilisateur (list_calendars)
+
+        Returns:
+            Événement formaté ou None
+        """
+        parsed = parse_event_id(event_id)
+        if not parsed:
+            return None
+        object_ref, key = parsed
+
+        objects = BaikalCalendarObject.objects.only('id', 'calendarid', 'uri', 'calendardata')
+        if isinstance(object_ref, int):
+            obj = objects.filter(id=object_ref).first()
+        else:
+            instance_id, uri = object_ref
+            calendar_ids = [c['calendarid'] for c in calendars if c['id'] == instance_id]
+            obj = objects.filter(
+                calendarid__in=calendar_ids or [c['calendarid'] for c in calendars],
+                uri=uri.encode('utf-8'),
+            ).first()
+        if not obj:
+            return None
+
+        # Vérifier que l'utilisateur a accès au calendrier de l'objet
+        calendar_obj = next((c for c in calendars if c['calendarid'] == obj.calendarid), None)
+        if not calendar_obj:
+            return None
+
+        cal = iCalendar.from_ical(obj.calendardata_str)
+        vevents = [comp for comp in cal.subcomponents if comp.name == "VEVENT"]
+
+        fields = None
+        for component in vevents:
+            component_key = recurrence_key(self._parse_ical_date(component.get('recurrence-id')))
+            if component_key == key:
+                fields = vevent_fields(component)
+                break
+        if fields is None and key:
+            master = next((c for c in vevents if c.get('rrule') and not c.get('recurrence-id')), None)
+            if master is not None:
+                fields = self._occurrence_fields(vevent_fields(master), key)
+        if fields is None:
+            return None
+
+        url = (
+            f"{self.base_url}calendars/{binary_to_str(calendar_obj['principaluri']).rsplit('/', 1)[-1]}"
+            f"/{binary_to_str(calendar_obj['uri'])}/{obj.uri_str}"
+        )
+        return self._format_fields(fields, url=url, calendar_obj=calendar_obj, object_id=obj.id)
+
+    @staticmethod
+    def _occurrence_fields(master: Dict[str, Any], key: str) -> Optional[Dict[str, Any]]:
+        """
+        Propriétés d'une occurrence de la RRULE, déduites du VEVENT maître
+
+        La clé d'occurrence est l'heure murale de début (même convention que
+        le RECURRENCE-ID produit par l'expansion) ; la durée est celle du maître.
+        """
+        try:
+            start = datetime.strptime(key, RECURRENCE_KEY_FORMAT)
+        except ValueError:
+            return None
+        if master['dtstart'] is not None and not isinstance(master['dtstart'], datetime):
+            # Événement sur la journée : DTSTART de type DATE
+            start = start.date()
+        duration = (
+            master['dtend'] - master['dtstart']
+            if master['dtstart'] is not None and master['dtend'] is not None else None
+        )
+        return {
+            **master,
+            'dtstart': start,
+            'dtend': start + duration if duration is not None else None,
+            'recurrence_id': start,
+        }
 
     def _parse_ical_date(self, ical_date):
         """Parse une date iCalendar en datetime Python"""
@@ -230,45 +464,18 @@ class BaikalCalDAVClient:
             if isinstance(end_date, (int, float)):
                 end_date = datetime.fromtimestamp(end_date)
 
-            # ✅ Utiliser icalendar pour générer le bon format avec TZID
-            from icalendar import Event, vText
-
-            cal = iCalendar()
-            cal.add('prodid', '-//Baïkal Python Client//FR')
-            cal.add('version', '2.0')
-
-            event = Event()
-            event.add('uid', uid)
-            event.add('dtstamp', datetime.now(timezone.utc))
-
-            # ✅ Ajouter les dates avec timezone
-            event.add('dtstart', self.format_ical_date(start_date, use_timezone=True))
-            event.add('dtend', self.format_ical_date(end_date, use_timezone=True))
-
-            event.add('summary', event_data.get('title', 'Nouvel événement'))
-            event.add('description', event_data.get('description', ''))
-            event.add('location', event_data.get('location', ''))
-            event.add('status', vText('CONFIRMED'))
-
-            # Ajouter CLIENT et AFFAIR si présents
-            if 'client_id' in event_data and event_data['client_id']:
-                event.add('client', str(event_data['client_id']))
-
-            if 'affair_id' in event_data and event_data['affair_id']:
-                event.add('affair', str(event_data['affair_id']))
-
-            # ✅ RECURRENCE-ID avec timezone si présent
-            if 'recurrence-id' in event_data:
-                event.add('recurrence-id', self.format_ical_date(event_data['recurrence-id'], use_timezone=True))
-
-            # Ajouter SEQUENCE si fourni
-            if 'sequence' in event_data:
-                event.add('sequence', event_data['sequence'])
-
-            cal.add_component(event)
-
-            # Générer le contenu iCalendar
-            ical_content = cal.to_ical()
+            # ⚡ Sérialisation directe (TZID Europe/Paris, VTIMEZONE précalculé)
+            ical_content = serialize_events(uid, [{
+                'title': event_data.get('title', 'Nouvel événement'),
+                'description': event_data.get('description', ''),
+                'location': event_data.get('location', ''),
+                'start': start_date,
+                'end': end_date,
+                'client_id': event_data.get('client_id'),
+                'affair_id': event_data.get('affair_id'),
+                'recurrence_id': event_data.get('recurrence-id'),
+                'sequence': event_data.get('sequence'),
+            }])
 
             # Construire l'URL de l'événement
             # Format: base_url/calendars/user@example.com/calendar_uri/uid.ics
@@ -305,7 +512,7 @@ class BaikalCalDAVClient:
     def create_recurring_event(self, calendar_name: str, uid: str, occurrences: list) -> Dict[str, Any]:
         """
         Crée un événement récurrent avec plusieurs occurrences dans un seul fichier .ics
-        Utilise icalendar pour générer le bon format avec TZID
+        Sérialisé par api.ical_serialize (TZID Europe/Paris)
 
         Args:
             calendar_name: Nom du calendrier
@@ -324,54 +531,8 @@ class BaikalCalDAVClient:
             calendar_url = str(calendar.url).rstrip('/')
             event_url = f"{calendar_url}/{uid}.ics"
 
-            # ✅ Utiliser icalendar pour créer le fichier avec le bon format TZID
-            from icalendar import Event, vText
-
-            cal = iCalendar()
-            cal.add('prodid', '-//Baïkal Python Client//FR')
-            cal.add('version', '2.0')
-
-            # Ajouter un VEVENT pour chaque occurrence
-            for occurrence in occurrences:
-                start_date = occurrence['start']
-                end_date = occurrence['end']
-                recurrence_id = occurrence.get('recurrence_id')
-
-                if isinstance(start_date, (int, float)):
-                    start_date = datetime.fromtimestamp(start_date)
-                if isinstance(end_date, (int, float)):
-                    end_date = datetime.fromtimestamp(end_date)
-
-                # Créer un nouvel événement
-                event = Event()
-                event.add('uid', uid)
-                event.add('dtstamp', datetime.now(timezone.utc))
-
-                # ✅ Ajouter les dates avec timezone (icalendar générera TZID automatiquement)
-                event.add('dtstart', self.format_ical_date(start_date, use_timezone=True))
-                event.add('dtend', self.format_ical_date(end_date, use_timezone=True))
-
-                event.add('summary', occurrence.get('title', 'Nouvel événement'))
-                event.add('description', occurrence.get('description', ''))
-                event.add('location', occurrence.get('location', ''))
-                event.add('status', vText('CONFIRMED'))
-
-                if occurrence.get('client_id'):
-                    event.add('client', str(occurrence['client_id']))
-                if occurrence.get('affair_id'):
-                    event.add('affair', str(occurrence['affair_id']))
-
-                # ✅ RECURRENCE-ID avec timezone (icalendar générera le bon format)
-                if recurrence_id:
-                    event.add('recurrence-id', self.format_ical_date(recurrence_id, use_timezone=True))
-
-                if occurrence.get('sequence'):
-                    event.add('sequence', occurrence['sequence'])
-
-                cal.add_component(event)
-
-            # Générer le contenu iCalendar
-            ical_content = cal.to_ical()
+            # ⚡ Un VEVENT par occurrence, sérialisés directement (même UID)
+            ical_content = serialize_events(uid, occurrences)
 
             # Sauvegarder l'événement via PUT
             headers = {
@@ -409,7 +570,7 @@ class BaikalCalDAVClient:
             date_value: La date à formater
             use_timezone: Si True, retourne un datetime avec timezone pour icalendar
         """
-        paris_tz = pytz.timezone('Europe/Paris')
+        paris_tz = PARIS_TZ
 
         if isinstance(date_value, datetime):
             # Si la date n'a pas de timezone, on localise en Europe/Paris
@@ -742,172 +903,209 @@ class BaikalCalDAVClient:
                     'event_url': event_url
                 }
 
-            # Parser l'iCalendar existant
-            from icalendar import Calendar as iCalendar
-            logger.info("📄 Parsing du calendrier iCal...")
-            cal = iCalendar.from_ical(response.content)
+            return self._apply_update(event_url, response.content, event_data)
 
-            # Trouver le VEVENT
-            vevent = None
-            for component in cal.walk():
-                if component.name == "VEVENT":
-                    vevent = component
-                    break
+        except Exception as e:
+            logger.error(f"Erreur mise à jour événement: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': str(e),
+                'event_url': event_url
+            }
 
-            if not vevent:
-                logger.error("❌ Composant VEVENT non trouvé")
-                return {
+    def update_events(self, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Met à jour plusieurs événements : lecture groupée (calendar-multiget,
+        une requête par calendrier) puis un PUT par événement
+
+        Args:
+            updates: {URL de l'événement: données de mise à jour (voir update_event)}
+
+        Returns:
+            {URL: résultat de update_event}
+        """
+        found = self.multiget(updates)
+        results = {}
+        for event_url, event_data in updates.items():
+            if event_url not in found:
+                results[event_url] = {
                     'success': False,
-                    'error': 'Composant VEVENT non trouvé',
+                    'error': 'Événement non trouvé: HTTP 404',
                     'event_url': event_url
                 }
+                continue
+            try:
+                results[event_url] = self._apply_update(event_url, found[event_url][1], event_data)
+            except Exception as e:
+                logger.error(f"Erreur mise à jour événement: {e}", exc_info=True)
+                results[event_url] = {
+                    'success': False,
+                    'error': str(e),
+                    'event_url': event_url
+                }
+        return results
+
+    def _apply_update(self, event_url: str, ical_data, event_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Applique event_data à l'objet lu (ical_data) et l'enregistre via PUT"""
+        # Parser l'iCalendar existant
+        logger.info("📄 Parsing du calendrier iCal...")
+        cal = iCalendar.from_ical(ical_data)
+
+        # Trouver le VEVENT
+        vevent = None
+        for component in cal.walk():
+            if component.name == "VEVENT":
+                vevent = component
+                break
+
+        if not vevent:
+            logger.error("❌ Composant VEVENT non trouvé")
+            return {
+                'success': False,
+                'error': 'Composant VEVENT non trouvé',
+                'event_url': event_url
+            }
 
-            logger.info("✅ VEVENT trouvé")
+        logger.info("✅ VEVENT trouvé")
 
-            # Sauvegarder l'ancien état
-            old_state = {
-                'summary': str(vevent.get('summary', '')),
-                'description': str(vevent.get('description', '')),
-                'location': str(vevent.get('location', '')),
-                'start': self._parse_ical_date(vevent.get('dtstart')) if vevent.get('dtstart') else None,
-                'end': self._parse_ical_date(vevent.get('dtend')) if vevent.get('dtend') else None
-            }
-            logger.info(f"📊 Ancien état: {old_state}")
-
-            # Appliquer les modifications
-            if 'summary' in event_data:
-                logger.info(f"📝 Mise à jour summary: {event_data['summary']}")
-                vevent['summary'] = event_data['summary']
-
-            if 'description' in event_data:
-                logger.info(f"📝 Mise à jour description: {event_data['description']}")
-                vevent['description'] = event_data['description']
-
-            if 'location' in event_data:
-                logger.info(f"📍 Mise à jour location: {event_data['location']}")
-                vevent['location'] = event_data['location']
-
-            if 'start' in event_data:
-                logger.info(f"📅 Mise à jour start: {event_data['start']}")
-                start_date = event_data['start']
-                if isinstance(start_date, str):
-                    # Gérer les dates avec et sans timezone
-                    if 'Z' in start_date or '+' in start_date:
-                        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                    else:
-                        # Date locale sans timezone
-                        start_date = datetime.fromisoformat(start_date)
-                elif isinstance(start_date, (int, float)):
-                    start_date = datetime.fromtimestamp(start_date)
-
-                # ✅ Convertir en datetime avec timezone Europe/Paris puis retirer le tzinfo
-                logger.info(f"🔄 Formatage date start: {start_date}")
-                paris_tz = pytz.timezone('Europe/Paris')
-                if start_date.tzinfo is None:
-                    start_date = paris_tz.localize(start_date)
-                else:
-                    start_date = start_date.astimezone(paris_tz)
-
-                # Retirer le tzinfo pour avoir un datetime "naive" (sans timezone)
-                start_date_naive = start_date.replace(tzinfo=None)
-
-                # Créer un vDatetime avec le paramètre TZID
-                from icalendar import vDatetime
-                vevent['dtstart'] = vDatetime(start_date_naive)
-                vevent['dtstart'].params['TZID'] = 'Europe/Paris'
-                logger.info(f"✅ Date start formatée: {vevent['dtstart']}")
-
-            if 'end' in event_data:
-                logger.info(f"📅 Mise à jour end: {event_data['end']}")
-                end_date = event_data['end']
-                if isinstance(end_date, str):
-                    # Gérer les dates avec et sans timezone
-                    if 'Z' in end_date or '+' in end_date:
-                        end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                    else:
-                        # Date locale sans timezone
-                        end_date = datetime.fromisoformat(end_date)
-                elif isinstance(end_date, (int, float)):
-                    end_date = datetime.fromtimestamp(end_date)
-
-                # ✅ Convertir en datetime avec timezone Europe/Paris puis retirer le tzinfo
-                logger.info(f"🔄 Formatage date end: {end_date}")
-                paris_tz = pytz.timezone('Europe/Paris')
-                if end_date.tzinfo is None:
-                    end_date = paris_tz.localize(end_date)
+        # Sauvegarder l'ancien état
+        old_state = {
+            'summary': str(vevent.get('summary', '')),
+            'description': str(vevent.get('description', '')),
+            'location': str(vevent.get('location', '')),
+            'start': self._parse_ical_date(vevent.get('dtstart')) if vevent.get('dtstart') else None,
+            'end': self._parse_ical_date(vevent.get('dtend')) if vevent.get('dtend') else None
+        }
+        logger.info(f"📊 Ancien état: {old_state}")
+
+        # Appliquer les modifications
+        if 'summary' in event_data:
+            logger.info(f"📝 Mise à jour summary: {event_data['summary']}")
+            vevent['summary'] = event_data['summary']
+
+        if 'description' in event_data:
+            logger.info(f"📝 Mise à jour description: {event_data['description']}")
+            vevent['description'] = event_data['description']
+
+        if 'location' in event_data:
+            logger.info(f"📍 Mise à jour location: {event_data['location']}")
+            vevent['location'] = event_data['location']
+
+        if 'start' in event_data:
+            logger.info(f"📅 Mise à jour start: {event_data['start']}")
+            start_date = event_data['start']
+            if isinstance(start_date, str):
+                # Gérer les dates avec et sans timezone
+                if 'Z' in start_date or '+' in start_date:
+                    start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
                 else:
-                    end_date = end_date.astimezone(paris_tz)
-
-                # Retirer le tzinfo pour avoir un datetime "naive" (sans timezone)
-                end_date_naive = end_date.replace(tzinfo=None)
-
-                # Créer un vDatetime avec le paramètre TZID
-                from icalendar import vDatetime
-                vevent['dtend'] = vDatetime(end_date_naive)
-                vevent['dtend'].params['TZID'] = 'Europe/Paris'
-                logger.info(f"✅ Date end formatée: {vevent['dtend']}")
-
-            # Mettre à jour CLIENT et AFFAIR si fournis
-            if 'client_id' in event_data:
-                if event_data['client_id']:
-                    vevent['client'] = str(event_data['client_id'])
-                elif 'client' in vevent:
-                    del vevent['client']
-
-            if 'affair_id' in event_data:
-                if event_data['affair_id']:
-                    vevent['affair'] = str(event_data['affair_id'])
-                elif 'affair' in vevent:
-                    del vevent['affair']
-
-            # Mettre à jour LAST-MODIFIED et DTSTAMP
-            from icalendar import vDatetime
-            now = datetime.now(timezone.utc)
-            vevent['last-modified'] = vDatetime(now)
-            vevent['dtstamp'] = vDatetime(now)
-
-            # Nouvel état
-            new_state = {
-                'summary': str(vevent.get('summary', '')),
-                'description': str(vevent.get('description', '')),
-                'location': str(vevent.get('location', '')),
-                'start': self._parse_ical_date(vevent.get('dtstart')) if vevent.get('dtstart') else None,
-                'end': self._parse_ical_date(vevent.get('dtend')) if vevent.get('dtend') else None
-            }
-            logger.info(f"📊 Nouvel état: {new_state}")
+                    # Date locale sans timezone
+                    start_date = datetime.fromisoformat(start_date)
+            elif isinstance(start_date, (int, float)):
+                start_date = datetime.fromtimestamp(start_date)
+
+            # ✅ Convertir en datetime avec timezone Europe/Paris puis retirer le tzinfo
+            logger.info(f"🔄 Formatage date start: {start_date}")
+            paris_tz = pytz.timezone('Europe/Paris')
+            if start_date.tzinfo is None:
+                start_date = paris_tz.localize(start_date)
+            else:
+                start_date = start_date.astimezone(paris_tz)
 
-            # Envoyer la mise à jour via PUT
-            logger.info("📤 Envoi de la mise à jour via PUT...")
-            headers = {'Content-Type': 'text/calendar; charset=utf-8'}
-            ical_data = cal.to_ical()
-            logger.info(f"📄 Taille des données iCal: {len(ical_data)} bytes")
+            # Retirer le tzinfo pour avoir un datetime "naive" (sans timezone)
+            start_date_naive = start_date.replace(tzinfo=None)
 
-            put_response = self._session.put(event_url, data=ical_data, headers=headers)
-            logger.info(f"📥 PUT response status: {put_response.status_code}")
+            # Créer un vDatetime avec le paramètre TZID
+            from icalendar import vDatetime
+            vevent['dtstart'] = vDatetime(start_date_naive)
+            vevent['dtstart'].params['TZID'] = 'Europe/Paris'
+            logger.info(f"✅ Date start formatée: {vevent['dtstart']}")
 
-            if put_response.status_code in [200, 204]:
-                logger.info(f"✅ Événement mis à jour avec succès: {event_url}")
-                return {
-                    'success': True,
-                    'message': 'Événement mis à jour avec succès',
-                    'event_url': event_url,
-                    'old_state': old_state,
-                    'new_state': new_state
-                }
+        if 'end' in event_data:
+            logger.info(f"📅 Mise à jour end: {event_data['end']}")
+            end_date = event_data['end']
+            if isinstance(end_date, str):
+                # Gérer les dates avec et sans timezone
+                if 'Z' in end_date or '+' in end_date:
+                    end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+                else:
+                    # Date locale sans timezone
+                    end_date = datetime.fromisoformat(end_date)
+            elif isinstance(end_date, (int, float)):
+                end_date = datetime.fromtimestamp(end_date)
+
+            # ✅ Convertir en datetime avec timezone Europe/Paris puis retirer le tzinfo
+            logger.info(f"🔄 Formatage date end: {end_date}")
+            paris_tz = pytz.timezone('Europe/Paris')
+            if end_date.tzinfo is None:
+                end_date = paris_tz.localize(end_date)
             else:
-                logger.error(f"❌ Erreur HTTP lors de la mise à jour: {put_response.status_code}")
-                logger.error(f"❌ Response body: {put_response.text}")
-                return {
-                    'success': False,
-                    'error': f'Erreur HTTP {put_response.status_code}',
-                    'event_url': event_url
-                }
+                end_date = end_date.astimezone(paris_tz)
 
-        except Exception as e:
-            logger.error(f"Erreur mise à jour événement: {e}", exc_info=True)
+            # Retirer le tzinfo pour avoir un datetime "naive" (sans timezone)
+            end_date_naive = end_date.replace(tzinfo=None)
+
+            # Créer un vDatetime avec le paramètre TZID
+            from icalendar import vDatetime
+            vevent['dtend'] = vDatetime(end_date_naive)
+            vevent['dtend'].params['TZID'] = 'Europe/Paris'
+            logger.info(f"✅ Date end formatée: {vevent['dtend']}")
+
+        # Mettre à jour CLIENT et AFFAIR si fournis
+        if 'client_id' in event_data:
+            if event_data['client_id']:
+                vevent['client'] = str(event_data['client_id'])
+            elif 'client' in vevent:
+                del vevent['client']
+
+        if 'affair_id' in event_data:
+            if event_data['affair_id']:
+                vevent['affair'] = str(event_data['affair_id'])
+            elif 'affair' in vevent:
+                del vevent['affair']
+
+        # Mettre à jour LAST-MODIFIED et DTSTAMP
+        from icalendar import vDatetime
+        now = datetime.now(timezone.utc)
+        vevent['last-modified'] = vDatetime(now)
+        vevent['dtstamp'] = vDatetime(now)
+
+        # Nouvel état
+        new_state = {
+            'summary': str(vevent.get('summary', '')),
+            'description': str(vevent.get('description', '')),
+            'location': str(vevent.get('location', '')),
+            'start': self._parse_ical_date(vevent.get('dtstart')) if vevent.get('dtstart') else None,
+            'end': self._parse_ical_date(vevent.get('dtend')) if vevent.get('dtend') else None
+        }
+        logger.info(f"📊 Nouvel état: {new_state}")
+
+        # Envoyer la mise à jour via PUT
+        logger.info("📤 Envoi de la mise à jour via PUT...")
+        headers = {'Content-Type': 'text/calendar; charset=utf-8'}
+        ical_data = cal.to_ical()
+        logger.info(f"📄 Taille des données iCal: {len(ical_data)} bytes")
+
+        put_response = self._session.put(event_url, data=ical_data, headers=headers)
+        logger.info(f"📥 PUT response status: {put_response.status_code}")
+
+        if put_response.status_code in [200, 204]:
+            logger.info(f"✅ Événement mis à jour avec succès: {event_url}")
+            return {
+                'success': True,
+                'message': 'Événement mis à jour avec succès',
+                'event_url': event_url,
+                'old_state': old_state,
+                'new_state': new_state,
+                # État enregistré : évite de relire l'objet après le PUT
+                'event': self._format_url_event(vevent, event_url, put_response.headers.get('ETag', ''))
+            }
+        else:
+            logger.error(f"❌ Erreur HTTP lors de la mise à jour: {put_response.status_code}")
+            logger.error(f"❌ Response body: {put_response.text}")
             return {
                 'success': False,
-                'error': str(e),
+                'error': f'Erreur HTTP {put_response.status_code}',
                 'event_url': event_url
             }
 
@@ -1037,26 +1235,117 @@ class BaikalCalDAVClient:
                 logger.error("Composant VEVENT non trouvé")
                 return None
 
-            # Formater l'événement
-            formatted_event = {
-                'id': str(vevent.get('uid', '')),
-                'uid': str(vevent.get('uid', '')),
-                'summary': str(vevent.get('summary', 'Sans titre')),
-                'description': str(vevent.get('description', '')),
-                'location': str(vevent.get('location', '')),
-                'start': self._parse_ical_date(vevent.get('dtstart')) if vevent.get('dtstart') else None,
-                'end': self._parse_ical_date(vevent.get('dtend')) if vevent.get('dtend') else None,
-                'last_modified': self._parse_ical_date(vevent.get('last-modified')) if vevent.get('last-modified') else None,
-                'url': event_url,
-                'etag': response.headers.get('ETag', '')
-            }
-
-            return formatted_event
+            return self._format_url_event(vevent, event_url, response.headers.get('ETag', ''))
 
         except Exception as e:
             logger.error(f"Erreur récupération événement par URL: {e}", exc_info=True)
             return None
 
+    def get_events_by_urls(self, event_urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Récupère plusieurs événements par URL (calendar-multiget, une requête par calendrier)
+
+        Returns:
+            {URL: événement au format get_event_by_url} ; URLs introuvables absentes
+        """
+        events = {}
+        for event_url, (etag, data) in self.multiget(event_urls).items():
+            try:
+                vevent = next(
+                    (c for c in iCalendar.from_ical(data).walk() if c.name == "VEVENT"), None
+                )
+            except Exception as e:
+                logger.error(f"Objet illisible {event_url}: {e}")
+                continue
+            if vevent is not None:
+                events[event_url] = self._format_url_event(vevent, event_url, etag or '')
+        return events
+
+    def _format_url_event(self, vevent, event_url: str, etag: str) -> Dict[str, Any]:
+        """Format de get_event_by_url"""
+        return {
+            'id': str(vevent.get('uid', '')),
+            'uid': str(vevent.get('uid', '')),
+            'summary': str(vevent.get('summary', 'Sans titre')),
+            'description': str(vevent.get('description', '')),
+            'location': str(vevent.get('location', '')),
+            'start': self._parse_ical_date(vevent.get('dtstart')) if vevent.get('dtstart') else None,
+            'end': self._parse_ical_date(vevent.get('dtend')) if vevent.get('dtend') else None,
+            'last_modified': self._parse_ical_date(vevent.get('last-modified')) if vevent.get('last-modified') else None,
+            'url': event_url,
+            'etag': etag
+        }
+
+    def multiget(self, event_urls: Iterable[str]) -> Dict[str, Tuple[Optional[str], str]]:
+        """
+        Lit des objets connus par leur URL avec leur ETag (REPORT calendar-multiget)
+
+        Une requête par calendrier et par tranche de MULTIGET_CHUNK objets,
+        les calendriers en parallèle ; la réponse est lue au fil de l'eau
+        (api.caldav_reports). Un calendrier en erreur est journalisé et ses
+        objets sont absents du résultat.
+
+        Returns:
+            {URL: (ETag, calendar-data)} des objets trouvés
+        """
+        by_collection: Dict[str, List[str]] = {}
+        for event_url in dict.fromkeys(event_urls):
+            by_collection.setdefault(collection_url(event_url), []).append(event_url)
+
+        found = {}
+        if len(by_collection) == 1:
+            (collection, urls), = by_collection.items()
+            readers = [(collection, None, urls)]
+        else:
+            readers = [
+                (collection, _search_executor.submit(
+                    contextvars.copy_context().run, self._multiget_collection, collection, urls
+                ), urls)
+                for collection, urls in by_collection.items()
+            ]
+        for collection, future, urls in readers:
+            try:
+                found.update(future.result() if future else self._multiget_collection(collection, urls))
+            except BaikalUnavailable:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur calendar-multiget sur {collection} ({len(urls)} objet(s)): {e}")
+        return found
+
+    def _multiget_collection(self, collection: str, event_urls: List[str]) -> Dict[str, Tuple[Optional[str], str]]:
+        found = {}
+        for chunk in chunked(event_urls, MULTIGET_CHUNK):
+            by_href = {href_key(event_url): event_url for event_url in chunk}
+            response = self._session.request(
+                'REPORT', collection,
+                data=multiget_body(urlsplit(event_url).path for event_url in chunk),
+                headers=REPORT_HEADERS, stream=True,
+            )
+            try:
+                if response.status_code != 207:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                for href, status, etag, data in iter_multistatus(response.iter_content(READ_CHUNK)):
+                    event_url = by_href.get(href_key(href))
+                    if event_url and status == 200 and data is not None:
+                        found[event_url] = (etag, data)
+            finally:
+                response.close()
+        return found
+
+
+def get_pooled_client(user, base_url: Optional[str] = None) -> BaikalCalDAVClient:
+    """
+    Client CalDAV connecté de l'utilisateur, réutilisé pendant CLIENT_TTL secondes
+
+    La connexion (session Digest, découverte du principal) et la liste des
+    calendriers CalDAV ne sont faites qu'une fois ; les connexions
+    concurrentes d'un même utilisateur attendent le premier client construit.
+    Un changement de mot de passe Baïkal produit un nouveau client.
+    """
+    base_url = base_url or settings.BAIKAL_SERVER_URL
+    key = (base_url, user.email, user.baikal_password)
+    return _clients.get_or_set(key, lambda: BaikalCalDAVClient(base_url=base_url, user=user))
+
 
 # Exemple d'utilisation détaillée
 def main():
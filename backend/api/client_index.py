@@ -0,0 +1,244 @@
+"""
+Index mémoire des noms de clients (Compte, genre=1) par application
+
+La table Compte de MyClic n'a pas d'index sur `nom` : un `nom__icontains`
+déclenche un parcours complet à chaque frappe. Chaque worker garde donc,
+par application, un tableau trié de (token normalisé, id client) interrogé
+par recherche dichotomique sur les préfixes. L'index est chargé une fois,
+puis rafraîchi incrémentalement (nouveaux ids et dateModification).
+
+Les recherches lisent l'index sans verrou : chaque rafraîchissement
+construit de nouvelles structures (copie sur écriture) publiées en une
+seule affectation (_IndexData), jamais modifiées ensuite.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, NamedTuple
+
+from django.db.models import Q
+
+from .myclic_model import Compte
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text: str) -> str:
+    """Minuscules sans accents, pour une comparaison insensible à la casse et aux accents"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un nom normalisé en tokens alphanumériques"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class _IndexData(NamedTuple):
+    """Contenu publié de l'index : clients, noms normalisés et tableau trié (token, id)"""
+    clients: Dict[int, Dict[str, Any]]
+    names: Dict[int, str]
+    tokens: List[tuple]
+
+
+def _sorted_tokens(names: Dict[int, str]) -> List[tuple]:
+    return sorted(
+        (token, client_id) for client_id, name in names.items() for token in set(_TOKEN_RE.findall(name))
+    )
+
+
+class ClientNameIndex:
+    """Index préfixe des clients d'une application"""
+
+    # Délai minimal entre deux rafraîchissements incrémentaux
+    REFRESH_INTERVAL = 60
+    # Rechargement complet périodique (suppressions physiques de comptes)
+    FULL_RELOAD_INTERVAL = 3600
+    # Au-delà, le tableau trié est reconstruit plutôt que mis à jour
+    INCREMENTAL_REBUILD_THRESHOLD = 256
+
+    FIELDS = ('id', 'nom', 'email', 'telephone')
+
+    def __init__(self, application_id: int):
+        self.application_id = application_id
+        self.version = 0
+        self._data = _IndexData({}, {}, [])
+        self._max_id = 0
+        self._last_modified = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # Chargement / rafraîchissement
+    # -------------------------
+    def ensure_fresh(self):
+        """Charge l'index au premier accès, puis le rafraîchit au plus toutes les REFRESH_INTERVAL secondes"""
+        now = time.monotonic()
+        if self._loaded_at and now - self._checked_at < self.REFRESH_INTERVAL:
+            return
+
+        # Premier chargement : bloquant. Ensuite un seul thread rafraîchit,
+        # les autres continuent avec les données courantes.
+        if not self._lock.acquire(blocking=not self._loaded_at):
+            return
+        try:
+            now = time.monotonic()
+            if not self._loaded_at or now - self._loaded_at > self.FULL_RELOAD_INTERVAL:
+                self._full_load()
+            elif now - self._checked_at >= self.REFRESH_INTERVAL:
+                self._incremental_refresh()
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def _full_load(self):
+        started = time.perf_counter()
+        rows = Compte.objects.filter(
+            application_id=self.application_id,
+            genre=1,
+        ).values(*self.FIELDS, 'date_modification')
+
+        clients, names = {}, {}
+        max_id, last_modified = 0, None
+        for row in rows.iterator(chunk_size=5000):
+            modified = row.pop('date_modification')
+            clients[row['id']] = row
+            names[row['id']] = normalize(row['nom'])
+            max_id = max(max_id, row['id'])
+            if modified and (last_modified is None or modified > last_modified):
+                last_modified = modified
+
+        self._data = _IndexData(clients, names, _sorted_tokens(names))
+        self._max_id, self._last_modified = max_id, last_modified
+        self._loaded_at = time.monotonic()
+        self.version += 1
+        logger.info(
+            f"Index clients application {self.application_id}: {len(clients)} clients "
+            f"chargés en {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    def _incremental_refresh(self):
+        changed = Q(id__gt=self._max_id)
+        if self._last_modified:
+            changed |= Q(date_modification__gt=self._last_modified)
+
+        rows = list(Compte.objects.filter(
+            changed,
+            application_id=self.application_id,
+        ).values(*self.FIELDS, 'genre', 'date_modification'))
+        if not rows:
+            return
+
+        rebuild = len(rows) > self.INCREMENTAL_REBUILD_THRESHOLD
+        # Copies modifiées puis publiées : les recherches en cours gardent l'ancienne version
+        clients, names = dict(self._data.clients), dict(self._data.names)
+        tokens = None if rebuild else list(self._data.tokens)
+        for row in rows:
+            genre = row.pop('genre')
+            modified = row.pop('date_modification')
+            client_id = row['id']
+
+            if not rebuild:
+                _remove_tokens(tokens, names.get(client_id), client_id)
+            clients.pop(client_id, None)
+            names.pop(client_id, None)
+
+            if genre == 1:
+                name = normalize(row['nom'])
+                clients[client_id] = row
+                names[client_id] = name
+                if not rebuild:
+                    for token in set(_TOKEN_RE.findall(name)):
+                        bisect.insort(tokens, (token, client_id))
+
+            self._max_id = max(self._max_id, client_id)
+            if modified and (self._last_modified is None or modified > self._last_modified):
+                self._last_modified = modified
+
+        self._data = _IndexData(clients, names, _sorted_tokens(names) if rebuild else tokens)
+        self.version += 1
+        logger.info(f"Index clients application {self.application_id}: {len(rows)} client(s) mis à jour")
+
+    # -------------------------
+    # Recherche
+    # -------------------------
+    @staticmethod
+    def _prefix_ids(tokens: List[tuple], prefix: str) -> set:
+        ids = set()
+        i = bisect.bisect_left(tokens, (prefix,))
+        while i < len(tokens) and tokens[i][0].startswith(prefix):
+            ids.add(tokens[i][1])
+            i += 1
+        return ids
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Recherche les clients dont chaque token de la requête préfixe un token du nom
+
+        Les noms commençant par la requête complète sont classés en premier,
+        puis l'ordre alphabétique s'applique.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        # Une seule version de l'index pour toute la recherche
+        data = self._data
+
+        # Commencer par le token le plus long (le plus sélectif)
+        query_tokens.sort(key=len, reverse=True)
+        ids = self._prefix_ids(data.tokens, query_tokens[0])
+        for token in query_tokens[1:]:
+            if not ids:
+                break
+            ids &= self._prefix_ids(data.tokens, token)
+
+        normalized_query = normalize(query)
+        candidates = [(data.names.get(client_id), client_id) for client_id in ids]
+        ranked = sorted(
+            ((name, client_id) for name, client_id in candidates if name is not None),
+            key=lambda item: (not item[0].startswith(normalized_query), item[0])
+        )
+        results = (data.clients.get(client_id) for _, client_id in ranked[:limit])
+        return [dict(client) for client in results if client]
+
+
+def _remove_tokens(tokens: List[tuple], name: str, client_id: int):
+    """Retire du tableau trié les tokens d'un client (nom normalisé précédent)"""
+    if name is None:
+        return
+    for token in set(_TOKEN_RE.findall(name)):
+        i = bisect.bisect_left(tokens, (token, client_id))
+        if i < len(tokens) and tokens[i] == (token, client_id):
+            del tokens[i]
+
+
+_indexes: Dict[int, ClientNameIndex] = {}
+_indexes_lock = threading.Lock()
+
+# Résultats des requêtes de saisie semi-automatique, par (application, version d'index, requête)
+_search_cache = TTLCache(ttl=300, maxsize=4096)
+
+
+def get_client_index(application_id: int) -> ClientNameIndex:
+    """Retourne l'index clients de l'application (créé à la demande)"""
+    with _indexes_lock:
+        index = _indexes.get(application_id)
+        if index is None:
+            index = _indexes[application_id] = ClientNameIndex(application_id)
+    return index
+
+
+def search_clients(application_id: int, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Recherche de clients servie depuis l'index mémoire et le cache de résultats"""
+    index = get_client_index(application_id)
+    index.ensure_fresh()
+    key = (application_id, index.version, normalize(query), limit)
+    return _search_cache.get_or_set(key, lambda: index.search(query, limit))
@@ -0,0 +1,116 @@
+"""
+Réponses conditionnelles (ETag / 304) pour les listes de calendriers et d'événements
+
+Le validateur est dérivé de l'état Baïkal en deux requêtes indexées : les
+instances de calendrier de l'utilisateur (propriétés affichées) et le
+synctoken de chaque calendrier, incrémenté par Baïkal à chaque écriture d'un
+objet. Un If-None-Match identique renvoie 304 sans client CalDAV ni analyse
+iCalendar.
+
+Le validateur est calculé avant la lecture des données : une écriture
+concurrente produit au pire une réponse récente étiquetée avec l'ancien
+ETag, que la requête suivante invalide (le synctoken a bougé).
+"""
+import hashlib
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from .baikal_models import BaikalCalendar, BaikalCalendarInstance, binary_to_str
+from .label_cache import LABEL_TTL
+
+# À incrémenter quand le format des réponses change (invalide les caches navigateur)
+ETAG_VERSION = 1
+
+INSTANCE_FIELDS = (
+    'id', 'calendarid', 'displayname', 'defined_name', 'uri', 'description', 'calendarcolor',
+    'access', 'share_href', 'share_displayname', 'display', 'user_id',
+)
+
+
+class CalendarState:
+    """Instances de calendrier d'un utilisateur et synctoken / visibilité de chaque calendrier"""
+    __slots__ = ('email', 'instances', 'calendars')
+
+    def __init__(self, email: str, instances: List[tuple], calendars: Dict[int, tuple]):
+        self.email = email
+        self.instances = instances
+        self.calendars = calendars
+
+    @classmethod
+    def load(cls, email: str) -> 'CalendarState':
+        instances = list(
+            BaikalCalendarInstance.objects.filter(principaluri__contains=email)
+            .order_by('id').values_list(*INSTANCE_FIELDS)
+        )
+        calendar_ids = {row[1] for row in instances}
+        calendars = {
+            calendar_id: (synctoken, is_visible)
+            for calendar_id, synctoken, is_visible in BaikalCalendar.objects.filter(
+                id__in=calendar_ids
+            ).values_list('id', 'synctoken', 'is_visible')
+        } if calendar_ids else {}
+        return cls(email, instances, calendars)
+
+    def _digest(self, *extra) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(f"{ETAG_VERSION}|{self.email}".encode('utf-8'))
+        for row in self.instances:
+            hasher.update(repr(tuple(binary_to_str(v) if isinstance(v, (bytes, memoryview)) else v
+                                     for v in row)).encode('utf-8'))
+            hasher.update(repr(self.calendars.get(row[1])).encode('utf-8'))
+        for value in extra:
+            hasher.update(b'|')
+            hasher.update(repr(value).encode('utf-8'))
+        return f'"{hasher.hexdigest()}"'
+
+    def calendars_etag(self) -> str:
+        """Validateur de la liste des calendriers"""
+        return self._digest('calendars')
+
+    def events_etag(self, start_date: datetime, end_date: datetime, include_all: bool,
+                    with_labels: bool = False, detail: str = 'full') -> str:
+        """Validateur de la liste des événements d'une fenêtre (et de son profil de détail)"""
+        # Les libellés client/affaire viennent d'un cache de LABEL_TTL secondes
+        labels_epoch = int(time.time() // LABEL_TTL) if with_labels else None
+        parts = ['events', start_date.isoformat(), end_date.isoformat(), bool(include_all), labels_epoch]
+        if detail != 'full':
+            # Profil complet : validateurs inchangés
+            parts.append(detail)
+        return self._digest(*parts)
+
+
+    def bootstrap_etag(self, start_date: datetime, end_date: datetime) -> str:
+        """Validateur de la réponse groupée (calendriers, événements et libellés)"""
+        return self._digest('bootstrap', start_date.isoformat(), end_date.isoformat(),
+                            int(time.time() // LABEL_TTL))
+
+
+def _matches(request, etag: str) -> bool:
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Comparaison faible (RFC 9110 §13.1.2) : le préfixe W/ est ignoré
+    candidates = {candidate.strip().removeprefix('W/') for candidate in header.split(',')}
+    return etag in candidates
+
+
+def not_modified(request, etag: str) -> Optional[Response]:
+    """Réponse 304 si le client possède déjà cette version, None sinon"""
+    if not _matches(request, etag):
+        return None
+    return with_validator(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def with_validator(response: Response, etag: Optional[str]) -> Response:
+    """Ajoute l'ETag ; no-cache impose une revalidation à chaque affichage"""
+    if etag is None:
+        return response
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,98 @@
+"""
+Identifiants stables des événements exposés au frontend
+
+Un identifiant d'événement est dérivé de la clé primaire de la table
+calendarobjects de Baïkal, suivie de la clé d'occurrence pour les séries :
+
+    "1234"                    -> objet 1234 (événement simple ou maître)
+    "1234-20260123T160000"    -> occurrence RECURRENCE-ID=2026-01-23 16:00 de l'objet 1234
+    "u56_6162632e696373"      -> objet "abc.ics" de l'instance de calendrier 56, quand
+                                 sa clé primaire n'a pas pu être lue (réplica en retard)
+
+Contrairement à hash(), ces identifiants sont identiques dans tous les
+workers gunicorn et se résolvent directement par clé primaire (ou par URI),
+sans parcourir les calendriers.
+"""
+from datetime import date, datetime
+from typing import Optional, Tuple, Union
+from urllib.parse import unquote
+
+RECURRENCE_KEY_FORMAT = '%Y%m%dT%H%M%S'
+
+# Objet désigné par sa clé primaire, ou par (instance de calendrier, URI)
+ObjectRef = Union[int, Tuple[int, str]]
+
+
+def recurrence_key(value) -> str:
+    """
+    Normalise un RECURRENCE-ID (datetime, date ou chaîne ISO) en clé compacte
+
+    Returns:
+        Clé au format YYYYMMDDTHHMMSS, ou '' si aucune occurrence
+    """
+    if not value:
+        return ''
+
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return ''
+
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None).strftime(RECURRENCE_KEY_FORMAT)
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time()).strftime(RECURRENCE_KEY_FORMAT)
+    return ''
+
+
+def make_event_id(object_id: Optional[int], recurrence_id=None, url: str = '',
+                  instance_id: Optional[int] = None) -> str:
+    """
+    Construit l'identifiant stable d'un événement
+
+    Args:
+        object_id: Clé primaire calendarobjects (None si inconnue)
+        recurrence_id: RECURRENCE-ID de l'occurrence (optionnel)
+        url: URL CalDAV de l'objet, utilisée si object_id est inconnu
+        instance_id: Instance de calendrier de l'objet, utilisée si object_id est inconnu
+
+    Returns:
+        Identifiant sous forme de chaîne
+    """
+    key = recurrence_key(recurrence_id)
+
+    if object_id is None:
+        # Repli : URI de l'objet en hexadécimal (ni '-', ni '.', ni '/' dans l'identifiant)
+        object_part = f"u{instance_id or 0}_{object_uri_from_url(url).encode('utf-8').hex()}"
+    else:
+        object_part = str(object_id)
+
+    return f"{object_part}-{key}" if key else object_part
+
+
+def parse_event_id(event_id) -> Optional[Tuple[ObjectRef, str]]:
+    """
+    Décode un identifiant produit par make_event_id
+
+    Returns:
+        (clé primaire ou (instance, URI), clé d'occurrence), None si
+        l'identifiant n'est pas résoluble
+    """
+    object_part, _, key = str(event_id).partition('-')
+    if object_part.isdigit():
+        return int(object_part), key
+
+    instance_part, _, uri_part = object_part[1:].partition('_')
+    if not object_part.startswith('u') or not instance_part.isdigit() or not uri_part:
+        return None
+    try:
+        uri = bytes.fromhex(uri_part).decode('utf-8')
+    except ValueError:
+        return None
+    return (int(instance_part), uri), key
+
+
+def object_uri_from_url(url: str) -> str:
+    """Extrait l'URI de l'objet (dernier segment) d'une URL CalDAV"""
+    return unquote(str(url).rstrip('/').rsplit('/', 1)[-1])
@@ -0,0 +1,153 @@
+"""
+Enregistrement compact d'un événement pour le chemin de lecture
+
+get_events produisait un dict de 16 clés par événement, dont quatre copies
+des métadonnées du calendrier. EventRecord est un objet à __slots__ qui
+référence un CalendarRef partagé (interné : une instance par calendrier et
+par processus) ; la conversion au format JSON du frontend n'a lieu qu'au
+rendu (api.renderers.JSONRenderer).
+
+Pour le code existant, EventRecord se lit comme un dict en lecture
+(event['url'], event.get('client_id')) et accepte l'ajout des libellés
+'client' / 'affair' (label_cache.embed_labels).
+"""
+import sys
+from typing import Any, Dict, Optional
+
+from .baikal_models import binary_to_str
+from .event_ids import make_event_id
+from .ttl_cache import TTLCache
+
+_UNSET = object()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CalendarRef:
+    """Métadonnées d'un calendrier source, partagées par tous ses événements"""
+    __slots__ = ('id', 'calendarid', 'displayname', 'uri', 'color')
+
+    def __init__(self, id, calendarid, displayname, uri, color):
+        self.id = id
+        self.calendarid = calendarid
+        self.displayname = _intern(displayname)
+        self.uri = _intern(uri)
+        self.color = _intern(color)
+
+
+_calendar_refs = TTLCache(ttl=3600, maxsize=10000)
+
+
+def calendar_ref(calendar_obj: Dict[str, Any]) -> CalendarRef:
+    """CalendarRef interné d'un calendrier de list_calendars"""
+    key = (
+        calendar_obj['id'],
+        calendar_obj.get('calendarid'),
+        calendar_obj['displayname'],
+        binary_to_str(calendar_obj['uri']),
+        binary_to_str(calendar_obj['calendarcolor']),
+    )
+    ref = _calendar_refs.get(key)
+    if ref is None:
+        ref = CalendarRef(*key)
+        _calendar_refs.set(key, ref)
+    return ref
+
+
+class EventRecord:
+    """Événement formaté, converti en dict seulement au rendu (to_wire)"""
+    __slots__ = (
+        'object_id', 'uid', 'title', 'description', 'location', 'type', 'start_date', 'end_date',
+        'url', 'client_id', 'affair_id', 'recurrence_id', 'calendar', 'client', 'affair',
+    )
+
+    def __init__(self, object_id: Optional[int], uid: str, title: str, description: Optional[str], location: str,
+                 type: str, start_date, end_date, url: str, client_id: str, affair_id: str,
+                 recurrence_id: str, calendar: CalendarRef):
+        self.object_id = object_id
+        self.uid = uid
+        self.title = title
+        self.description = description
+        self.location = location
+        self.type = _intern(type)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.url = url
+        self.client_id = _intern(client_id)
+        self.affair_id = _intern(affair_id)
+        self.recurrence_id = recurrence_id
+        self.calendar = calendar
+        self.client = _UNSET
+        self.affair = _UNSET
+
+    def copy(self) -> 'EventRecord':
+        """Copie superficielle (les enregistrements en cache ne sont pas modifiés)"""
+        clone = EventRecord.__new__(EventRecord)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    @property
+    def id(self) -> str:
+        return make_event_id(self.object_id, self.recurrence_id, url=self.url, instance_id=self.calendar.id)
+
+    def to_wire(self) -> Dict[str, Any]:
+        """Format JSON attendu par le frontend"""
+        calendar = self.calendar
+        wire = {
+            'id': self.id,
+            'uid': self.uid,
+            'title': self.title,
+            'description': self.description,
+            'location': self.location,
+            'type': self.type,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'url': self.url,
+            'client_id': self.client_id,
+            'affair_id': self.affair_id,
+            'calendar_source_name': calendar.displayname,
+            'calendar_source_id': calendar.id,
+            'calendar_source_uri': calendar.uri,
+            'calendar_source_color': calendar.color,
+            'recurrence_id': self.recurrence_id,
+        }
+        if self.client is not _UNSET:
+            wire['client'] = self.client
+        if self.affair is not _UNSET:
+            wire['affair'] = self.affair
+        return wire
+
+    # Lecture façon dict pour le code existant
+    _CALENDAR_KEYS = {
+        'calendar_source_name': 'displayname',
+        'calendar_source_id': 'id',
+        'calendar_source_uri': 'uri',
+        'calendar_source_color': 'color',
+    }
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._CALENDAR_KEYS:
+            return getattr(self.calendar, self._CALENDAR_KEYS[key])
+        if key == 'id' or (key in self.__slots__ and key != 'calendar'):
+            value = getattr(self, key)
+            if value is _UNSET:
+                raise KeyError(key)
+            return value
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in ('client', 'affair'):
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __repr__(self):
+        return f"<EventRecord {self.id} {self.title!r}>"
@@ -0,0 +1,261 @@
+"""
+Cache des listes d'événements par fenêtre, avec calcul unique par clé
+
+La clé associe le validateur de la fenêtre (CalendarState.events_etag :
+utilisateur, fenêtre, profil de détail, propriétés des instances et
+synctoken de chaque calendrier) à l'ensemble des calendriers sélectionnés. Toute écriture dans
+un calendrier change la clé ; l'entrée précédente n'est plus lue et expire
+d'elle-même.
+
+Les requêtes identiques et simultanées (tableau de bord, mode groupe, onglets
+multiples) partagent une seule lecture CalDAV (TTLCache.get_or_set). Une
+liste filtrée (calendriers affichés) est extraite de la liste include_all de
+la même fenêtre lorsque celle-ci est en cache ou en cours de calcul.
+
+Mode dégradé : la dernière lecture réussie de chaque fenêtre est conservée
+(LAST_GOOD_TTL). Si la lecture CalDAV échoue, ou dépasse max_wait secondes,
+cette version est servie marquée périmée pendant que la lecture continue
+(ou est retentée) en arrière-plan. Un calendrier en erreur dans une lecture
+par ailleurs réussie reprend ses événements de la version précédente, avec
+sa propre date de lecture (WindowEvents.fetched_at).
+
+Les EventRecord en cache sont partagés entre requêtes : ils ne doivent pas
+être modifiés (copier avant d'ajouter les libellés).
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from django.db import connections
+
+from config.db_router import carry_pinning
+
+from .caldav_reports import DETAIL_FULL
+from .conditional import INSTANCE_FIELDS, CalendarState
+from .event_record import EventRecord
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+EVENTS_TTL = 120
+# Lecture où un calendrier a échoué : relue plus tôt
+PARTIAL_TTL = 15
+LAST_GOOD_TTL = 24 * 3600
+# Attente maximale d'une lecture CalDAV quand une version précédente peut être servie
+SWR_WAIT = 2.0
+RETRY_DELAY = 15
+
+STALE_HEADER = 'X-Stale-Age'
+FRESHNESS_HEADER = 'X-Calendar-Fetched-At'
+
+_events = TTLCache(ttl=EVENTS_TTL, maxsize=256)
+_last_good = TTLCache(ttl=LAST_GOOD_TTL, maxsize=512)
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='events-refresh')
+_retrying = set()
+_retrying_lock = threading.Lock()
+
+_ID = INSTANCE_FIELDS.index('id')
+_CALENDARID = INSTANCE_FIELDS.index('calendarid')
+_DESCRIPTION = INSTANCE_FIELDS.index('description')
+_DISPLAY = INSTANCE_FIELDS.index('display')
+
+
+class WindowEvents:
+    """Événements d'une fenêtre et date de lecture (epoch) de chaque calendrier"""
+    __slots__ = ('events', 'fetched_at', 'stale')
+
+    def __init__(self, events: List[EventRecord], fetched_at: Dict[int, Optional[float]], stale: bool = False):
+        self.events = events
+        self.fetched_at = fetched_at
+        self.stale = stale
+
+    @property
+    def partial(self) -> bool:
+        """Au moins un calendrier n'a pas été relu lors de la dernière lecture"""
+        latest = max((t for t in self.fetched_at.values() if t is not None), default=None)
+        return any(t is None or t != latest for t in self.fetched_at.values())
+
+    def age(self) -> float:
+        """Âge en secondes du calendrier le moins récent"""
+        times = [t for t in self.fetched_at.values() if t is not None]
+        return time.time() - min(times) if times else 0.0
+
+    def restricted(self, instance_ids: FrozenSet[int]) -> 'WindowEvents':
+        return WindowEvents(
+            [event for event in self.events if event.calendar.id in instance_ids],
+            {cid: t for cid, t in self.fetched_at.items() if cid in instance_ids},
+            self.stale,
+        )
+
+    def as_stale(self) -> 'WindowEvents':
+        return WindowEvents(self.events, self.fetched_at, stale=True)
+
+    def fetched_at_iso(self) -> Dict[str, Optional[str]]:
+        """Date de lecture (ISO, UTC) de chaque calendrier, None s'il n'a jamais été lu"""
+        return {
+            str(cid): datetime.fromtimestamp(t, timezone.utc).isoformat() if t else None
+            for cid, t in sorted(self.fetched_at.items())
+        }
+
+    def headers(self) -> Dict[str, str]:
+        """En-têtes de fraîcheur (date de lecture par calendrier, âge si version périmée)"""
+        headers = {FRESHNESS_HEADER: json.dumps(self.fetched_at_iso(), separators=(',', ':'))}
+        if self.stale or self.partial:
+            headers[STALE_HEADER] = str(int(self.age()))
+        return headers
+
+
+def selected_instance_ids(state: CalendarState, include_all) -> FrozenSet[int]:
+    """
+    Instances affichées dans la liste des événements
+
+    Mêmes règles que list_calendars + filtre de la vue : calendrier visible,
+    ressources exclues, calendriers masqués exclus hors mode include_all.
+    """
+    selected = set()
+    for row in state.instances:
+        visibility = state.calendars.get(row[_CALENDARID])
+        if not visibility or not visibility[1]:
+            continue  # Calendrier parent invisible (ou supprimé)
+
+        # Filtrer les ressources (description contient "Resource")
+        description = row[_DESCRIPTION]
+        if description and 'Resource' in description:
+            continue
+
+        # En mode "include_all", on ignore le filtre display
+        if not include_all and (row[_DISPLAY] == 0 or row[_DISPLAY] == 'O'):
+            continue
+        selected.add(row[_ID])
+    return frozenset(selected)
+
+
+def _key(state: CalendarState, start_date: datetime, end_date: datetime,
+         instance_ids: FrozenSet[int], detail: str = DETAIL_FULL) -> Tuple[str, FrozenSet[int]]:
+    # include_all n'entre pas dans la clé : deux modes qui sélectionnent les mêmes calendriers se partagent l'entrée
+    return state.events_etag(start_date, end_date, include_all=False, detail=detail), instance_ids
+
+
+def _window_ttl(window: WindowEvents) -> Optional[float]:
+    # Lecture où un calendrier a échoué : relue après PARTIAL_TTL
+    return PARTIAL_TTL if window.partial else None
+
+
+def _refresh(key, compute) -> WindowEvents:
+    """Lecture en arrière-plan (ou pour le compte d'une requête qui attend au plus max_wait)"""
+    try:
+        return _events.get_or_set(key, compute, ttl=_window_ttl)
+    finally:
+        # Rendre au pool les connexions empruntées par ce thread
+        connections.close_all()
+
+
+def _schedule_retry(key, compute):
+    """Relance la lecture d'une fenêtre en échec après RETRY_DELAY secondes (une à la fois)"""
+    with _retrying_lock:
+        if key in _retrying:
+            return
+        _retrying.add(key)
+
+    def retry():
+        try:
+            _refresh(key, compute)
+        except Exception as e:
+            logger.warning(f"Nouvel échec de lecture de la fenêtre: {e}")
+        finally:
+            with _retrying_lock:
+                _retrying.discard(key)
+
+    timer = threading.Timer(RETRY_DELAY, lambda: _refresh_executor.submit(retry))
+    timer.daemon = True
+    timer.start()
+
+
+def load_events(state: CalendarState, get_client: Callable, start_date: datetime,
+                end_date: datetime, include_all,
+                calendars: Optional[List[Dict[str, Any]]] = None,
+                max_wait: Optional[float] = None, detail: str = DETAIL_FULL) -> WindowEvents:
+    """
+    Événements d'une fenêtre, depuis le cache ou lus via CalDAV
+
+    Args:
+        state: État des calendriers de l'utilisateur (clé du cache)
+        get_client: Fabrique du client CalDAV, appelée seulement en cas d'absence
+        include_all: Mode groupe (calendriers masqués inclus)
+        calendars: Liste des calendriers déjà lue (list_calendar_dicts), relue sinon
+        max_wait: Attente maximale (secondes) avant de servir la dernière version
+            réussie ; None : attendre la lecture
+        detail: Profil de caldav_reports.PROFILES (entrées distinctes par profil)
+
+    Raises:
+        Erreur de la lecture CalDAV quand aucune version précédente n'existe
+    """
+    selected = selected_instance_ids(state, include_all)
+    key = _key(state, start_date, end_date, selected, detail)
+
+    if not include_all:
+        superset = selected_instance_ids(state, True)
+        if superset != selected:
+            # Liste include_all de la même fenêtre déjà lue (ou en cours) : filtrage en mémoire
+            window = _events.get_or_join(_key(state, start_date, end_date, superset, detail))
+            if window is not None:
+                return window.restricted(selected)
+
+    last_good_key = (state.email, start_date, end_date, selected, detail)
+    previous = _last_good.get(last_good_key)
+
+    def compute():
+        client = get_client()
+        available = calendars if calendars is not None else client.list_calendars()
+        failed = []
+        # Événements de tous les calendriers, extraits en un seul lot
+        events = client.get_events_many(
+            [cal for cal in available if cal['id'] in selected],
+            start_date=start_date, end_date=end_date, failed=failed, detail=detail,
+        )
+        now = time.time()
+        fetched_at = {cid: now for cid in selected}
+        if failed:
+            # Calendriers en erreur : événements et date de la lecture précédente
+            last = _last_good.get(last_good_key)
+            failed_ids = set(failed)
+            for cid in failed_ids:
+                fetched_at[cid] = last.fetched_at.get(cid) if last else None
+            if last:
+                events = events + [event for event in last.events if event.calendar.id in failed_ids]
+        window = WindowEvents(events, fetched_at)
+        _last_good.set(last_good_key, window)
+        return window
+
+    if previous is None or max_wait is None:
+        # Rien à servir à la place : attendre la lecture
+        return _events.get_or_set(key, compute, ttl=_window_ttl)
+
+    cached = _events.get(key)
+    if cached is not None:
+        return cached
+
+    future = _refresh_executor.submit(carry_pinning(_refresh), key, compute)
+    try:
+        return future.result(timeout=max_wait)
+    except FutureTimeout:
+        logger.info(f"⏳ Lecture CalDAV lente pour {state.email}, version précédente servie")
+        return previous.as_stale()
+    except Exception as e:
+        logger.warning(f"Lecture CalDAV en échec pour {state.email}, version précédente servie: {e}")
+        _schedule_retry(key, compute)
+        return previous.as_stale()
+
+
+def is_cached(state: CalendarState, start_date: datetime, end_date: datetime, include_all,
+              detail: str = DETAIL_FULL) -> bool:
+    """Indique si la fenêtre est déjà en cache (directement ou via include_all) pour l'état courant"""
+    selected = selected_instance_ids(state, include_all)
+    if _events.get(_key(state, start_date, end_date, selected, detail)) is not None:
+        return True
+    superset = selected_instance_ids(state, True)
+    return _events.get(_key(state, start_date, end_date, superset, detail)) is not None
@@ -0,0 +1,385 @@
+"""
+Calcul de disponibilités (free/busy) sur plusieurs calendriers
+
+Les occupations sont lues directement dans la table calendarobjects de
+Baïkal (index calendarid + firstoccurence/lastoccurence), sans passer par
+CalDAV. Chaque objet est analysé une seule fois par version (etag), par
+lecture ciblée des propriétés d'occupation (icalendar en repli), et gardé
+en cache ; la fenêtre demandée est ensuite projetée, puis les intervalles
+sont fusionnés par balayage (sweep-line).
+
+Les heures sont des heures murales Europe/Paris sans timezone, comme dans
+le reste de l'API (voir BaikalCalDAVClient.get_events).
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pytz
+from dateutil.rrule import rrulestr
+from icalendar import Calendar as iCalendar, vDuration
+
+from .baikal_models import BaikalCalendarObject
+from .ical_extract import ExoticICalendar, extract_vevent_properties, parse_date_value
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PARIS_TZ = pytz.timezone('Europe/Paris')
+
+Interval = Tuple[datetime, datetime]
+
+# Composants analysés par (id calendarobjects, etag)
+_parsed_objects = TTLCache(ttl=3600, maxsize=100000)
+
+
+def to_wall_clock(value) -> Optional[datetime]:
+    """Convertit une date iCalendar en datetime naïf, heure murale Europe/Paris"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(PARIS_TZ).replace(tzinfo=None)
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, dt_time.min)
+    return None
+
+
+class BusyComponent:
+    """
+    VEVENT réduit à ce qui compte pour l'occupation
+
+    busy=False : occurrence modifiée annulée ou transparente, qui retire
+    seulement l'occurrence correspondante de la série.
+    """
+    __slots__ = ('start', 'duration', 'rrule', 'exdates', 'recurrence_id', 'busy')
+
+    def __init__(self, start: datetime, duration: timedelta, rrule: Optional[str] = None,
+                 exdates: Iterable[datetime] = (), recurrence_id: Optional[datetime] = None,
+                 busy: bool = True):
+        self.start = start
+        self.duration = duration
+        self.rrule = rrule
+        self.exdates = frozenset(exdates)
+        self.recurrence_id = recurrence_id
+        self.busy = busy
+
+    def occurrences(self, window_start: datetime, window_end: datetime) -> List[Interval]:
+        """Occurrences de ce composant qui chevauchent la fenêtre"""
+        if not self.busy:
+            return []
+        if not self.rrule:
+            end = self.start + self.duration
+            return [(self.start, end)] if self.start < window_end and end > window_start else []
+
+        try:
+            rule = rrulestr(self.rrule, dtstart=self.start, ignoretz=True)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"RRULE ignorée ({self.rrule}): {e}")
+            return [(self.start, self.start + self.duration)]
+
+        return [
+            (occurrence, occurrence + self.duration)
+            for occurrence in rule.between(window_start - self.duration, window_end, inc=True)
+            if occurrence not in self.exdates
+        ]
+
+
+# Propriétés VEVENT lues par l'extraction ciblée
+BUSY_PROPERTIES = frozenset((
+    'DTSTART', 'DTEND', 'DURATION', 'RRULE', 'EXDATE', 'RECURRENCE-ID', 'STATUS', 'TRANSP',
+))
+
+
+def _busy_component(status: str, transp: str, raw_start, raw_end, duration: Optional[timedelta],
+                    rrule: Optional[str], exdates: Iterable, recurrence_id) -> Optional[BusyComponent]:
+    """Composant d'occupation d'un VEVENT (dates icalendar ou heures murales), None s'il ne compte pas"""
+    busy = status.upper() != 'CANCELLED' and transp.upper() != 'TRANSPARENT'
+    if raw_start is None or (not busy and recurrence_id is None):
+        return None
+
+    start = to_wall_clock(raw_start)
+    if raw_end is not None:
+        end = to_wall_clock(raw_end)
+    elif duration is not None:
+        end = start + duration
+    else:
+        # RFC 5545 : sans DTEND, journée entière pour une date, instantané sinon
+        end = start + (timedelta(days=1) if not isinstance(raw_start, datetime) else timedelta())
+
+    return BusyComponent(
+        start=start,
+        duration=max(end - start, timedelta()),
+        rrule=rrule,
+        exdates=[to_wall_clock(exdate) for exdate in exdates],
+        recurrence_id=to_wall_clock(recurrence_id),
+        busy=busy,
+    )
+
+
+def _busy_date(params: Dict[str, str], value: str):
+    """Date d'une propriété en heure murale Europe/Paris ; autre TZID : icalendar"""
+    value = value.strip()
+    utc = value.endswith('Z')
+    tzid = params.get('TZID')
+    if tzid is not None and (utc or tzid != PARIS_TZ.zone):
+        raise ExoticICalendar(f"TZID={tzid}")
+    parsed = parse_date_value(value, params)
+    return to_wall_clock(pytz.utc.localize(parsed)) if utc else parsed
+
+
+def extract_busy_components(calendardata) -> List[BusyComponent]:
+    """
+    parse_busy_components sans construire l'arbre icalendar (api.ical_extract)
+
+    Raises:
+        ExoticICalendar: entrée à confier à icalendar (TZID autre
+            qu'Europe/Paris, propriété répétée...)
+    """
+    components = []
+    for properties in extract_vevent_properties(calendardata, BUSY_PROPERTIES):
+        def single(name):
+            values = properties.get(name)
+            if not values:
+                return None
+            if len(values) > 1:
+                raise ExoticICalendar(f"{name} répété")
+            return values[0]
+
+        dtstart, dtend, duration, rrule, recurrence_id, status, transp = (
+            single(name) for name in ('DTSTART', 'DTEND', 'DURATION', 'RRULE', 'RECURRENCE-ID', 'STATUS', 'TRANSP')
+        )
+        component = _busy_component(
+            status=status[1].strip() if status else '',
+            transp=transp[1].strip() if transp else '',
+            raw_start=_busy_date(*dtstart) if dtstart else None,
+            raw_end=_busy_date(*dtend) if dtend else None,
+            duration=vDuration.from_ical(duration[1].strip()) if duration else None,
+            rrule=rrule[1].strip() if rrule else None,
+            exdates=[
+                _busy_date(params, value)
+                for params, values in properties.get('EXDATE', ())
+                for value in values.split(',')
+            ],
+            recurrence_id=_busy_date(*recurrence_id) if recurrence_id else None,
+        )
+        if component is not None:
+            components.append(component)
+    return components
+
+
+def parse_busy_components(calendardata) -> List[BusyComponent]:
+    """
+    Extrait les VEVENT occupants (ni annulés, ni transparents) d'un objet
+    iCalendar, et les occurrences modifiées annulées qui libèrent leur créneau
+
+    Lecture ciblée (extract_busy_components), icalendar pour les entrées
+    inhabituelles.
+    """
+    if isinstance(calendardata, memoryview):
+        calendardata = calendardata.tobytes()
+    try:
+        return extract_busy_components(calendardata)
+    except ValueError:
+        # ExoticICalendar, ou DURATION / RRULE illisible
+        return icalendar_busy_components(calendardata)
+
+
+def icalendar_busy_components(calendardata) -> List[BusyComponent]:
+    """parse_busy_components avec icalendar (référence)"""
+    components = []
+    for vevent in iCalendar.from_ical(calendardata).walk('VEVENT'):
+        raw_exdates = vevent.get('exdate') or []
+        if not isinstance(raw_exdates, list):
+            raw_exdates = [raw_exdates]
+        rrule = vevent.get('rrule')
+        component = _busy_component(
+            status=str(vevent.get('status', '')),
+            transp=str(vevent.get('transp', '')),
+            raw_start=vevent.get('dtstart').dt if vevent.get('dtstart') else None,
+            raw_end=vevent.get('dtend').dt if vevent.get('dtend') else None,
+            duration=vevent.get('duration').dt if vevent.get('duration') else None,
+            rrule=rrule.to_ical().decode('utf-8') if rrule else None,
+            exdates=[d.dt for exdate in raw_exdates for d in exdate.dts],
+            recurrence_id=vevent.get('recurrence-id').dt if vevent.get('recurrence-id') else None,
+        )
+        if component is not None:
+            components.append(component)
+    return components
+
+
+def object_intervals(components: List[BusyComponent], window_start: datetime, window_end: datetime) -> List[Interval]:
+    """Occurrences d'un objet dans la fenêtre, en tenant compte des occurrences modifiées (RECURRENCE-ID)"""
+    overridden = {c.recurrence_id for c in components if c.recurrence_id is not None}
+    intervals = []
+    for component in components:
+        for interval in component.occurrences(window_start, window_end):
+            # Une occurrence de la série remplacée par un VEVENT RECURRENCE-ID n'est pas comptée deux fois
+            if component.rrule and interval[0] in overridden:
+                continue
+            intervals.append(interval)
+    return intervals
+
+
+def load_components(objects: Iterable[Tuple[int, Any]]) -> Dict[int, List[BusyComponent]]:
+    """
+    Composants occupants des objets (id, etag) donnés
+
+    calendardata n'est lu que pour les objets absents du cache (ou dont
+    l'etag a changé).
+    """
+    parsed = {}
+    missing = []
+    for object_id, etag in objects:
+        components = _parsed_objects.get((object_id, bytes(etag or b'')))
+        if components is None:
+            missing.append(object_id)
+        else:
+            parsed[object_id] = components
+
+    if missing:
+        for object_id, etag, calendardata in BaikalCalendarObject.objects.filter(
+            id__in=missing
+        ).values_list('id', 'etag', 'calendardata').iterator(chunk_size=500):
+            try:
+                components = parse_busy_components(calendardata)
+            except Exception as e:
+                logger.warning(f"Objet {object_id} ignoré pour le calcul de disponibilités: {e}")
+                components = []
+            _parsed_objects.set((object_id, bytes(etag or b'')), components)
+            parsed[object_id] = components
+    return parsed
+
+
+def load_busy_intervals(calendar_ids: Iterable[int], window_start: datetime,
+                        window_end: datetime) -> Dict[int, List[Interval]]:
+    """
+    Intervalles occupés par calendrier (calendars.id) dans la fenêtre
+
+    Une première requête légère (id, etag) sélectionne les objets de la
+    fenêtre ; calendardata n'est lu que pour les objets absents du cache.
+    """
+    calendar_ids = list(set(calendar_ids))
+    if not calendar_ids:
+        return {}
+
+    # firstoccurence / lastoccurence sont des timestamps UTC ; une marge d'un
+    # jour couvre le décalage heure murale / UTC
+    start_ts = int((window_start - timedelta(days=1)).timestamp())
+    end_ts = int((window_end + timedelta(days=1)).timestamp())
+
+    rows = list(BaikalCalendarObject.objects.filter(
+        calendarid__in=calendar_ids,
+        componenttype=b'VEVENT',
+        firstoccurence__lt=end_ts,
+        lastoccurence__gt=start_ts,
+    ).values_list('id', 'etag', 'calendarid'))
+
+    parsed = load_components((object_id, etag) for object_id, etag, _ in rows)
+
+    busy = defaultdict(list)
+    for object_id, _, calendarid in rows:
+        busy[calendarid].extend(object_intervals(parsed.get(object_id, []), window_start, window_end))
+    return busy
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Fusionne des intervalles par balayage : +1 à chaque début, -1 à chaque fin,
+    un bloc occupé couvre les zones où le compteur est positif
+    """
+    events = []
+    for start, end in intervals:
+        if end > start:
+            events.append((start, 1))
+            events.append((end, -1))
+    # À instant égal, les fins avant les débuts : des créneaux bout à bout restent distincts
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    merged, depth, block_start = [], 0, None
+    for instant, delta in events:
+        if depth == 0 and delta == 1:
+            block_start = instant
+        depth += delta
+        if depth == 0:
+            merged.append((block_start, instant))
+    return merged
+
+
+def free_slots(busy: List[Interval], window_start: datetime, window_end: datetime, duration: timedelta,
+               day_start: dt_time = dt_time(8, 0), day_end: dt_time = dt_time(18, 0),
+               weekdays: Iterable[int] = (0, 1, 2, 3, 4)) -> List[Interval]:
+    """
+    Créneaux libres d'au moins `duration` dans les plages ouvrées de la fenêtre
+
+    Args:
+        busy: Blocs occupés fusionnés et triés (merge_intervals)
+        day_start / day_end: Plage horaire ouvrée de chaque jour
+        weekdays: Jours ouvrés (0 = lundi)
+    """
+    weekdays = set(weekdays)
+    slots = []
+    index = 0
+    day = window_start.date()
+
+    while day <= window_end.date():
+        if day.weekday() in weekdays:
+            cursor = max(datetime.combine(day, day_start), window_start)
+            limit = min(datetime.combine(day, day_end), window_end)
+
+            # Blocs occupés du jour (busy est trié : on avance un seul index)
+            while index < len(busy) and busy[index][1] <= cursor:
+                index += 1
+            j = index
+            while cursor < limit:
+                if j < len(busy) and busy[j][0] < limit:
+                    gap_end = min(busy[j][0], limit)
+                    if gap_end - cursor >= duration:
+                        slots.append((cursor, gap_end))
+                    cursor = max(cursor, busy[j][1])
+                    j += 1
+                else:
+                    if limit - cursor >= duration:
+                        slots.append((cursor, limit))
+                    break
+        day += timedelta(days=1)
+    return slots
+
+
+def compute_freebusy(calendars: List[Dict[str, Any]], window_start: datetime, window_end: datetime,
+                     duration: timedelta, **slot_options) -> Dict[str, Any]:
+    """
+    Disponibilités communes d'un ensemble de calendriers
+
+    Args:
+        calendars: Instances de calendrier ({'id', 'calendarid', 'displayname'})
+
+    Returns:
+        {'calendars': [{id, displayname, busy}], 'busy': [...], 'free': [...]}
+    """
+    by_calendar = load_busy_intervals(
+        (cal['calendarid'] for cal in calendars), window_start, window_end
+    )
+
+    def serialize(intervals):
+        return [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in intervals]
+
+    per_calendar = []
+    all_intervals = []
+    for cal in calendars:
+        intervals = by_calendar.get(cal['calendarid'], [])
+        all_intervals.extend(intervals)
+        per_calendar.append({
+            'id': cal['id'],
+            'displayname': cal.get('displayname'),
+            'busy': serialize(merge_intervals(intervals)),
+        })
+
+    busy = merge_intervals(all_intervals)
+    return {
+        'calendars': per_calendar,
+        'busy': serialize(busy),
+        'free': serialize(free_slots(busy, window_start, window_end, duration, **slot_options)),
+    }
@@ -0,0 +1,334 @@
+"""
+Extraction ciblée des propriétés VEVENT pour les chemins de lecture
+
+La liste des événements n'utilise qu'une dizaine de propriétés du premier
+VEVENT de chaque objet. Plutôt que de construire l'arbre icalendar complet,
+le texte est parcouru ligne par ligne (dépliage RFC 5545 §3.1), les
+composants imbriqués (VALARM, VTIMEZONE, ...) sont ignorés et seules les
+propriétés utiles sont décodées.
+
+Les entrées inhabituelles (propriété répétée, ENCODING, valeur de date non
+standard, paramètre entre guillemets mal formé...) lèvent ExoticICalendar :
+l'appelant se rabat alors sur icalendar, qui reste la référence.
+
+Les dates suivent la convention de la liste des événements : heure murale
+dans le TZID de la propriété, sans timezone ; VALUE=DATE donne une date.
+vevent_fields produit le même dictionnaire depuis un composant icalendar.
+
+extract_vevent_properties parcourt de la même façon tous les VEVENT d'un
+objet et rend les propriétés demandées non décodées (calcul des
+disponibilités, api.freebusy).
+"""
+from datetime import date, datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+
+# Propriétés extraites -> clé du résultat
+PROPERTIES = {
+    'UID': 'uid',
+    'SUMMARY': 'summary',
+    'DESCRIPTION': 'description',
+    'LOCATION': 'location',
+    'DTSTART': 'dtstart',
+    'DTEND': 'dtend',
+    'RECURRENCE-ID': 'recurrence_id',
+    'CLIENT': 'client',
+    'AFFAIR': 'affair',
+    'EVENTTYPE': 'eventtype',
+}
+
+DATE_PROPERTIES = frozenset(('DTSTART', 'DTEND', 'RECURRENCE-ID'))
+
+
+class ExoticICalendar(ValueError):
+    """Entrée hors du sous-ensemble géré : utiliser icalendar"""
+
+
+def _unescape_text(value: str) -> str:
+    """Décodage TEXT (RFC 5545 §3.3.11) : \\n, \\N, \\, \\; et \\\\"""
+    if '\\' not in value:
+        return value
+    out = []
+    i, n = 0, len(value)
+    while i < n:
+        char = value[i]
+        if char == '\\' and i + 1 < n:
+            following = value[i + 1]
+            out.append('\n' if following in 'nN' else following)
+            i += 2
+        else:
+            out.append(char)
+            i += 1
+    return ''.join(out)
+
+
+def parse_date_value(value: str, params: Dict[str, str]) -> Union[date, datetime]:
+    """DATE ou DATE-TIME (locale, UTC ou TZID) en heure murale sans timezone"""
+    value_type = params.get('VALUE')
+    if value_type not in (None, 'DATE', 'DATE-TIME'):
+        raise ExoticICalendar(f"VALUE={value_type}")
+
+    if len(value) == 8 and value.isdigit() and value_type != 'DATE-TIME':
+        return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+    if value_type != 'DATE' and len(value) in (15, 16) and value[8] == 'T':
+        if len(value) == 16 and value[15] != 'Z':
+            raise ExoticICalendar(value)
+        digits = value[0:8] + value[9:15]
+        if digits.isdigit():
+            return datetime(
+                int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                int(value[9:11]), int(value[11:13]), int(value[13:15]),
+            )
+    raise ExoticICalendar(value)
+
+
+def _split_params(head: str) -> Dict[str, str]:
+    """'DTSTART;TZID=Europe/Paris' -> {'TZID': 'Europe/Paris'}"""
+    if ';' not in head:
+        return {}
+    if '"' in head:
+        # Valeurs entre guillemets : découper hors guillemets uniquement
+        parts, current, in_quotes = [], [], False
+        for char in head:
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == ';' and not in_quotes:
+                parts.append(''.join(current))
+                current = []
+                continue
+            current.append(char)
+        if in_quotes:
+            raise ExoticICalendar(head)
+        parts.append(''.join(current))
+        raw_params = parts[1:]
+    else:
+        raw_params = head.split(';')[1:]
+
+    params = {}
+    for raw in raw_params:
+        key, sep, value = raw.partition('=')
+        if not sep:
+            raise ExoticICalendar(head)
+        params[key.upper()] = value.strip('"')
+    return params
+
+
+def _split_line(line: str) -> tuple:
+    """Sépare 'NOM;PARAMS:valeur' en tenant compte des paramètres entre guillemets"""
+    colon = line.find(':')
+    if colon < 0:
+        raise ExoticICalendar(line)
+    quote = line.find('"', 0, colon)
+    if quote < 0:
+        return line[:colon], line[colon + 1:]
+
+    # Un ':' peut figurer dans un paramètre entre guillemets
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            return line[:i], line[i + 1:]
+    raise ExoticICalendar(line)
+
+
+def _unfolded_lines(data: str):
+    """Lignes logiques (continuations commençant par espace ou tabulation rattachées)"""
+    current = None
+    for line in data.splitlines():
+        if line[:1] in (' ', '\t'):
+            if current is None:
+                raise ExoticICalendar('continuation sans ligne')
+            current.append(line[1:])
+            continue
+        if current is not None:
+            yield current[0] if len(current) == 1 else ''.join(current)
+        current = [line] if line else None
+    if current is not None:
+        yield current[0] if len(current) == 1 else ''.join(current)
+
+
+def _decode(data: Union[str, bytes, memoryview]) -> str:
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            raise ExoticICalendar(str(e))
+    return data
+
+
+def extract_vevent(data: Union[str, bytes, memoryview]) -> Optional[Dict[str, Any]]:
+    """
+    Propriétés utiles du premier VEVENT d'un objet iCalendar
+
+    Returns:
+        {'uid', 'summary', 'description', 'location', 'dtstart', 'dtend',
+         'recurrence_id', 'client', 'affair', 'eventtype'} (None si absente),
+        ou None s'il n'y a pas de VEVENT
+
+    Raises:
+        ExoticICalendar: entrée à confier à icalendar
+    """
+    data = _decode(data)
+
+    fields = None
+    depth = 0          # profondeur dans le VEVENT (1 = propriétés du VEVENT)
+    for line in _unfolded_lines(data):
+        upper_head = line[:6].upper()
+        if upper_head == 'BEGIN:':
+            component = line[6:].strip().upper()
+            if depth:
+                depth += 1
+            elif component == 'VEVENT':
+                fields = dict.fromkeys(PROPERTIES.values())
+                depth = 1
+            continue
+        if line[:4].upper() == 'END:':
+            if depth == 1 and line[4:].strip().upper() == 'VEVENT':
+                return fields
+            if depth:
+                depth -= 1
+            continue
+        if depth != 1:
+            continue
+
+        # Nom de la propriété (jusqu'au premier ';' ou ':') avant tout découpage
+        name_end = len(line)
+        for separator in (';', ':'):
+            position = line.find(separator, 0, name_end)
+            if position >= 0:
+                name_end = position
+        name = line[:name_end].upper()
+        key = PROPERTIES.get(name)
+        if key is None:
+            continue
+
+        head, value = _split_line(line)
+        params = _split_params(head)
+        if fields[key] is not None:
+            raise ExoticICalendar(f"{name} répété")
+        if 'ENCODING' in params:
+            raise ExoticICalendar(f"{name};ENCODING")
+
+        if name in DATE_PROPERTIES:
+            fields[key] = parse_date_value(value.strip(), params)
+        else:
+            fields[key] = _unescape_text(value)
+
+    if depth:
+        raise ExoticICalendar('VEVENT non terminé')
+    return None
+
+
+def extract_vevent_properties(data: Union[str, bytes, memoryview],
+                              names: FrozenSet[str]) -> List[Dict[str, List[Tuple[Dict[str, str], str]]]]:
+    """
+    Propriétés demandées de chaque VEVENT d'un objet iCalendar, non décodées
+
+    Returns:
+        Un dictionnaire par VEVENT : {NOM: [(paramètres, valeur brute), ...]}
+
+    Raises:
+        ExoticICalendar: entrée à confier à icalendar
+    """
+    vevents = []
+    properties = None
+    depth = 0          # profondeur dans le VEVENT (1 = propriétés du VEVENT)
+    for line in _unfolded_lines(_decode(data)):
+        upper_head = line[:6].upper()
+        if upper_head == 'BEGIN:':
+            if depth:
+                depth += 1
+            elif line[6:].strip().upper() == 'VEVENT':
+                properties = {}
+                depth = 1
+            continue
+        if line[:4].upper() == 'END:':
+            if depth == 1 and line[4:].strip().upper() == 'VEVENT':
+                vevents.append(properties)
+            if depth:
+                depth -= 1
+            continue
+        if depth != 1:
+            continue
+
+        name_end = len(line)
+        for separator in (';', ':'):
+            position = line.find(separator, 0, name_end)
+            if position >= 0:
+                name_end = position
+        name = line[:name_end].upper()
+        if name not in names:
+            continue
+
+        head, value = _split_line(line)
+        params = _split_params(head)
+        if 'ENCODING' in params:
+            raise ExoticICalendar(f"{name};ENCODING")
+        properties.setdefault(name, []).append((params, value))
+
+    if depth:
+        raise ExoticICalendar('VEVENT non terminé')
+    return vevents
+
+
+# Marqueur (picklable) d'un objet à relire avec icalendar
+EXOTIC = 'exotic'
+
+FIELD_KEYS = tuple(PROPERTIES.values())
+
+
+def extract_vevent_tuple(data) -> Any:
+    """
+    extract_vevent sous forme compacte, pour les échanges entre processus
+
+    Returns:
+        Tuple des valeurs dans l'ordre FIELD_KEYS, None sans VEVENT, ou EXOTIC
+    """
+    try:
+        fields = extract_vevent(data)
+    except ExoticICalendar:
+        return EXOTIC
+    return None if fields is None else tuple(fields[key] for key in FIELD_KEYS)
+
+
+def extract_chunk(payloads) -> list:
+    """Extraction d'un lot d'objets (exécutée dans le pool de api.parse_pool)"""
+    return [extract_vevent_tuple(data) for data in payloads]
+
+
+def fields_from_tuple(values: tuple) -> Dict[str, Any]:
+    """Dictionnaire de propriétés (format extract_vevent) depuis extract_vevent_tuple"""
+    return dict(zip(FIELD_KEYS, values))
+
+
+def _plain_date(prop):
+    """Date icalendar (vDDDTypes) sans timezone, heure murale conservée"""
+    if prop is None:
+        return None
+    value = getattr(prop, 'dt', prop)
+    if getattr(value, 'tzinfo', None):
+        value = value.replace(tzinfo=None)
+    return value
+
+
+def vevent_fields(vevent) -> Dict[str, Any]:
+    """Propriétés utiles d'un composant VEVENT icalendar (même format que extract_vevent)"""
+    fields = {}
+    for name, key in PROPERTIES.items():
+        prop = vevent.get(name)
+        if name in DATE_PROPERTIES:
+            fields[key] = _plain_date(prop) if prop else None
+        else:
+            fields[key] = None if prop is None else str(prop)
+    return fields
+
+
+def first_vevent_fields(cal) -> Optional[Dict[str, Any]]:
+    """Propriétés du premier VEVENT d'un calendrier icalendar, None s'il n'y en a pas"""
+    for component in cal.walk():
+        if component.name == "VEVENT":
+            return vevent_fields(component)
+    return None
@@ -0,0 +1,194 @@
+"""
+Sérialisation directe des VEVENT créés par l'API
+
+create_event et create_recurring_event écrivent toujours le même schéma
+(UID, DTSTAMP, DTSTART/DTEND/RECURRENCE-ID en Europe/Paris, SUMMARY,
+DESCRIPTION, LOCATION, STATUS, CLIENT, AFFAIR, SEQUENCE). Les lignes sont
+produites directement, sans arbre icalendar :
+- VTIMEZONE Europe/Paris précalculé (règles UE depuis 1996) ;
+- échappement TEXT et pliage à 75 octets conformes à RFC 5545 §3.1 / §3.3.11 ;
+- conversion vers l'heure murale Europe/Paris avec décalage UTC mis en cache
+  par heure.
+
+Le résultat se relit avec icalendar à l'identique (voir api/tests.py).
+"""
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pytz
+
+PARIS_TZ = pytz.timezone('Europe/Paris')
+TZID = 'Europe/Paris'
+PRODID = '-//Baïkal Python Client//FR'
+
+VTIMEZONE_LINES = (
+    'BEGIN:VTIMEZONE',
+    f'TZID:{TZID}',
+    'BEGIN:DAYLIGHT',
+    'TZOFFSETFROM:+0100',
+    'TZOFFSETTO:+0200',
+    'TZNAME:CEST',
+    'DTSTART:19700329T020000',
+    'RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU',
+    'END:DAYLIGHT',
+    'BEGIN:STANDARD',
+    'TZOFFSETFROM:+0200',
+    'TZOFFSETTO:+0100',
+    'TZNAME:CET',
+    'DTSTART:19701025T030000',
+    'RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU',
+    'END:STANDARD',
+    'END:VTIMEZONE',
+)
+
+_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', ';': '\\;', ',': '\\,', '\n': '\\n'})
+
+
+def escape_text(value: Any) -> str:
+    """Échappement d'une valeur TEXT (RFC 5545 §3.3.11)"""
+    value = '' if value is None else str(value)
+    if '\r' in value:
+        value = value.replace('\r\n', '\n').replace('\r', '\n')
+    return value.translate(_TEXT_ESCAPES)
+
+
+def fold_line(line: str) -> str:
+    """Plie une ligne de contenu à 75 octets sans couper un caractère UTF-8"""
+    if line.isascii():
+        if len(line) <= 75:
+            return line
+        # Les lignes de continuation commencent par une espace : 74 octets utiles
+        return '\r\n '.join([line[:75]] + [line[i:i + 74] for i in range(75, len(line), 74)])
+
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    chunks, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Reculer jusqu'au début d'un caractère (pas sur un octet de continuation 10xxxxxx)
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        chunks.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(chunks)
+
+
+@lru_cache(maxsize=8192)
+def _paris_offset(utc_hour: datetime) -> timedelta:
+    """Décalage Europe/Paris d'une heure UTC (les changements d'heure tombent sur des heures pleines)"""
+    return pytz.utc.localize(utc_hour).astimezone(PARIS_TZ).utcoffset()
+
+
+def to_paris_wall_clock(value: Union[datetime, int, float, str]) -> datetime:
+    """
+    Heure murale Europe/Paris sans timezone
+
+    Une date naïve est déjà une heure de Paris ; une date avec timezone (ou
+    une chaîne ISO avec Z / décalage) est convertie ; un timestamp est lu en
+    heure locale du serveur, comme format_ical_date.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value)
+    elif not isinstance(value, datetime):
+        raise ValueError(f"Date non supportée: {value!r}")
+
+    if value.tzinfo is None:
+        return value
+    utc = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return utc + _paris_offset(utc.replace(minute=0, second=0, microsecond=0))
+
+
+def _format_datetime(value: datetime) -> str:
+    return (f'{value.year:04d}{value.month:02d}{value.day:02d}'
+            f'T{value.hour:02d}{value.minute:02d}{value.second:02d}')
+
+
+def format_paris(value) -> str:
+    """Valeur DATE-TIME locale (à utiliser avec TZID=Europe/Paris)"""
+    return _format_datetime(to_paris_wall_clock(value))
+
+
+def format_utc(value: datetime) -> str:
+    """Valeur DATE-TIME UTC (DTSTAMP)"""
+    return _format_datetime(value.astimezone(timezone.utc)) + 'Z'
+
+
+def vevent_lines(uid: str, start, end, title: Any = 'Nouvel événement', description: Any = '',
+                 location: Any = '', client_id: Any = None, affair_id: Any = None,
+                 recurrence_id=None, sequence: Optional[int] = None,
+                 dtstamp: Union[datetime, str, None] = None) -> List[str]:
+    """
+    Lignes (pliées) d'un VEVENT au schéma de l'API
+
+    Args:
+        start / end / recurrence_id: datetime (naïf = heure de Paris, ou avec
+            timezone), timestamp ou chaîne ISO
+        client_id / affair_id: Propriétés CLIENT / AFFAIR, omises si vides
+        sequence: Propriété SEQUENCE, omise si None
+        dtstamp: datetime ou valeur déjà formatée (format_utc), maintenant par défaut
+    """
+    if not isinstance(dtstamp, str):
+        dtstamp = format_utc(dtstamp or datetime.now(timezone.utc))
+    lines = [
+        'BEGIN:VEVENT',
+        fold_line(f'UID:{escape_text(uid)}'),
+        f'DTSTAMP:{dtstamp}',
+        f'DTSTART;TZID={TZID}:{format_paris(start)}',
+        f'DTEND;TZID={TZID}:{format_paris(end)}',
+        fold_line(f'SUMMARY:{escape_text(title)}'),
+        fold_line(f'DESCRIPTION:{escape_text(description)}'),
+        fold_line(f'LOCATION:{escape_text(location)}'),
+        'STATUS:CONFIRMED',
+    ]
+    if client_id:
+        lines.append(fold_line(f'CLIENT:{escape_text(client_id)}'))
+    if affair_id:
+        lines.append(fold_line(f'AFFAIR:{escape_text(affair_id)}'))
+    if recurrence_id:
+        lines.append(f'RECURRENCE-ID;TZID={TZID}:{format_paris(recurrence_id)}')
+    if sequence is not None:
+        lines.append(f'SEQUENCE:{int(sequence)}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def calendar_bytes(vevents: Iterable[List[str]]) -> bytes:
+    """Objet VCALENDAR complet (VTIMEZONE inclus) à partir de lignes VEVENT"""
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', fold_line(f'PRODID:{PRODID}'), *VTIMEZONE_LINES]
+    for vevent in vevents:
+        lines.extend(vevent)
+    lines.append('END:VCALENDAR')
+    lines.append('')
+    return '\r\n'.join(lines).encode('utf-8')
+
+
+def serialize_events(uid: str, occurrences: List[Dict[str, Any]],
+                     dtstamp: Optional[datetime] = None) -> bytes:
+    """
+    Objet .ics d'un UID (un VEVENT par occurrence)
+
+    Les occurrences utilisent les clés de create_recurring_event :
+    title, description, location, start, end, recurrence_id, client_id,
+    affair_id, sequence.
+    """
+    dtstamp = format_utc(dtstamp or datetime.now(timezone.utc))
+    return calendar_bytes(
+        vevent_lines(
+            uid,
+            occurrence['start'],
+            occurrence['end'],
+            title=occurrence.get('title', 'Nouvel événement'),
+            description=occurrence.get('description', ''),
+            location=occurrence.get('location', ''),
+            client_id=occurrence.get('client_id'),
+            affair_id=occurrence.get('affair_id'),
+            recurrence_id=occurrence.get('recurrence_id'),
+            sequence=occurrence.get('sequence'),
+            dtstamp=dtstamp,
+        )
+        for occurrence in occurrences
+    )
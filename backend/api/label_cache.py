@@ -0,0 +1,92 @@
+"""
+Résolution mémorisée des libellés client / affaire
+
+Les événements portent des propriétés CLIENT / AFFAIR (ids MyClic). Les
+libellés sont résolus par lots (requêtes IN d'au plus QUERY_CHUNK ids par
+table) et gardés dans un cache TTL par application, y compris les ids
+introuvables pour ne pas les redemander à chaque affichage.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from .myclic_model import Compte, Affaire
+from .ttl_cache import TTLCache
+
+LABEL_TTL = 600
+# Ids par requête IN
+QUERY_CHUNK = 500
+# Ids par type (clients, affaires) acceptés par l'endpoint de résolution par lot
+MAX_BATCH_IDS = 2000
+
+_labels = TTLCache(ttl=LABEL_TTL, maxsize=50000)
+_MISSING = object()
+
+
+def _parse_ids(values: Iterable) -> List[int]:
+    """Filtre et convertit les ids reçus (str, int, vides) en entiers uniques"""
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return sorted(ids)
+
+
+def _resolve(application_id: Optional[int], kind: str, model, ids: List[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+    result, missing = {}, []
+    for object_id in ids:
+        key = (application_id, kind, object_id)
+        label = _labels.get(key, _MISSING)
+        if label is _MISSING:
+            missing.append(object_id)
+        else:
+            result[object_id] = label
+
+    if missing:
+        found = {}
+        for i in range(0, len(missing), QUERY_CHUNK):
+            for row in model.objects.filter(
+                id__in=missing[i:i + QUERY_CHUNK],
+                application_id=application_id,
+            ).values('id', 'nom'):
+                found[row['id']] = {'id': row['id'], 'nom': row['nom'] or ''}
+        for object_id in missing:
+            label = found.get(object_id)
+            _labels.set((application_id, kind, object_id), label)
+            result[object_id] = label
+
+    return result
+
+
+def resolve_labels(application_id: Optional[int], client_ids: Iterable = (),
+                   affair_ids: Iterable = ()) -> Dict[str, Dict[int, Optional[Dict[str, Any]]]]:
+    """
+    Résout les libellés d'un lot de clients et d'affaires
+
+    Args:
+        application_id: Application de l'utilisateur (isolation des données)
+        client_ids: Ids Compte
+        affair_ids: Ids Affaire
+
+    Returns:
+        {'clients': {id: {'id', 'nom'} | None}, 'affairs': {id: {'id', 'nom'} | None}}
+    """
+    return {
+        'clients': _resolve(application_id, 'client', Compte, _parse_ids(client_ids)),
+        'affairs': _resolve(application_id, 'affair', Affaire, _parse_ids(affair_ids)),
+    }
+
+
+def embed_labels(application_id: Optional[int], events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ajoute les clés 'client' et 'affair' (libellés résolus) à chaque événement"""
+    labels = resolve_labels(
+        application_id,
+        client_ids=(event.get('client_id') for event in events),
+        affair_ids=(event.get('affair_id') for event in events),
+    )
+    for event in events:
+        client_id = _parse_ids([event.get('client_id')])
+        affair_id = _parse_ids([event.get('affair_id')])
+        event['client'] = labels['clients'].get(client_id[0]) if client_id else None
+        event['affair'] = labels['affairs'].get(affair_id[0]) if affair_id else None
+    return events
@@ -0,0 +1,132 @@
+"""
+Commande Django pour mesurer le calcul de disponibilités communes (api.freebusy)
+Usage: python manage.py bench_freebusy [--people N] [--days N] [--events N] [--repeat N] [--target S]
+
+Les agendas sont générés (séries avec EXDATE et occurrences modifiées,
+événements ponctuels) : seul le calcul en mémoire est mesuré, sans la
+lecture de calendarobjects.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.freebusy import (
+    free_slots, icalendar_busy_components, merge_intervals, object_intervals, parse_busy_components,
+)
+
+ICAL_DATE = '%Y%m%dT%H%M%S'
+
+
+def _vevent(uid, start, end, extra=()):
+    return [
+        'BEGIN:VEVENT', f'UID:{uid}', f'DTSTAMP:{start.strftime(ICAL_DATE)}Z',
+        f'DTSTART;TZID=Europe/Paris:{start.strftime(ICAL_DATE)}',
+        f'DTEND;TZID=Europe/Paris:{end.strftime(ICAL_DATE)}',
+        *extra, 'END:VEVENT',
+    ]
+
+
+def _calendar(vevents):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//myclic//bench//FR']
+    for vevent in vevents:
+        lines.extend(vevent)
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(lines) + '\r\n').encode('utf-8')
+
+
+def generate_objects(rng, person, window_start, days, events):
+    """Objets iCalendar d'une personne : point quotidien, réunion hebdomadaire, rendez-vous"""
+    monday = window_start - timedelta(days=window_start.weekday())
+    standup = monday.replace(hour=9)
+    weekly = monday + timedelta(days=rng.randrange(5), hours=rng.choice((10, 14, 16)))
+    objects = [
+        _calendar([_vevent(f'{person}-standup', standup, standup + timedelta(minutes=15),
+                           ['RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR'])]),
+        _calendar([
+            _vevent(f'{person}-weekly', weekly, weekly + timedelta(hours=1), [
+                'RRULE:FREQ=WEEKLY',
+                f'EXDATE;TZID=Europe/Paris:{(weekly + timedelta(weeks=1)).strftime(ICAL_DATE)}',
+            ]),
+            _vevent(f'{person}-weekly', weekly + timedelta(weeks=2, hours=2),
+                    weekly + timedelta(weeks=2, hours=3),
+                    [f'RECURRENCE-ID;TZID=Europe/Paris:{(weekly + timedelta(weeks=2)).strftime(ICAL_DATE)}']),
+        ]),
+    ]
+    for index in range(events):
+        start = window_start + timedelta(days=rng.randrange(days), hours=rng.randrange(8, 18),
+                                         minutes=rng.choice((0, 30)))
+        objects.append(_calendar([
+            _vevent(f'{person}-{index}', start, start + timedelta(minutes=rng.choice((30, 60, 90, 120))))
+        ]))
+    return objects
+
+
+class Command(BaseCommand):
+    help = "Mesure le calcul de disponibilités communes d'un groupe sur une fenêtre (objectif : moins d'une seconde)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--people', type=int, default=50, help='Nombre de calendriers')
+        parser.add_argument('--days', type=int, default=30, help='Durée de la fenêtre en jours')
+        parser.add_argument('--events', type=int, default=40, help='Événements ponctuels par calendrier')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Nombre de passes chronométrées (la meilleure est retenue)')
+        parser.add_argument('--target', type=float, default=1.0, help='Objectif en secondes (lecture à froid)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        window_start = datetime(2026, 3, 2)
+        window_end = window_start + timedelta(days=options['days'])
+        calendars = [
+            generate_objects(rng, person, window_start, options['days'], options['events'])
+            for person in range(options['people'])
+        ]
+        count = sum(len(objects) for objects in calendars)
+        self.stdout.write(f"📦 {options['people']} calendriers, {count} objets, {options['days']} jours")
+
+        def project(parsed):
+            intervals = []
+            for components in parsed:
+                intervals.extend(object_intervals(components, window_start, window_end))
+            busy = merge_intervals(intervals)
+            return busy, free_slots(busy, window_start, window_end, timedelta(minutes=30))
+
+        payloads = [data for objects in calendars for data in objects]
+
+        def reference():
+            return project([icalendar_busy_components(data) for data in payloads])
+
+        def cold():
+            # Objets analysés puis projetés (cache freebusy vide)
+            return project([parse_busy_components(data) for data in payloads])
+
+        parsed = [parse_busy_components(data) for data in payloads]
+
+        def warm():
+            # Composants déjà en cache (etag inchangé) : projection et fusion seules
+            return project(parsed)
+
+        timings = {}
+        results = {}
+        for name, run in (('icalendar, à froid', reference), ('à froid', cold), ('composants en cache', warm)):
+            best = None
+            for _ in range(max(1, options['repeat'])):
+                started = time.perf_counter()
+                busy, free = run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            results[name] = (busy, free)
+            self.stdout.write(
+                f"   ⏱️  {name}: {best * 1000:.1f} ms ({len(busy)} blocs occupés, {len(free)} créneaux libres)"
+            )
+
+        if results['icalendar, à froid'] != results['à froid']:
+            self.stdout.write(self.style.ERROR("❌ Occupations différentes de la lecture icalendar"))
+        if timings['à froid'] <= options['target']:
+            self.stdout.write(self.style.SUCCESS(f"✅ Objectif de {options['target']:.1f}s tenu"))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"❌ Objectif de {options['target']:.1f}s dépassé ({timings['à froid']:.2f}s à froid)"
+            ))
@@ -0,0 +1,100 @@
+"""
+Commande Django pour mesurer l'extraction ciblée des VEVENT sur des objets Baïkal réels
+Usage: python manage.py bench_ical_extract [--limit N] [--calendar ID] [--repeat N]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from icalendar import Calendar as iCalendar
+
+from api.baikal_models import BaikalCalendarObject
+from api.ical_extract import ExoticICalendar, extract_vevent, first_vevent_fields
+
+
+class Command(BaseCommand):
+    help = "Compare l'extracteur iCalendar ciblé à icalendar (vitesse et résultats) sur les objets Baïkal"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=2000,
+            help='Nombre d\'objets calendarobjects lus (les plus récents)',
+        )
+        parser.add_argument(
+            '--calendar',
+            type=int,
+            default=None,
+            help='Limiter à un calendrier (calendars.id)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Nombre de passes chronométrées (la meilleure est retenue)',
+        )
+
+    def handle(self, *args, **options):
+        objects = BaikalCalendarObject.objects.filter(componenttype=b'VEVENT')
+        if options['calendar'] is not None:
+            objects = objects.filter(calendarid=options['calendar'])
+        payloads = [
+            bytes(data).decode('utf-8', errors='replace')
+            for data in objects.order_by('-id').values_list('calendardata', flat=True)[:options['limit']]
+            if data
+        ]
+        if not payloads:
+            self.stdout.write(self.style.WARNING('Aucun objet VEVENT à mesurer'))
+            return
+
+        self.stdout.write(f"📦 {len(payloads)} objets, {sum(len(p) for p in payloads) // 1024} Kio")
+
+        # Vérification : mêmes propriétés que la lecture icalendar
+        exotic, mismatches = 0, []
+        for index, payload in enumerate(payloads):
+            expected = first_vevent_fields(iCalendar.from_ical(payload))
+            try:
+                fields = extract_vevent(payload)
+            except ExoticICalendar:
+                exotic += 1
+                continue
+            if fields != expected:
+                mismatches.append((index, fields, expected))
+
+        def reference():
+            for payload in payloads:
+                first_vevent_fields(iCalendar.from_ical(payload))
+
+        def targeted():
+            for payload in payloads:
+                try:
+                    extract_vevent(payload)
+                except ExoticICalendar:
+                    first_vevent_fields(iCalendar.from_ical(payload))
+
+        timings = {}
+        for name, run in (('icalendar', reference), ('extraction ciblée', targeted)):
+            best = None
+            for _ in range(max(1, options['repeat'])):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            self.stdout.write(
+                f"   ⏱️  {name}: {best * 1000:.1f} ms ({best * 1e6 / len(payloads):.1f} µs/objet)"
+            )
+
+        speedup = timings['icalendar'] / timings['extraction ciblée'] if timings['extraction ciblée'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Accélération x{speedup:.1f}, {exotic} objet(s) confiés à icalendar"
+        ))
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"❌ {len(mismatches)} objet(s) divergent(s):"))
+            for index, fields, expected in mismatches[:10]:
+                if fields is None or expected is None:
+                    diff = {'vevent': (fields, expected)}
+                else:
+                    diff = {k: (fields[k], expected[k]) for k in fields if fields[k] != expected[k]}
+                self.stdout.write(self.style.ERROR(f"   • objet #{index}: {diff}"))
@@ -1,26 +1,56 @@
 """
 Commande Django pour synchroniser tous les utilisateurs avec Baikal
-Usage: python manage.py sync_baikal_users
+Usage: python manage.py sync_baikal_users [--sync-users] [--application ID] [--workers N] [--batch-size N]
+
+--sync-users crée les User manquants : --application est alors obligatoire.
+Seuls les comptes Baïkal de cette application (principals.user_id d'un de
+ses User) sont créés ou mis à jour.
 """
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from api.baikal_db_service import BaikalDBService
 
 
 class Command(BaseCommand):
     help = 'Synchronise tous les utilisateurs avec la base MySQL de Baikal'
-    
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--sync-users',
             action='store_true',
             help='Synchroniser également les utilisateurs depuis Baikal',
         )
-    
+        parser.add_argument(
+            '--application',
+            type=int,
+            default=None,
+            help='Limiter la synchronisation à une application (affectée aux utilisateurs créés, '
+                 'obligatoire avec --sync-users)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Nombre d\'applications synchronisées en parallèle',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Taille des lots bulk_create / bulk_update',
+        )
+
     def handle(self, *args, **options):
+        if options['sync_users'] and options['application'] is None:
+            raise CommandError("--sync-users nécessite --application : application des utilisateurs créés")
+
         self.stdout.write(self.style.SUCCESS('🚀 Début de la synchronisation Baikal...'))
-        
-        service = BaikalDBService()
-        
+
+        service = BaikalDBService(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            application_id=options['application'],
+        )
+
         # Synchroniser les utilisateurs si demandé
         if options['sync_users']:
             self.stdout.write('📥 Synchronisation des utilisateurs...')
@@ -28,28 +58,42 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS(
                     f"✅ Utilisateurs: {user_stats['users_created']} créés, "
-                    f"{user_stats['users_updated']} mis à jour"
+                    f"{user_stats['users_updated']} mis à jour "
+                    f"({self._format_timings(user_stats['timings'])})"
                 )
             )
-            
+
             if user_stats['errors']:
                 for error in user_stats['errors']:
                     self.stdout.write(self.style.ERROR(f"❌ {error}"))
-        
+
         # Synchroniser tous les calendriers
         self.stdout.write('📅 Synchronisation des calendriers et événements...')
         stats = service.sync_all_users()
-        
+
         self.stdout.write(
             self.style.SUCCESS(
                 f"\n✅ Synchronisation terminée !\n"
+                f"   • Applications: {len(stats['tenants'])}\n"
                 f"   • Utilisateurs synchronisés: {stats['users_synced']}\n"
+                f"   • Principals / calendriers mis à jour: "
+                f"{stats['principals_updated']} / {stats['instances_updated']}\n"
                 f"   • Événements synchronisés: {stats['total_events']}\n"
+                f"   • Durées: {self._format_timings(stats['timings'])}\n"
             )
         )
-        
+
+        for tenant in sorted(stats['tenants'], key=lambda t: t['duration'], reverse=True)[:10]:
+            self.stdout.write(
+                f"   ⏱️  Application {tenant['application_id']}: "
+                f"{tenant['users_synced']} utilisateurs, {tenant['duration']}s"
+            )
+
         if stats['errors']:
             self.stdout.write(self.style.WARNING(f"\n⚠️  {len(stats['errors'])} erreurs:"))
             for error in stats['errors'][:10]:  # Afficher seulement les 10 premières
                 self.stdout.write(self.style.ERROR(f"   • {error}"))
 
+    @staticmethod
+    def _format_timings(timings):
+        return ', '.join(f"{name} {duration}s" for name, duration in timings.items())
@@ -2,8 +2,13 @@
 Middleware pour désactiver CSRF sur les routes API
 Nécessaire pour les API JWT qui n'utilisent pas de cookies de session
 """
+import hashlib
+
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 
+from .ttl_cache import TTLCache
+
 
 class DisableCSRFMiddleware(MiddlewareMixin):
     """
@@ -16,3 +21,47 @@ class DisableCSRFMiddleware(MiddlewareMixin):
             setattr(request, '_dont_enforce_csrf_checks', True)
         return None
 
+
+
+class DatabasePinningMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes pour les réplicas baikal / myclic (voir config.db_router)
+
+    Chaque requête démarre sans épinglage. Si elle écrit sur un alias, ses
+    lectures suivantes vont au primaire ; l'épinglage est ensuite conservé
+    REPLICA_PIN_SECONDS pour les requêtes portant le même jeton (le frontend
+    relit juste après une écriture), dans le worker courant.
+    """
+    def process_request(self, request):
+        from config.db_router import reset_pinning
+        reset_pinning(_sticky_pins.get(_pin_key(request), ()))
+        return None
+
+    def process_response(self, request, response):
+        from config.db_router import pinned_aliases, reset_pinning
+        pinned = pinned_aliases()
+        if pinned:
+            key = _pin_key(request)
+            if key:
+                _sticky_pins.set(key, pinned, ttl=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        reset_pinning()
+        return response
+
+
+class BaikalBudgetMiddleware(MiddlewareMixin):
+    """
+    Budget de nouvelles tentatives et de requêtes doublées vers Baïkal, par
+    requête API (voir api.baikal_transport.request_budget)
+    """
+    def __call__(self, request):
+        from .baikal_transport import request_budget
+        with request_budget():
+            return super().__call__(request)
+
+
+def _pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    return hashlib.sha1(authorization.encode('utf-8')).hexdigest() if authorization else None
+
+
+_sticky_pins = TTLCache(ttl=5, maxsize=10000)
@@ -0,0 +1,142 @@
+"""
+Pool de processus pour l'extraction iCalendar des grandes fenêtres
+
+Une vue groupe ou un export peut porter sur des dizaines de milliers
+d'objets : l'extraction (api.ical_extract) est alors répartie sur un pool de
+processus persistant, propre à chaque worker gunicorn. Les processus
+n'importent que api.ical_extract (pas Django) et renvoient des tuples de
+valeurs, pas des arbres icalendar.
+
+Seuil adaptatif : le coût par objet en local et via le pool est mesuré
+(moyennes glissantes) ; le pool n'est utilisé que lorsqu'il est estimé plus
+rapide pour la taille du lot, et jamais sous ICAL_PARSE_MIN_BATCH objets.
+"""
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+
+from .ical_extract import extract_chunk, extract_vevent_tuple
+
+logger = logging.getLogger(__name__)
+
+# Coût fixe d'un envoi au pool (sérialisation, réveil des processus), en secondes
+DISPATCH_OVERHEAD = 0.005
+# Un lot sur PROBE_EVERY passe par le pool même s'il semble moins rapide (remesure)
+PROBE_EVERY = 20
+EWMA_ALPHA = 0.2
+
+
+class _Costs:
+    """Coûts mesurés par objet (secondes), en local et via le pool"""
+
+    def __init__(self, processes: int):
+        self.inline = 50e-6
+        self.pooled = self.inline / max(processes, 1) * 1.5
+        self.large_batches = 0
+        self.lock = threading.Lock()
+
+    def record(self, pooled: bool, elapsed: float, count: int):
+        per_object = max(elapsed - (DISPATCH_OVERHEAD if pooled else 0), 0) / count
+        with self.lock:
+            if pooled:
+                self.pooled += EWMA_ALPHA * (per_object - self.pooled)
+            else:
+                self.inline += EWMA_ALPHA * (per_object - self.inline)
+
+    def prefer_pool(self, count: int) -> bool:
+        with self.lock:
+            self.large_batches += 1
+            if self.large_batches % PROBE_EVERY == 0:
+                return True
+            return DISPATCH_OVERHEAD + count * self.pooled < count * self.inline
+
+
+_lock = threading.Lock()
+_state = {'pid': None, 'executor': None, 'costs': None}
+
+
+def _processes() -> int:
+    configured = getattr(settings, 'ICAL_PARSE_PROCESSES', None)
+    if configured is not None:
+        return int(configured)
+    # Même valeur par défaut que settings.ICAL_PARSE_PROCESSES
+    return max((os.cpu_count() or 1) // 2, 1)
+
+
+def _local_state() -> dict:
+    """État du processus courant : le pool hérité d'un parent (fork gunicorn) n'est pas réutilisé"""
+    with _lock:
+        if _state['pid'] != os.getpid():
+            _state.update(pid=os.getpid(), executor=None, costs=_Costs(_processes()))
+        return _state
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    """Pool du processus courant, None si désactivé (moins de 2 processus)"""
+    processes = _processes()
+    if processes < 2:
+        return None
+
+    state = _local_state()
+    with _lock:
+        if state['executor'] is None:
+            # forkserver : les processus ne dupliquent pas le worker (threads, connexions)
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['api.ical_extract'])
+            state['executor'] = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+            logger.info(f"Pool d'extraction iCalendar démarré ({processes} processus)")
+        return state['executor']
+
+
+def _reset_executor():
+    with _lock:
+        executor, _state['executor'] = _state['executor'], None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _chunks(items: Sequence, count: int) -> List[Sequence]:
+    size = max(1, math.ceil(len(items) / count))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def extract_many(payloads: Sequence) -> List:
+    """
+    Extrait les propriétés du premier VEVENT de chaque objet
+
+    Returns:
+        Pour chaque objet, dans l'ordre : tuple de valeurs (voir
+        ical_extract.fields_from_tuple), None sans VEVENT, ou EXOTIC si
+        l'objet doit être relu avec icalendar
+    """
+    count = len(payloads)
+    costs = _local_state()['costs']
+    min_batch = getattr(settings, 'ICAL_PARSE_MIN_BATCH', 2000)
+    executor = _get_executor() if count >= min_batch else None
+
+    if executor is not None and costs.prefer_pool(count):
+        started = time.perf_counter()
+        try:
+            # Deux lots par processus pour lisser les écarts de taille
+            chunks = _chunks(payloads, _processes() * 2)
+            results = [item for chunk in executor.map(extract_chunk, chunks) for item in chunk]
+            costs.record(True, time.perf_counter() - started, count)
+            logger.info(f"⚡ {count} objets extraits via le pool en {time.perf_counter() - started:.3f}s")
+            return results
+        except BrokenProcessPool as e:
+            logger.warning(f"Pool d'extraction indisponible, extraction locale: {e}")
+            _reset_executor()
+
+    started = time.perf_counter()
+    results = [extract_vevent_tuple(payload) for payload in payloads]
+    if count:
+        costs.record(False, time.perf_counter() - started, count)
+    return results
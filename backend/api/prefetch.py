@@ -0,0 +1,150 @@
+"""
+Préchargement des fenêtres voisines de la liste des événements
+
+La navigation du calendrier (semaine / mois précédent ou suivant) demande
+une nouvelle fenêtre à chaque changement de mois affiché. Après chaque
+liste servie, la fenêtre suivante dans le sens de navigation de
+l'utilisateur (puis l'autre voisine) est chargée en arrière-plan dans
+events_cache : le clic suivant est servi depuis la mémoire du worker.
+
+- Fenêtres voisines : mois précédent / suivant si la fenêtre a la forme de
+  celle du tableau de bord (warmup.dashboard_window), sinon décalage de la
+  durée de la fenêtre ; au-delà de PREFETCH_MAX_DAYS, rien n'est préchargé.
+- Budget global : PREFETCH_MAX_PENDING préchargements en attente ou en
+  cours par worker, aucun si la machine est chargée.
+- Annulation : une nouvelle requête de l'utilisateur rend caducs ses
+  préchargements encore en file ; ceux déjà démarrés vont à leur terme.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from django.db import connections
+
+from config.db_router import carry_pinning
+
+from . import events_cache
+from .caldav_reports import DETAIL_FULL
+from .caldav_service import get_pooled_client
+from .conditional import CalendarState
+from .ttl_cache import TTLCache
+from .warmup import dashboard_window, system_overloaded
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_PENDING = 6
+PREFETCH_MAX_DAYS = 62
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+_lock = threading.Lock()
+_pending = [0]
+# (email, include_all) -> (début de la dernière fenêtre, sens : 1, -1 ou 0, génération)
+_navigation = TTLCache(ttl=1800, maxsize=10000)
+
+Window = Tuple[datetime, datetime]
+
+
+def adjacent_windows(start_date: datetime, end_date: datetime) -> Optional[Tuple[Window, Window]]:
+    """(fenêtre précédente, fenêtre suivante), None si la fenêtre est trop large"""
+    span = end_date - start_date
+    if span <= timedelta(0) or span > timedelta(days=PREFETCH_MAX_DAYS):
+        return None
+
+    # Fenêtre mensuelle du tableau de bord : mois voisins (durées inégales)
+    month = (start_date + timedelta(days=8)).date()
+    if dashboard_window(month) == (start_date, end_date):
+        month_start = month.replace(day=1)
+        previous_month = (month_start - timedelta(days=1)).replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        return dashboard_window(previous_month), dashboard_window(next_month)
+
+    return (start_date - span, start_date), (end_date, end_date + span)
+
+
+def _track(key: tuple, start_date: datetime) -> Tuple[int, int]:
+    """Enregistre la fenêtre demandée ; retourne (sens de navigation, génération)"""
+    with _lock:
+        previous = _navigation.get(key)
+        if previous is None:
+            direction, generation = 0, 1
+        else:
+            last_start, last_direction, generation = previous
+            if start_date > last_start:
+                direction = 1
+            elif start_date < last_start:
+                direction = -1
+            else:
+                direction = last_direction
+            generation += 1
+        _navigation.set(key, (start_date, direction, generation))
+        return direction, generation
+
+
+def _current_generation(key: tuple) -> Optional[int]:
+    with _lock:
+        entry = _navigation.get(key)
+    return entry[2] if entry else None
+
+
+def after_request(user, state: CalendarState, start_date: datetime, end_date: datetime,
+                  include_all, detail: str = DETAIL_FULL) -> List[Window]:
+    """
+    Planifie le préchargement des fenêtres voisines d'une liste servie
+
+    Returns:
+        Fenêtres mises en file (dans l'ordre de chargement)
+    """
+    windows = adjacent_windows(start_date, end_date)
+    if windows is None:
+        # Chargements larges (arrière-plan du frontend) : hors navigation
+        return []
+
+    email = user.email
+    navigation_key = (email, bool(include_all))
+    direction, generation = _track(navigation_key, start_date)
+    previous, following = windows
+    # Sens de navigation d'abord ; sans historique, la suite est la plus probable
+    ordered = [previous, following] if direction < 0 else [following, previous]
+    missing = [w for w in ordered if not events_cache.is_cached(state, w[0], w[1], include_all, detail)]
+    if not missing:
+        return []
+
+    with _lock:
+        if _pending[0] >= PREFETCH_MAX_PENDING or system_overloaded():
+            logger.info(f"Préchargement des fenêtres voisines abandonné pour {email} (budget)")
+            return []
+        _pending[0] += 1
+
+    try:
+        _executor.submit(carry_pinning(_prefetch), user, state, missing, include_all, navigation_key, generation, detail)
+    except RuntimeError:
+        # Arrêt de l'interpréteur en cours
+        with _lock:
+            _pending[0] -= 1
+        return []
+    return missing
+
+
+def _prefetch(user, state: CalendarState, windows: List[Window], include_all,
+              navigation_key: tuple, generation: int, detail: str):
+    email = user.email
+    try:
+        for start_date, end_date in windows:
+            # L'utilisateur a demandé une autre fenêtre depuis : ces voisines ne sont plus utiles
+            if _current_generation(navigation_key) != generation:
+                logger.info(f"Préchargement annulé pour {email} (navigation)")
+                return
+            events_cache.load_events(
+                state, lambda: get_pooled_client(user), start_date, end_date, include_all,
+                detail=detail,
+            )
+    except Exception as e:
+        logger.warning(f"Préchargement des fenêtres voisines échoué pour {email}: {e}")
+    finally:
+        with _lock:
+            _pending[0] -= 1
+        # Rendre au pool les connexions empruntées par ce thread
+        connections.close_all()
@@ -0,0 +1,21 @@
+"""
+Rendu JSON de l'API
+
+Les enregistrements compacts du chemin de lecture (EventRecord) ne sont
+convertis en dict qu'ici, au moment de l'encodage.
+"""
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+from .event_record import EventRecord
+
+
+class JSONEncoder(DRFJSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, EventRecord):
+            return obj.to_wire()
+        return super().default(obj)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    encoder_class = JSONEncoder
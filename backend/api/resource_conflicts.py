@@ -0,0 +1,256 @@
+"""
+Détection des conflits de réservation sur les calendriers de ressources
+
+Les salles et équipements sont réservés via des calendriers dont la
+description contient "Resource". Pour chaque ressource, les occupations sont
+chargées par fenêtre de BUCKET_DAYS jours dans un arbre d'intervalles ; un
+lot de centaines d'occurrences proposées est vérifié en mémoire, sans une
+requête par occurrence.
+
+Rafraîchissement incrémental :
+- le synctoken du calendrier (incrémenté par Baïkal à chaque écriture) est
+  comparé à celui du chargement ; s'il a changé, seuls les objets dont
+  l'etag a changé sont relus (freebusy.load_components) ;
+- les écritures acceptées par l'API sont inscrites immédiatement
+  (record_write), ce qui couvre les créations en arrière-plan de bulk_create
+  avant leur arrivée dans Baïkal.
+"""
+import bisect
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import freebusy
+from .baikal_models import BaikalCalendar, BaikalCalendarInstance, BaikalCalendarObject, binary_to_str
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+BUCKET_DAYS = 90
+EPOCH = datetime(2000, 1, 1)
+
+# Item de l'arbre : (début, fin, clé = uri de l'objet calendarobjects)
+Item = Tuple[datetime, datetime, str]
+
+
+class IntervalTree:
+    """
+    Arbre d'intervalles implicite
+
+    Les intervalles sont triés par début ; le milieu de chaque tranche est un
+    nœud et _max_end[nœud] est la fin maximale de son sous-arbre. Les
+    modifications marquent l'arbre comme sale, les max sont recalculés en
+    O(n) à la requête suivante.
+    """
+    __slots__ = ('_items', '_max_end', '_dirty')
+
+    def __init__(self, items: Iterable[Item] = ()):
+        self._items = sorted(items)
+        self._max_end = []
+        self._dirty = True
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start: datetime, end: datetime, key: str):
+        bisect.insort(self._items, (start, end, key))
+        self._dirty = True
+
+    def remove_keys(self, keys):
+        keys = set(keys)
+        if keys:
+            self._items = [item for item in self._items if item[2] not in keys]
+            self._dirty = True
+
+    def _build(self, lo: int, hi: int) -> Optional[datetime]:
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_end = self._items[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > max_end:
+                max_end = child
+        self._max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Item]:
+        """Intervalles qui chevauchent [start, end)"""
+        if self._dirty:
+            self._max_end = [None] * len(self._items)
+            self._build(0, len(self._items))
+            self._dirty = False
+
+        found = []
+        stack = [(0, len(self._items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= start:
+                continue
+            stack.append((lo, mid))
+            item_start, item_end, _ = self._items[mid]
+            # Le sous-arbre droit commence après item_start
+            if item_start < end:
+                if item_end > start:
+                    found.append(self._items[mid])
+                stack.append((mid + 1, hi))
+        return found
+
+
+class _Schedule:
+    """Occupations d'une ressource sur une fenêtre"""
+
+    def __init__(self, calendarid: int, bucket: int):
+        self.calendarid = calendarid
+        self.start = EPOCH + timedelta(days=bucket * BUCKET_DAYS)
+        self.end = self.start + timedelta(days=BUCKET_DAYS)
+        self.synctoken = None
+        self.objects: Dict[int, Tuple[str, bytes]] = {}
+        self.tree = IntervalTree()
+        self.lock = threading.Lock()
+
+    def _clip(self, intervals):
+        return [(s, e) for s, e in intervals if s < self.end and e > self.start]
+
+    def refresh(self, synctoken: int):
+        """Relit les objets de la fenêtre dont l'etag a changé depuis le dernier chargement"""
+        if synctoken == self.synctoken:
+            return
+        with self.lock:
+            if synctoken == self.synctoken:
+                return
+
+            rows = BaikalCalendarObject.objects.filter(
+                calendarid=self.calendarid,
+                componenttype=b'VEVENT',
+                firstoccurence__lt=int((self.end + timedelta(days=1)).timestamp()),
+                lastoccurence__gt=int((self.start - timedelta(days=1)).timestamp()),
+            ).values_list('id', 'uri', 'etag')
+            current = {object_id: (binary_to_str(uri), bytes(etag or b'')) for object_id, uri, etag in rows}
+
+            changed = {object_id for object_id, entry in current.items() if self.objects.get(object_id) != entry}
+            removed = self.objects.keys() - current.keys()
+            stale_keys = {self.objects[object_id][0] for object_id in removed}
+            stale_keys |= {current[object_id][0] for object_id in changed}
+            self.tree.remove_keys(stale_keys)
+
+            parsed = freebusy.load_components((object_id, current[object_id][1]) for object_id in changed)
+            for object_id in changed:
+                intervals = freebusy.object_intervals(parsed.get(object_id, []), self.start, self.end)
+                for start, end in intervals:
+                    self.tree.add(start, end, current[object_id][0])
+
+            logger.debug(
+                f"Ressource {self.calendarid} [{self.start.date()}]: "
+                f"{len(changed)} objet(s) relu(s), {len(removed)} supprimé(s)"
+            )
+            self.objects = current
+            self.synctoken = synctoken
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Item]:
+        with self.lock:
+            return self.tree.overlapping(start, end)
+
+    def record(self, key: str, intervals: List[Tuple[datetime, datetime]]):
+        """Remplace les occupations d'un objet par celles qui viennent d'être écrites"""
+        with self.lock:
+            self.tree.remove_keys([key])
+            for start, end in self._clip(intervals):
+                self.tree.add(start, end, key)
+
+
+# Instance de calendrier -> calendarid si c'est une ressource, sinon None
+_resources = TTLCache(ttl=600, maxsize=10000)
+_schedules = TTLCache(ttl=1800, maxsize=2000)
+
+
+def resource_calendar_id(instance_id) -> Optional[int]:
+    """calendarid de l'instance si c'est un calendrier de ressource, None sinon"""
+    try:
+        instance_id = int(instance_id)
+    except (TypeError, ValueError):
+        return None
+
+    def load():
+        instance = BaikalCalendarInstance.objects.filter(id=instance_id).values('calendarid', 'description').first()
+        if instance and 'Resource' in (instance['description'] or ''):
+            return instance['calendarid']
+        return None
+
+    return _resources.get_or_set(instance_id, load)
+
+
+def _bucket(value: datetime) -> int:
+    return (value - EPOCH).days // BUCKET_DAYS
+
+
+def _schedules_for(calendarid: int, start: datetime, end: datetime, synctoken: Optional[int]) -> List[_Schedule]:
+    schedules = []
+    for bucket in range(_bucket(start), _bucket(end - timedelta(microseconds=1)) + 1):
+        schedule = _schedules.get_or_set((calendarid, bucket), lambda b=bucket: _Schedule(calendarid, b))
+        if synctoken is not None:
+            schedule.refresh(synctoken)
+        schedules.append(schedule)
+    return schedules
+
+
+def find_conflicts(calendarid: int, proposals: List[Tuple[datetime, datetime]],
+                   exclude_keys: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Vérifie un lot d'occurrences proposées contre les réservations existantes
+
+    Args:
+        calendarid: Calendrier de la ressource (calendars.id)
+        proposals: Occurrences (début, fin) en heure murale
+        exclude_keys: Objets à ignorer (l'événement en cours de modification)
+
+    Returns:
+        [{'index', 'start', 'end', 'conflicts_with': [{'uid', 'start', 'end'}]}]
+    """
+    # Les occurrences invalides sont ignorées, les index restent ceux du lot
+    valid = [(index, s, e) for index, (s, e) in enumerate(proposals) if s is not None and e is not None and e > s]
+    if not valid:
+        return []
+
+    synctoken = BaikalCalendar.objects.filter(id=calendarid).values_list('synctoken', flat=True).first()
+    exclude_keys = set(exclude_keys)
+    schedules = _schedules_for(
+        calendarid, min(s for _, s, _ in valid), max(e for _, _, e in valid), synctoken
+    )
+
+    conflicts = []
+    for index, start, end in valid:
+        overlapping = set()
+        for schedule in schedules:
+            if schedule.start < end and schedule.end > start:
+                overlapping.update(
+                    item for item in schedule.overlapping(start, end) if item[2] not in exclude_keys
+                )
+        if overlapping:
+            conflicts.append({
+                'index': index,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'conflicts_with': [
+                    {'uid': key.rsplit('.ics', 1)[0], 'start': s.isoformat(), 'end': e.isoformat()}
+                    for s, e, key in sorted(overlapping)
+                ],
+            })
+    return conflicts
+
+
+def record_write(calendarid: int, key: str, intervals: List[Tuple[datetime, datetime]]):
+    """Inscrit une écriture acceptée dans les fenêtres chargées de la ressource"""
+    intervals = [(s, e) for s, e in intervals if s is not None and e is not None]
+    if not intervals:
+        return
+    for schedule in _schedules_for(calendarid, min(s for s, _ in intervals), max(e for _, e in intervals), None):
+        schedule.record(key, intervals)
+
+
+def invalidate(calendarid: int):
+    """Oublie les fenêtres chargées d'une ressource (ex. échec d'une création en arrière-plan)"""
+    _schedules.delete_matching(lambda key: key[0] == calendarid)
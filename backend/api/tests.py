@@ -1,3 +1,1221 @@
-from django.test import TestCase
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import niquests
+import pytz
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_login_failed
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from icalendar import Calendar as iCalendar
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from config import db_router
+
+from . import (
+    authentication, baikal_db_service, baikal_transport, baikal_views, caldav_reports, caldav_service, client_index,
+    conditional, events_cache, freebusy, label_cache, parse_pool, resource_conflicts, views,
+)
+from .baikal_models import BaikalCalendarObject
+from .baikal_transport import BaikalSession
+from .caldav_service import BaikalCalDAVClient
+from .conditional import CalendarState
+from .event_ids import make_event_id, parse_event_id
+from .ical_extract import ExoticICalendar
+from .ical_serialize import PARIS_TZ, serialize_events
+from .models import User
+from .resource_conflicts import IntervalTree
+from .ttl_cache import TTLCache
+
+
+class ICalSerializeRoundTripTests(SimpleTestCase):
+    """Les objets produits par ical_serialize se relisent à l'identique avec icalendar"""
+
+    def _occurrence(self, start, **overrides):
+        occurrence = {
+            'title': 'Réunion équipe',
+            'description': 'Ordre du jour',
+            'location': 'Salle A',
+            'start': start,
+            'end': start + timedelta(hours=1),
+            'client_id': 42,
+            'affair_id': 7,
+            'recurrence_id': None,
+            'sequence': 1,
+        }
+        occurrence.update(overrides)
+        return occurrence
+
+    def _parse(self, payload):
+        return [c for c in iCalendar.from_ical(payload).walk('VEVENT')]
+
+    def test_text_escaping_and_folding(self):
+        title = 'Client: Dupont, Martin; suivi \\ dossier ' + 'é' * 60
+        description = 'Ligne 1\nLigne 2\r\nLigne 3, avec ; et \\'
+        payload = serialize_events('uid-1', [self._occurrence(
+            datetime(2026, 3, 2, 9, 0), title=title, description=description,
+        )])
+
+        for line in payload.split(b'\r\n'):
+            self.assertLessEqual(len(line), 75)
+
+        vevent, = self._parse(payload)
+        self.assertEqual(str(vevent['summary']), title)
+        self.assertEqual(str(vevent['description']), 'Ligne 1\nLigne 2\nLigne 3, avec ; et \\')
+        self.assertEqual(str(vevent['client']), '42')
+        self.assertEqual(str(vevent['affair']), '7')
+        self.assertEqual(str(vevent['uid']), 'uid-1')
+        self.assertEqual(int(vevent['sequence']), 1)
+
+    def test_paris_wall_clock_across_dst(self):
+        winter = datetime(2026, 1, 15, 9, 30)
+        summer = datetime(2026, 7, 15, 9, 30)
+        utc_summer = pytz.utc.localize(datetime(2026, 7, 15, 7, 30))
+        payload = serialize_events('uid-2', [
+            self._occurrence(winter, recurrence_id=winter),
+            self._occurrence(summer, recurrence_id=summer),
+            self._occurrence(utc_summer, recurrence_id=utc_summer),
+        ])
+
+        vevents = self._parse(payload)
+        self.assertEqual(len(vevents), 3)
+        for vevent, expected in zip(vevents, (winter, summer, summer)):
+            start = vevent['dtstart'].dt
+            self.assertEqual(start.replace(tzinfo=None), expected)
+            self.assertEqual(vevent['dtend'].dt.replace(tzinfo=None), expected + timedelta(hours=1))
+            self.assertEqual(vevent['recurrence-id'].dt.replace(tzinfo=None), expected)
+            self.assertEqual(start.utcoffset(), PARIS_TZ.localize(expected).utcoffset())
+
+    def test_matches_icalendar_semantics(self):
+        from icalendar import Event
+
+        start = datetime(2026, 10, 25, 14, 0)
+        occurrence = self._occurrence(start, location='Bureau, 2e étage')
+        stamp = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        reference = iCalendar()
+        event = Event()
+        event.add('uid', 'uid-3')
+        event.add('dtstamp', stamp)
+        event.add('dtstart', PARIS_TZ.localize(occurrence['start']))
+        event.add('dtend', PARIS_TZ.localize(occurrence['end']))
+        event.add('summary', occurrence['title'])
+        event.add('description', occurrence['description'])
+        event.add('location', occurrence['location'])
+        event.add('status', 'CONFIRMED')
+        event.add('client', '42')
+        event.add('affair', '7')
+        event.add('sequence', 1)
+        reference.add_component(event)
+
+        expected, = self._parse(reference.to_ical())
+        actual, = self._parse(serialize_events('uid-3', [occurrence], dtstamp=stamp))
+
+        for name in ('uid', 'summary', 'description', 'location', 'status', 'client', 'affair'):
+            self.assertEqual(str(actual[name]), str(expected[name]), name)
+        for name in ('dtstamp', 'dtstart', 'dtend'):
+            self.assertEqual(actual[name].dt, expected[name].dt, name)
+        self.assertEqual(int(actual['sequence']), int(expected['sequence']))
+
+
+class EventsCacheTTLTests(SimpleTestCase):
+    """Durée de vie des fenêtres en cache selon le résultat de la lecture CalDAV"""
+
+    START = datetime(2026, 3, 1)
+    END = datetime(2026, 4, 1)
+
+    def setUp(self):
+        events_cache._events.clear()
+        events_cache._last_good.clear()
+        # id, calendarid, displayname, defined_name, uri, description, calendarcolor,
+        # access, share_href, share_displayname, display, user_id
+        self.state = CalendarState('user@example.com', [
+            (1, 10, 'Perso', None, 'perso', '', '#000', 1, None, None, 1, 1),
+            (2, 20, 'Équipe', None, 'equipe', '', '#fff', 1, None, None, 1, 1),
+        ], {10: (5, 1), 20: (8, 1)})
+
+    def _client(self, failed_ids):
+        class FakeClient:
+            def list_calendars(self):
+                return [{'id': 1}, {'id': 2}]
+
+            def get_events_many(self, calendars, start_date, end_date, failed, detail):
+                failed.extend(failed_ids)
+                return []
+
+        return FakeClient()
+
+    def _remaining_ttl(self):
+        key = events_cache._key(self.state, self.START, self.END, frozenset({1, 2}))
+        expires_at, _ = events_cache._events._data[key]
+        return expires_at - time.monotonic()
+
+    def test_partial_window_keeps_partial_ttl(self):
+        window = events_cache.load_events(self.state, lambda: self._client([2]), self.START, self.END, False)
+
+        self.assertTrue(window.partial)
+        self.assertLessEqual(self._remaining_ttl(), events_cache.PARTIAL_TTL)
+
+    def test_complete_window_uses_default_ttl(self):
+        window = events_cache.load_events(self.state, lambda: self._client([]), self.START, self.END, False)
+
+        self.assertFalse(window.partial)
+        self.assertGreater(self._remaining_ttl(), events_cache.PARTIAL_TTL)
+
+
+class ResourceConflictsTests(SimpleTestCase):
+    """Arbre d'intervalles et détection des conflits de réservation"""
+
+    CALENDAR_ID = 99
+
+    def setUp(self):
+        resource_conflicts._schedules.clear()
+        # Pas de synctoken : les fenêtres ne sont pas relues depuis Baïkal
+        patcher = mock.patch.object(resource_conflicts, 'BaikalCalendar')
+        calendar_model = patcher.start()
+        calendar_model.objects.filter.return_value.values_list.return_value.first.return_value = None
+        self.addCleanup(patcher.stop)
+
+    def test_interval_tree_matches_linear_scan(self):
+        rng = random.Random(7)
+        base = datetime(2026, 1, 1)
+        items = []
+        for index in range(300):
+            start = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 30, 15))
+            items.append((start, start + timedelta(minutes=rng.randrange(15, 60 * 24 * 3, 15)), f'{index}.ics'))
+        tree = IntervalTree(items[:200])
+        for item in items[200:]:
+            tree.add(*item)
+        tree.remove_keys(['0.ics', '150.ics', '250.ics'])
+        remaining = [item for item in items if item[2] not in ('0.ics', '150.ics', '250.ics')]
+
+        self.assertEqual(len(tree), 297)
+        for _ in range(200):
+            start = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 32, 15))
+            end = start + timedelta(minutes=rng.randrange(15, 60 * 24, 15))
+            expected = sorted(item for item in remaining if item[0] < end and item[1] > start)
+            self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+
+    def test_interval_tree_is_half_open(self):
+        nine, ten, eleven = (datetime(2026, 5, 4, hour) for hour in (9, 10, 11))
+        tree = IntervalTree([(nine, ten, 'a.ics')])
+
+        self.assertEqual(tree.overlapping(ten, eleven), [])
+        self.assertEqual(tree.overlapping(datetime(2026, 5, 4, 8), nine), [])
+        self.assertEqual(tree.overlapping(nine, eleven), [(nine, ten, 'a.ics')])
+
+    def test_record_write_keeps_every_interval_of_an_object(self):
+        # Occurrences d'une série réparties sur deux fenêtres de BUCKET_DAYS jours
+        starts = [datetime(2026, 1, 5, 9) + timedelta(weeks=week) for week in range(0, 26, 5)]
+        resource_conflicts.record_write(
+            self.CALENDAR_ID, 'serie.ics', [(start, start + timedelta(hours=1)) for start in starts]
+        )
+
+        proposals = [(start + timedelta(minutes=30), start + timedelta(hours=2)) for start in starts]
+        conflicts = resource_conflicts.find_conflicts(self.CALENDAR_ID, proposals)
+
+        self.assertEqual([conflict['index'] for conflict in conflicts], list(range(len(starts))))
+        for conflict, start in zip(conflicts, starts):
+            self.assertEqual(conflict['conflicts_with'], [{
+                'uid': 'serie',
+                'start': start.isoformat(),
+                'end': (start + timedelta(hours=1)).isoformat(),
+            }])
+
+    def test_record_write_replaces_previous_intervals(self):
+        monday = datetime(2026, 2, 2, 14)
+        resource_conflicts.record_write(self.CALENDAR_ID, 'rdv.ics', [(monday, monday + timedelta(hours=1))])
+        moved = monday + timedelta(days=1)
+        resource_conflicts.record_write(self.CALENDAR_ID, 'rdv.ics', [(moved, moved + timedelta(hours=1))])
+
+        conflicts = resource_conflicts.find_conflicts(self.CALENDAR_ID, [
+            (monday, monday + timedelta(hours=1)),
+            (moved, moved + timedelta(hours=1)),
+        ])
+
+        self.assertEqual([conflict['index'] for conflict in conflicts], [1])
+
+    def test_find_conflicts_skips_invalid_and_excluded(self):
+        start = datetime(2026, 3, 10, 10)
+        resource_conflicts.record_write(self.CALENDAR_ID, 'a.ics', [(start, start + timedelta(hours=2))])
+        resource_conflicts.record_write(self.CALENDAR_ID, 'b.ics', [(start, start + timedelta(hours=1))])
+
+        conflicts = resource_conflicts.find_conflicts(self.CALENDAR_ID, [
+            (None, start),
+            (start + timedelta(hours=1), start),
+            (start, start + timedelta(minutes=30)),
+        ], exclude_keys=['b.ics'])
+
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0]['index'], 2)
+        self.assertEqual([item['uid'] for item in conflicts[0]['conflicts_with']], ['a'])
+
+
+class EventIdsTests(SimpleTestCase):
+    """Identifiants stables des événements et résolution par get_event_by_id"""
+
+    CALENDAR = {
+        'id': 56, 'calendarid': 10, 'principaluri': b'principals/user@example.com', 'uri': b'perso',
+        'displayname': 'Perso', 'calendarcolor': b'#000',
+    }
+    SERIES = (
+        'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n'
+        'BEGIN:VEVENT\r\nUID:serie\r\nSUMMARY:Point hebdo\r\n'
+        'DTSTART;TZID=Europe/Paris:20260302T090000\r\nDTEND;TZID=Europe/Paris:20260302T100000\r\n'
+        'RRULE:FREQ=WEEKLY;COUNT=10\r\nEND:VEVENT\r\n'
+        'BEGIN:VEVENT\r\nUID:serie\r\nSUMMARY:Point hebdo (déplacé)\r\n'
+        'RECURRENCE-ID;TZID=Europe/Paris:20260309T090000\r\n'
+        'DTSTART;TZID=Europe/Paris:20260309T140000\r\nDTEND;TZID=Europe/Paris:20260309T150000\r\n'
+        'END:VEVENT\r\nEND:VCALENDAR\r\n'
+    )
+
+    def test_round_trip(self):
+        self.assertEqual(make_event_id(1234), '1234')
+        self.assertEqual(make_event_id(1234, '2026-01-23T16:00:00+01:00'), '1234-20260123T160000')
+        self.assertEqual(parse_event_id('1234-20260123T160000'), (1234, '20260123T160000'))
+        self.assertEqual(parse_event_id('1234'), (1234, ''))
+
+    def test_fallback_id_is_resolvable(self):
+        url = 'https://dav.example.com/calendars/user/perso/r%C3%A9union-1.ics'
+        event_id = make_event_id(None, datetime(2026, 3, 9, 9), url=url, instance_id=56)
+
+        self.assertRegex(event_id, r'^[^/.]+$')
+        self.assertEqual(parse_event_id(event_id), ((56, 'réunion-1.ics'), '20260309T090000'))
+
+    def test_invalid_ids(self):
+        for event_id in ('', 'abc', 'u56', 'u56_', 'ux_6162', 'u56_zz', 'h0123456789abcdef'):
+            self.assertIsNone(parse_event_id(event_id), event_id)
+
+    def _get(self, event_id):
+        obj = mock.Mock(id=7, calendarid=10, uri_str='serie.ics', calendardata_str=self.SERIES)
+        client = BaikalCalDAVClient.__new__(BaikalCalDAVClient)
+        client.base_url = 'https://dav.example.com/'
+        with mock.patch.object(caldav_service, 'BaikalCalendarObject') as model:
+            objects = model.objects.only.return_value
+            objects.filter.return_value.first.return_value = obj
+            event = client.get_event_by_id(event_id, [self.CALENDAR])
+        return event, objects.filter
+
+    def test_get_event_by_id_stored_vevents(self):
+        master, _ = self._get('7')
+        moved, _ = self._get('7-20260309T090000')
+
+        self.assertEqual(master.title, 'Point hebdo')
+        self.assertEqual(master.url, 'https://dav.example.com/calendars/user@example.com/perso/serie.ics')
+        self.assertEqual(moved.title, 'Point hebdo (déplacé)')
+        self.assertEqual(moved.start_date, datetime(2026, 3, 9, 14))
+        self.assertEqual(moved.id, '7-20260309T090000')
+
+    def test_get_event_by_id_expanded_occurrence(self):
+        event, _ = self._get('7-20260323T090000')
+
+        self.assertEqual(event.title, 'Point hebdo')
+        self.assertEqual(event.start_date, datetime(2026, 3, 23, 9))
+        self.assertEqual(event.end_date, datetime(2026, 3, 23, 10))
+        self.assertEqual(event.id, '7-20260323T090000')
+
+    def test_get_event_by_id_fallback_id(self):
+        event_id = make_event_id(None, url='https://dav.example.com/calendars/user/perso/serie.ics', instance_id=56)
+        event, object_filter = self._get(event_id)
+
+        object_filter.assert_called_once_with(calendarid__in=[10], uri=b'serie.ics')
+        self.assertEqual(event.title, 'Point hebdo')
+        self.assertEqual(event.id, '7')
+
+
+@override_settings(DATABASE_REPLICAS={'baikal': [('baikal_replica_1', 1)], 'myclic': []})
+class DatabasePinningTests(SimpleTestCase):
+    """Lectures sur le primaire après une écriture (ORM ou CalDAV), threads de la requête compris"""
+
+    def setUp(self):
+        db_router.reset_pinning()
+        self.addCleanup(db_router.reset_pinning)
+        self.router = db_router.DatabaseRouter()
+
+    def test_reads_use_replica_until_pinned(self):
+        self.assertEqual(self.router.db_for_read(BaikalCalendarObject), 'baikal_replica_1')
+        self.router.db_for_write(BaikalCalendarObject)
+        self.assertEqual(self.router.db_for_read(BaikalCalendarObject), 'baikal')
+
+    def test_caldav_write_pins_baikal(self):
+        session = BaikalSession()
+        self.addCleanup(session.close)
+        with mock.patch.object(BaikalSession, '_send', return_value=mock.Mock(status_code=200)):
+            session.request('REPORT', 'https://dav.example.com/calendars/user/perso/')
+            self.assertEqual(db_router.pinned_aliases(), frozenset())
+            session.request('PUT', 'https://dav.example.com/calendars/user/perso/a.ics')
+
+        self.assertEqual(db_router.pinned_aliases(), {'baikal'})
+
+    def test_pinning_is_carried_into_threads(self):
+        db_router.pin_to_primary('baikal')
+        seen = {}
+
+        def read(name):
+            seen[name] = self.router.db_for_read(BaikalCalendarObject)
+
+        threads = [
+            threading.Thread(target=db_router.carry_pinning(read), args=('carried',)),
+            threading.Thread(target=contextvars.copy_context().run, args=(read, 'copied')),
+            threading.Thread(target=read, args=('plain',)),
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+        self.assertEqual(seen, {'carried': 'baikal', 'copied': 'baikal', 'plain': 'baikal_replica_1'})
+
+
+class FreeBusyTests(SimpleTestCase):
+    """Fusion des occupations, créneaux libres et projection des séries (RRULE, EXDATE, RECURRENCE-ID)"""
+
+    def test_merge_intervals(self):
+        day = datetime(2026, 4, 6)
+        at = lambda hour, minute=0: day.replace(hour=hour, minute=minute)  # noqa: E731
+
+        merged = freebusy.merge_intervals([
+            (at(9), at(10)), (at(9, 30), at(11)), (at(10), at(10, 30)),
+            (at(11), at(12)),                  # bout à bout : bloc distinct
+            (at(14), at(14)),                  # durée nulle : ignoré
+            (at(13), at(15)), (at(13, 30), at(14, 30)),
+        ])
+
+        self.assertEqual(merged, [(at(9), at(11)), (at(11), at(12)), (at(13), at(15))])
+        self.assertEqual(freebusy.merge_intervals([]), [])
+
+    def test_free_slots(self):
+        monday = datetime(2026, 4, 6)
+        busy = [
+            (monday.replace(hour=7), monday.replace(hour=9)),
+            (monday.replace(hour=10), monday.replace(hour=10, minute=30)),
+            (monday.replace(hour=11), monday.replace(hour=17, minute=30)),
+            # Mardi matin entier et chevauchement sur la nuit
+            (monday + timedelta(hours=20), monday + timedelta(days=1, hours=12)),
+        ]
+
+        slots = freebusy.free_slots(busy, monday, monday + timedelta(days=7), timedelta(hours=1))
+
+        self.assertEqual(slots[:2], [
+            (monday.replace(hour=9), monday.replace(hour=10)),
+            (monday + timedelta(days=1, hours=12), monday + timedelta(days=1, hours=18)),
+        ])
+        # Mercredi à vendredi libres, week-end exclu
+        self.assertEqual([start.weekday() for start, _ in slots[2:]], [2, 3, 4])
+        self.assertTrue(all(end - start == timedelta(hours=10) for start, end in slots[2:]))
+
+    def test_object_intervals_series(self):
+        components = freebusy.parse_busy_components(
+            'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n'
+            'BEGIN:VEVENT\r\nUID:serie\r\n'
+            'DTSTART;TZID=Europe/Paris:20260302T090000\r\nDTEND;TZID=Europe/Paris:20260302T100000\r\n'
+            'RRULE:FREQ=WEEKLY;COUNT=5\r\nEXDATE;TZID=Europe/Paris:20260309T090000\r\n'
+            'END:VEVENT\r\n'
+            'BEGIN:VEVENT\r\nUID:serie\r\nRECURRENCE-ID;TZID=Europe/Paris:20260316T090000\r\n'
+            'DTSTART;TZID=Europe/Paris:20260316T140000\r\nDTEND;TZID=Europe/Paris:20260316T150000\r\n'
+            'END:VEVENT\r\n'
+            # Occurrence annulée : libère son créneau
+            'BEGIN:VEVENT\r\nUID:serie\r\nRECURRENCE-ID;TZID=Europe/Paris:20260323T090000\r\n'
+            'DTSTART;TZID=Europe/Paris:20260323T090000\r\nDTEND;TZID=Europe/Paris:20260323T100000\r\n'
+            'STATUS:CANCELLED\r\nEND:VEVENT\r\n'
+            'END:VCALENDAR\r\n'
+        )
+
+        intervals = sorted(freebusy.object_intervals(components, datetime(2026, 3, 1), datetime(2026, 4, 1)))
+
+        hour = timedelta(hours=1)
+        self.assertEqual(intervals, [
+            (datetime(2026, 3, 2, 9), datetime(2026, 3, 2, 9) + hour),
+            (datetime(2026, 3, 16, 14), datetime(2026, 3, 16, 14) + hour),
+            (datetime(2026, 3, 30, 9), datetime(2026, 3, 30, 9) + hour),
+        ])
+        # Fenêtre partielle : seules les occurrences qui la chevauchent
+        self.assertEqual(
+            freebusy.object_intervals(components, datetime(2026, 3, 30, 9, 30), datetime(2026, 3, 31)),
+            [(datetime(2026, 3, 30, 9), datetime(2026, 3, 30, 10))],
+        )
+
+    def test_targeted_parsing_matches_icalendar(self):
+        def fields(components):
+            return [tuple(getattr(c, name) for name in freebusy.BusyComponent.__slots__) for c in components]
+
+        payload = (
+            'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n'
+            'BEGIN:VTIMEZONE\r\nTZID:Europe/Paris\r\nBEGIN:STANDARD\r\nDTSTART:19701025T030000\r\n'
+            'TZOFFSETFROM:+0200\r\nTZOFFSETTO:+0100\r\nEND:STANDARD\r\nEND:VTIMEZONE\r\n'
+            # Série : EXDATE en liste, sur deux lignes, et DURATION
+            'BEGIN:VEVENT\r\nUID:a\r\nDTSTART;TZID="Europe/Paris":20260302T090000\r\nDURATION:PT1H30M\r\n'
+            'RRULE:FREQ=DAILY;UNTIL=20260320T230000Z;BYDAY=MO,WE,FR\r\n'
+            'EXDATE;TZID=Europe/Paris:20260304T090000,20260306T090000\r\n'
+            'EXDATE;TZID=Europe/Paris:20260309T090000\r\n'
+            'DESCRIPTION:Ordre du jour : DTEND;TZID=Europe/Paris:20260101T000000 \r\n'
+            ' (ligne repliée)\r\n'
+            'BEGIN:VALARM\r\nTRIGGER:-PT15M\r\nACTION:DISPLAY\r\nEND:VALARM\r\nEND:VEVENT\r\n'
+            'BEGIN:VEVENT\r\nUID:a\r\nRECURRENCE-ID;TZID=Europe/Paris:20260311T090000\r\n'
+            'DTSTART;TZID=Europe/Paris:20260311T090000\r\nDTEND;TZID=Europe/Paris:20260311T100000\r\n'
+            'STATUS:CANCELLED\r\nEND:VEVENT\r\n'
+            # UTC, heure flottante, journée entière, instantané, transparent
+            'BEGIN:VEVENT\r\nUID:b\r\nDTSTART:20260329T080000Z\r\nDTEND:20260329T093000Z\r\nEND:VEVENT\r\n'
+            'BEGIN:VEVENT\r\nUID:c\r\nDTSTART:20260310T140000\r\nDTEND:20260310T150000\r\nEND:VEVENT\r\n'
+            'BEGIN:VEVENT\r\nUID:d\r\nDTSTART;VALUE=DATE:20260312\r\nEND:VEVENT\r\n'
+            'BEGIN:VEVENT\r\nUID:e\r\nDTSTART:20260313T120000Z\r\nEND:VEVENT\r\n'
+            'BEGIN:VEVENT\r\nUID:f\r\nDTSTART:20260314T120000\r\nDTEND:20260314T130000\r\n'
+            'TRANSP:TRANSPARENT\r\nEND:VEVENT\r\n'
+            'END:VCALENDAR\r\n'
+        )
+
+        targeted = freebusy.extract_busy_components(payload)
+        self.assertEqual(len(targeted), 6)
+        self.assertEqual(fields(targeted), fields(freebusy.icalendar_busy_components(payload)))
+        self.assertEqual(targeted[2].start, datetime(2026, 3, 29, 10))  # UTC -> heure d'été de Paris
+
+    def test_other_timezones_use_icalendar(self):
+        payload = (
+            'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n'
+            'BEGIN:VEVENT\r\nUID:ny\r\nDTSTART;TZID=America/New_York:20260302T090000\r\n'
+            'DTEND;TZID=America/New_York:20260302T100000\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n'
+        )
+
+        with self.assertRaises(ExoticICalendar):
+            freebusy.extract_busy_components(payload)
+        component, = freebusy.parse_busy_components(payload)
+        self.assertEqual(component.start, datetime(2026, 3, 2, 15))
+
+
+class BaikalTransportTests(SimpleTestCase):
+    """Limiteur AIMD, disjoncteur, budgets, nouvelles tentatives et requêtes doublées"""
+
+    HOST = 'dav.example.com'
+    URL = f'https://{HOST}/calendars/user/perso/'
+
+    def setUp(self):
+        baikal_transport._guards.clear()
+        self.addCleanup(baikal_transport._guards.clear)
+        self.session = BaikalSession()
+        self.addCleanup(self.session.close)
+        # Nouvelles tentatives sans délai
+        patcher = mock.patch.object(baikal_transport.random, 'uniform', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _serve(self, *replies):
+        """Session factice : chaque envoi consomme la réponse suivante (code HTTP, exception ou fonction)"""
+        replies = list(replies)
+        sent = []
+        lock = threading.Lock()
+
+        def request(method, url, *args, **kwargs):
+            with lock:
+                sent.append(method)
+                reply = replies.pop(0)
+            if callable(reply):
+                return reply()
+            if isinstance(reply, Exception):
+                raise reply
+            return mock.Mock(status_code=reply)
+
+        patcher = mock.patch.object(niquests.Session, 'request', side_effect=request)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return sent
+
+    def test_limiter_rejects_when_queue_is_full(self):
+        limiter = baikal_transport.AIMDLimiter(initial=1, minimum=1, maximum=4, target_latency=1)
+        limiter.acquire(timeout=1)
+        limiter.waiting = 2  # QUEUE_FACTOR x limite déjà en attente
+
+        with self.assertRaises(baikal_transport.BaikalOverloaded):
+            limiter.acquire(timeout=1)
+
+    def test_limiter_wait_timeout(self):
+        limiter = baikal_transport.AIMDLimiter(initial=1, minimum=1, maximum=4, target_latency=1)
+        limiter.acquire(timeout=1)
+
+        started = time.monotonic()
+        with self.assertRaises(baikal_transport.BaikalOverloaded):
+            limiter.acquire(timeout=0.05)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(limiter.waiting, 0)
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_limiter_additive_increase_multiplicative_decrease(self):
+        limiter = baikal_transport.AIMDLimiter(initial=4, minimum=1, maximum=8, target_latency=1)
+        limiter.acquire(timeout=1)
+        limiter.release(latency=0.1, ok=True)
+        self.assertAlmostEqual(limiter.limit, 4.25)
+
+        for _ in range(3):
+            # Rafale d'échecs : une seule diminution par DECREASE_INTERVAL
+            limiter.acquire(timeout=1)
+            limiter.release(latency=0.1, ok=False)
+        self.assertAlmostEqual(limiter.limit, 4.25 * baikal_transport.BACKOFF)
+
+        limiter.acquire(timeout=1)
+        limiter.release(latency=None)
+        self.assertAlmostEqual(limiter.limit, 4.25 * baikal_transport.BACKOFF)
+
+    def test_breaker_half_open_probe(self):
+        breaker = baikal_transport.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        for _ in range(2):
+            self.assertFalse(breaker.before_call(self.HOST))
+            breaker.record(False, self.HOST)
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(baikal_transport.BaikalUnavailable):
+            breaker.before_call(self.HOST)
+
+        breaker.opened_at -= 30
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.before_call(self.HOST))
+        # Une seule requête d'essai à la fois
+        with self.assertRaises(baikal_transport.BaikalUnavailable):
+            breaker.before_call(self.HOST)
+
+        # Essai refusé par le limiteur : un autre peut partir
+        breaker.cancel_probe()
+        self.assertTrue(breaker.before_call(self.HOST))
+        breaker.record(True, self.HOST)
+        self.assertEqual(breaker.state, 'closed')
+        self.assertFalse(breaker.before_call(self.HOST))
+
+    def test_failed_probe_reopens_breaker(self):
+        breaker = baikal_transport.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record(False, self.HOST)
+        breaker.opened_at -= 30
+
+        self.assertTrue(breaker.before_call(self.HOST))
+        breaker.record(False, self.HOST)
+
+        self.assertEqual(breaker.state, 'open')
+
+    def test_overloaded_probe_is_cancelled(self):
+        guard = baikal_transport.guard_for(self.HOST)
+        guard.breaker.opened_at = time.monotonic() - baikal_transport.RESET_TIMEOUT
+        self._serve(200)
+
+        with mock.patch.object(guard.limiter, 'acquire', side_effect=baikal_transport.BaikalOverloaded('plein')):
+            with self.assertRaises(baikal_transport.BaikalOverloaded):
+                self.session.request('PUT', self.URL + 'a.ics')
+        self.assertFalse(guard.breaker.probing)
+
+        self.session.request('PUT', self.URL + 'a.ics')
+        self.assertEqual(guard.breaker.state, 'closed')
+
+    def test_idempotent_reads_are_retried(self):
+        sent = self._serve(503, niquests.exceptions.ConnectionError('reset'), 207)
+
+        response = self.session.request('REPORT', self.URL)
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(sent, ['REPORT'] * 3)
+        self.assertEqual(baikal_transport.guard_for(self.HOST).budget.retries, 2)
+
+    def test_writes_are_not_retried(self):
+        sent = self._serve(503, 201)
+
+        self.assertEqual(self.session.request('PUT', self.URL + 'a.ics').status_code, 503)
+        self.assertEqual(sent, ['PUT'])
+
+    def test_host_retry_budget_exhaustion(self):
+        guard = baikal_transport.guard_for(self.HOST)
+        guard.budget.tokens = 1
+        sent = self._serve(503, 503, 503)
+
+        self.assertEqual(self.session.request('REPORT', self.URL).status_code, 503)
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(guard.budget.denied, 1)
+
+    def test_request_budget_exhaustion(self):
+        sent = self._serve(*[503] * 6)
+
+        with baikal_transport.request_budget(extra_attempts=2) as budget:
+            self.session.request('REPORT', self.URL)
+            self.session.request('REPORT', self.URL)
+
+        # 2 tentatives supplémentaires pour toute la requête API : 3 envois, puis 1
+        self.assertEqual(len(sent), 4)
+        self.assertEqual(budget.remaining, 0)
+
+    def _slow_p95(self):
+        window = baikal_transport.guard_for(self.HOST).latency('REPORT')
+        window._p95 = 0.05
+
+    def test_hedge_winner_and_loser(self):
+        self._slow_p95()
+        release = threading.Event()
+        slow = mock.Mock(status_code=207)
+
+        def first():
+            release.wait(5)
+            return slow
+
+        self._serve(first, 207)
+
+        response = self.session.request('REPORT', self.URL)
+        release.set()
+
+        self.assertIsNot(response, slow)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(baikal_transport.guard_for(self.HOST).budget.hedges, 1)
+        for _ in range(100):
+            if slow.close.called:
+                break
+            time.sleep(0.01)
+        slow.close.assert_called_once()
+        response.close.assert_not_called()
+
+    def test_hedge_falls_back_to_primary(self):
+        self._slow_p95()
+
+        def first():
+            time.sleep(0.1)
+            return mock.Mock(status_code=207)
+
+        self._serve(first, 503)
+
+        self.assertEqual(self.session.request('REPORT', self.URL).status_code, 207)
+
+    def test_saturated_hedge_executor_sends_directly(self):
+        self._slow_p95()
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        busy = threading.Event()
+        executor.submit(busy.wait, 5)
+        self.addCleanup(busy.set)
+        sent = self._serve(207)
+
+        with mock.patch.object(baikal_transport, '_hedge_executor', executor):
+            self.assertEqual(self.session.request('REPORT', self.URL).status_code, 207)
+
+        self.assertEqual(sent, ['REPORT'])
+        self.assertEqual(baikal_transport.guard_for(self.HOST).budget.hedges, 0)
+
+
+class ConditionalRequestsTests(SimpleTestCase):
+    """Validateurs ETag et réponses 304 des listes"""
+
+    START = datetime(2026, 3, 1)
+    END = datetime(2026, 4, 1)
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.state = CalendarState('user@example.com', [
+            (1, 10, 'Perso', None, 'perso', '', '#000', 1, None, None, 1, 1),
+        ], {10: (5, 1)})
+        self.etag = self.state.events_etag(self.START, self.END, include_all=False)
+
+    def _request(self, if_none_match=None):
+        headers = {} if if_none_match is None else {'HTTP_IF_NONE_MATCH': if_none_match}
+        return self.factory.get('/api/events/', **headers)
+
+    def test_strong_and_weak_tags_match(self):
+        self.assertTrue(conditional._matches(self._request(self.etag), self.etag))
+        self.assertTrue(conditional._matches(self._request(f'W/{self.etag}'), self.etag))
+        self.assertTrue(conditional._matches(self._request(f'"autre", W/{self.etag}'), self.etag))
+        self.assertTrue(conditional._matches(self._request('*'), self.etag))
+
+    def test_other_or_missing_tags_do_not_match(self):
+        self.assertFalse(conditional._matches(self._request(), self.etag))
+        self.assertFalse(conditional._matches(self._request(''), self.etag))
+        self.assertFalse(conditional._matches(self._request('"autre"'), self.etag))
+        # ETag sans guillemets : pas la même valeur
+        self.assertFalse(conditional._matches(self._request(self.etag.strip('"')), self.etag))
+
+    def test_not_modified_response(self):
+        response = conditional.not_modified(self._request(f'W/{self.etag}'), self.etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIsNone(conditional.not_modified(self._request('"autre"'), self.etag))
+
+    def test_write_changes_events_etag(self):
+        written = CalendarState(self.state.email, self.state.instances, {10: (6, 1)})
+
+        self.assertNotEqual(written.events_etag(self.START, self.END, include_all=False), self.etag)
+        self.assertNotEqual(self.state.events_etag(self.START, self.END, include_all=True), self.etag)
+        self.assertNotEqual(self.state.calendars_etag(), self.etag)
+
+
+class EventsCoalescingTests(SimpleTestCase):
+    """Calcul unique par clé et réutilisation de la liste include_all"""
+
+    START = datetime(2026, 3, 1)
+    END = datetime(2026, 4, 1)
+
+    def setUp(self):
+        events_cache._events.clear()
+        events_cache._last_good.clear()
+        # Calendrier 2 masqué (display = 0) : affiché seulement en mode include_all
+        self.state = CalendarState('user@example.com', [
+            (1, 10, 'Perso', None, 'perso', '', '#000', 1, None, None, 1, 1),
+            (2, 20, 'Équipe', None, 'equipe', '', '#fff', 1, None, None, 0, 1),
+        ], {10: (5, 1), 20: (8, 1)})
+        self.reads = []
+
+    def _client(self):
+        reads = self.reads
+
+        class FakeClient:
+            def list_calendars(self):
+                return [{'id': 1}, {'id': 2}]
+
+            def get_events_many(self, calendars, start_date, end_date, failed, detail):
+                reads.append(sorted(cal['id'] for cal in calendars))
+                return [mock.Mock(calendar=mock.Mock(id=cal['id'])) for cal in calendars]
+
+        return FakeClient()
+
+    def test_get_or_join_waits_for_inflight_compute(self):
+        cache = TTLCache(ttl=60)
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            started.set()
+            release.wait(5)
+            return 'lu'
+
+        owner = threading.Thread(target=cache.get_or_set, args=('k', compute))
+        owner.start()
+        started.wait(5)
+        joined = []
+        joiner = threading.Thread(target=lambda: joined.append(cache.get_or_join('k')))
+        joiner.start()
+        joiner.join(0.05)
+        self.assertTrue(joiner.is_alive())
+
+        release.set()
+        owner.join(5)
+        joiner.join(5)
+        self.assertEqual(joined, ['lu'])
+
+    def test_get_or_join_never_computes(self):
+        cache = TTLCache(ttl=60)
+        self.assertEqual(cache.get_or_join('k', 'absent'), 'absent')
+
+        started, release = threading.Event(), threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise RuntimeError('Baïkal indisponible')
+
+        def owner():
+            with self.assertRaises(RuntimeError):
+                cache.get_or_set('k', failing)
+
+        thread = threading.Thread(target=owner)
+        thread.start()
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+        # Échec du calcul rejoint : default, sans propager l'erreur
+        self.assertEqual(cache.get_or_join('k', 'absent'), 'absent')
+        thread.join(5)
+
+    def test_concurrent_loads_share_one_read(self):
+        release = threading.Event()
+        client = self._client()
+        get_events_many = client.get_events_many
+
+        def slow(*args, **kwargs):
+            release.wait(5)
+            return get_events_many(*args, **kwargs)
+
+        client.get_events_many = slow
+        results = []
+
+        def load():
+            results.append(events_cache.load_events(self.state, lambda: client, self.START, self.END, True))
+
+        threads = [threading.Thread(target=load) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.reads, [[1, 2]])
+        self.assertEqual(len({id(window) for window in results}), 1)
+
+    def test_filtered_list_reuses_include_all_window(self):
+        everything = events_cache.load_events(self.state, self._client, self.START, self.END, True)
+        displayed = events_cache.load_events(self.state, self._client, self.START, self.END, False)
+
+        self.assertEqual(self.reads, [[1, 2]])
+        self.assertEqual(len(everything.events), 2)
+        self.assertEqual([event.calendar.id for event in displayed.events], [1])
+        self.assertEqual(set(displayed.fetched_at), {1})
+        self.assertTrue(events_cache.is_cached(self.state, self.START, self.END, False))
+
+    def test_filtered_list_is_read_alone_without_superset(self):
+        events_cache.load_events(self.state, self._client, self.START, self.END, False)
+
+        self.assertEqual(self.reads, [[1]])
+        self.assertFalse(events_cache.is_cached(self.state, self.START, self.END, True))
+
+
+class CalDAVReportsTests(SimpleTestCase):
+    """Lecture au fil de l'eau des réponses 207 et élagage des VEVENT"""
+
+    MULTISTATUS = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<d:multistatus xmlns:d="DAV:" xmlns:cal="urn:ietf:params:xml:ns:caldav">'
+        '<d:response><d:href>/cal/user/perso/a%20b.ics</d:href>'
+        '<d:propstat><d:prop><d:getetag>"e1"</d:getetag>'
+        '<cal:calendar-data>BEGIN:VCALENDAR&#13;\nEND:VCALENDAR&#13;\n</cal:calendar-data></d:prop>'
+        '<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>'
+        '<d:response><d:href>/cal/user/perso/absent.ics</d:href>'
+        '<d:status>HTTP/1.1 404 Not Found</d:status></d:response>'
+        '<d:response><d:href>/cal/user/perso/c.ics</d:href>'
+        '<d:propstat><d:prop><d:getetag>"e3"</d:getetag></d:prop>'
+        '<d:status>HTTP/1.1 200 OK</d:status></d:propstat>'
+        '<d:propstat><d:prop><cal:calendar-data/></d:prop>'
+        '<d:status>HTTP/1.1 404 Not Found</d:status></d:propstat></d:response>'
+        '</d:multistatus>'
+    ).encode('utf-8')
+
+    def test_multistatus_split_in_small_chunks(self):
+        body = self.MULTISTATUS
+        chunks = (body[i:i + 7] for i in range(0, len(body), 7))
+
+        entries = list(caldav_reports.iter_multistatus(chunks))
+
+        self.assertEqual(entries, [
+            ('/cal/user/perso/a%20b.ics', 200, '"e1"', 'BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n'),
+            ('/cal/user/perso/absent.ics', 404, None, None),
+            ('/cal/user/perso/c.ics', 200, '"e3"', None),
+        ])
+        self.assertEqual(caldav_reports.href_key(entries[0][0]), '/cal/user/perso/a b.ics')
+
+    def test_multistatus_releases_read_responses(self):
+        body = self.MULTISTATUS
+        entries = caldav_reports.iter_multistatus(body[i:i + 64] for i in range(0, len(body), 64))
+        in_tree = []
+        for _ in entries:
+            # Réponses rendues retirées de l'arbre : au plus la suivante, en cours de lecture
+            in_tree.append(len(entries.gi_frame.f_locals['root']))
+
+        self.assertEqual(len(in_tree), 3)
+        self.assertLessEqual(max(in_tree), 1)
+
+    def test_prune_drops_alarms_and_folded_lines(self):
+        data = '\r\n'.join([
+            'BEGIN:VCALENDAR',
+            'PRODID:-//myclic//FR',
+            'BEGIN:VTIMEZONE',
+            'TZID:Europe/Paris',
+            'END:VTIMEZONE',
+            'BEGIN:VEVENT',
+            'UID:1',
+            'SUMMARY:Réunion',
+            '  de suivi',
+            'DESCRIPTION:<p>Texte',
+            ' très long</p>',
+            'DTSTART;TZID=Europe/Paris:20260302T090000',
+            'BEGIN:VALARM',
+            'ACTION:DISPLAY',
+            'TRIGGER:-PT15M',
+            'END:VALARM',
+            'RRULE:FREQ=WEEKLY',
+            'END:VEVENT',
+            'END:VCALENDAR',
+        ]) + '\r\n'
+
+        pruned, recurring = caldav_reports.prune_vevent_properties(
+            data, caldav_reports.PROFILES[caldav_reports.DETAIL_SUMMARY])
+
+        self.assertTrue(recurring)
+        self.assertEqual(pruned, '\r\n'.join([
+            'BEGIN:VCALENDAR',
+            'PRODID:-//myclic//FR',
+            'BEGIN:VTIMEZONE',
+            'TZID:Europe/Paris',
+            'END:VTIMEZONE',
+            'BEGIN:VEVENT',
+            'UID:1',
+            'SUMMARY:Réunion',
+            '  de suivi',
+            'DTSTART;TZID=Europe/Paris:20260302T090000',
+            'RRULE:FREQ=WEEKLY',
+            'END:VEVENT',
+            'END:VCALENDAR',
+        ]) + '\r\n')
+        self.assertEqual(str(iCalendar.from_ical(pruned).walk('VEVENT')[0]['SUMMARY']), 'Réunion de suivi')
+
+    def test_prune_single_event_is_not_recurring(self):
+        data = 'BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nUID:1\r\nEXDATE:20260302\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n'
+
+        _, recurring = caldav_reports.prune_vevent_properties(data, frozenset({'UID'}))
+        _, plain = caldav_reports.prune_vevent_properties(data.replace('EXDATE:20260302\r\n', ''),
+                                                          frozenset({'UID'}))
+
+        self.assertTrue(recurring)
+        self.assertFalse(plain)
+
+
+class SyncUsersTests(SimpleTestCase):
+    """Création en masse des User depuis les comptes Baïkal"""
+
+    def setUp(self):
+        self.service = baikal_db_service.BaikalDBService(batch_size=2, application_id=7)
+        # Baïkal partagé : comptes du tenant 7 (user_id 0 à 2) et du tenant 8 (user_id 10, 11)
+        self.principals = [
+            (f'principals/u{i}@example.com'.encode(), f'u{i}@example.com', f'Prénom{i} Nom', i) for i in range(3)
+        ] + [
+            (b'principals/autre@t8.com', 'autre@t8.com', 'Autre Tenant', 10),
+            (b'principals/existant@t8.com', 'existant@t8.com', 'Existant Tenant', 11),
+            (b'principals/u0@example.com/calendar-proxy-read', None, '', None),
+        ]
+        usernames = [uri[len('principals/'):] for uri, _, _, _ in self.principals[:5]] + [b'sans-principal@t8.com']
+        self.tenant_user_ids = [0, 1, 2]
+        self.existing = []
+        self.stored = set()
+
+        for name in ('BaikalUser', 'BaikalPrincipal', 'User'):
+            patcher = mock.patch.object(baikal_db_service, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.BaikalUser.objects.values_list.return_value = usernames
+        self.BaikalPrincipal.objects.values_list.return_value = self.principals
+        self.User.side_effect = lambda **fields: mock.Mock(**fields)
+        self.User.objects.only.side_effect = lambda *fields: self.existing
+
+        def filter(email__in=None, **tenant):
+            if email__in is not None:
+                return mock.Mock(count=lambda: len(self.stored & set(email__in)))
+            self.assertEqual(tenant, {'application_id': 7, 'user_id__isnull': False})
+            return mock.Mock(values_list=lambda *fields, flat: self.tenant_user_ids)
+
+        def bulk_create(users, batch_size, ignore_conflicts):
+            self.stored.update(user.email for user in users)
+
+        self.User.objects.filter.side_effect = filter
+        self.User.objects.bulk_create.side_effect = bulk_create
+
+    def _created(self):
+        return {call.kwargs['email']: call.kwargs['application_id'] for call in self.User.call_args_list}
+
+    def test_created_users_are_counted_after_insert(self):
+        stats = self.service.sync_users_from_baikal()
+
+        self.assertEqual(stats['users_created'], 3)
+        self.assertEqual(self._created(), {f'u{i}@example.com': 7 for i in range(3)})
+
+    def test_conflicting_users_are_not_counted(self):
+        # u0 créé par un autre processus entre la lecture et l'insertion : ignoré
+        self.stored.add('u0@example.com')
+
+        stats = self.service.sync_users_from_baikal()
+
+        self.assertEqual(stats['users_created'], 2)
+        self.assertEqual(stats['errors'], [])
+
+    def test_other_tenant_accounts_are_left_alone(self):
+        same_tenant = mock.Mock(email='u1@example.com', user_id=None, application_id=7)
+        unknown_tenant = mock.Mock(email='u2@example.com', user_id=None, application_id=None)
+        other_tenant = mock.Mock(email='existant@t8.com', user_id=None, application_id=None)
+        self.existing = [same_tenant, unknown_tenant, other_tenant]
+
+        stats = self.service.sync_users_from_baikal()
+
+        # Ni création ni rattachement au tenant 7 des comptes du tenant 8
+        self.assertEqual(self._created(), {'u0@example.com': 7})
+        self.assertEqual(stats['users_updated'], 1)
+        self.User.objects.bulk_update.assert_called_once_with([same_tenant], ['user_id'], batch_size=2)
+        self.assertEqual(same_tenant.user_id, 1)
+        self.assertEqual((unknown_tenant.user_id, unknown_tenant.application_id), (None, None))
+        self.assertEqual((other_tenant.user_id, other_tenant.application_id), (None, None))
+
+    def test_without_application_all_accounts_are_read(self):
+        self.service.application_id = None
+
+        self.service.sync_users_from_baikal()
+
+        created = self._created()
+        self.assertEqual(set(created), {
+            'u0@example.com', 'u1@example.com', 'u2@example.com', 'autre@t8.com', 'existant@t8.com',
+            'sans-principal@t8.com',
+        })
+        self.assertEqual(set(created.values()), {None})
+
+
+class LoginTests(SimpleTestCase):
+    """Connexion via authenticate() et application servie depuis le cache"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def _login(self, password='secret'):
+        request = self.factory.post('/api/login/', {'email': 'user@example.com', 'password': password},
+                                    format='json')
+        return views.login(request)
+
+    def test_failed_login_goes_through_backends(self):
+        failures = []
+
+        def receiver(sender, credentials, **kwargs):
+            failures.append(credentials['username'])
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+
+        with mock.patch.object(ModelBackend, 'authenticate', return_value=None) as backend:
+            response = self._login('faux')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(backend.call_args.kwargs['username'], 'user@example.com')
+        self.assertEqual(failures, ['user@example.com'])
+
+    def test_successful_login_uses_cached_application(self):
+        user = mock.Mock(id=1, email='user@example.com', username='user@example.com', prenom='Ana',
+                         application_id=7)
+        application = {'id': 7, 'entreprise': 'ACME'}
+
+        with mock.patch.object(views, 'authenticate', return_value=user), \
+                mock.patch.object(views, 'get_application', return_value=application) as get_application, \
+                mock.patch.object(views.warmup, 'schedule'), \
+                mock.patch.object(views, 'RefreshToken'):
+            response = self._login()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['application'], application)
+        get_application.assert_called_once_with(7)
+
+
+class LabelBatchTests(SimpleTestCase):
+    """Résolution par lots des libellés client / affaire"""
+
+    def setUp(self):
+        label_cache._labels.clear()
+        self.addCleanup(label_cache._labels.clear)
+
+    def test_large_batches_are_queried_in_chunks(self):
+        with mock.patch.object(label_cache, 'Compte') as compte, \
+                mock.patch.object(label_cache, 'QUERY_CHUNK', 3):
+            compte.objects.filter.side_effect = lambda id__in, application_id: mock.Mock(
+                values=lambda *fields: [{'id': object_id, 'nom': f'Client {object_id}'} for object_id in id__in]
+            )
+            labels = label_cache.resolve_labels(7, client_ids=range(1, 8))
+
+        self.assertEqual([len(call.kwargs['id__in']) for call in compte.objects.filter.call_args_list], [3, 3, 1])
+        self.assertEqual(labels['clients'][7], {'id': 7, 'nom': 'Client 7'})
+
+    def test_batch_endpoint_rejects_oversized_batches(self):
+        request = APIRequestFactory().post('/api/client-affair-info/batch/', {
+            'client_ids': list(range(label_cache.MAX_BATCH_IDS + 1)),
+        }, format='json')
+        force_authenticate(request, user=mock.Mock(application_id=7))
+
+        with mock.patch.object(label_cache, 'resolve_labels') as resolve_labels:
+            response = baikal_views.get_client_affair_info_batch(request)
+
+        self.assertEqual(response.status_code, 400)
+        resolve_labels.assert_not_called()
+
+
+class ParsePoolTests(SimpleTestCase):
+    """Nombre de processus d'extraction iCalendar"""
+
+    @override_settings(ICAL_PARSE_PROCESSES=None)
+    def test_default_matches_settings(self):
+        for cpus, expected in ((None, 1), (1, 1), (2, 1), (8, 4)):
+            with mock.patch.object(parse_pool.os, 'cpu_count', return_value=cpus):
+                self.assertEqual(parse_pool._processes(), expected)
+
+    @override_settings(ICAL_PARSE_PROCESSES=3)
+    def test_configured_value(self):
+        self.assertEqual(parse_pool._processes(), 3)
+
+
+class ClientIndexTests(SimpleTestCase):
+    """Index préfixe des clients et rafraîchissement incrémental"""
+
+    def setUp(self):
+        patcher = mock.patch.object(client_index, 'Compte')
+        compte = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.loaded = [
+            {'id': 1, 'nom': 'Boulangerie Dupont', 'email': '', 'telephone': '', 'date_modification': None},
+            {'id': 2, 'nom': 'Garage Durand', 'email': '', 'telephone': '', 'date_modification': None},
+        ]
+        self.changed = []
+        compte.objects.filter.return_value.values.side_effect = lambda *fields: (
+            mock.Mock(iterator=lambda chunk_size: iter([dict(row) for row in self.loaded]))
+            if 'genre' not in fields else [dict(row) for row in self.changed]
+        )
+        self.index = client_index.ClientNameIndex(7)
+        self.index.ensure_fresh()
+
+    def _refresh(self, *rows):
+        self.changed = [{'email': '', 'telephone': '', 'genre': 1, 'date_modification': None, **row} for row in rows]
+        self.index._checked_at -= client_index.ClientNameIndex.REFRESH_INTERVAL
+        self.index.ensure_fresh()
+
+    def _names(self, query):
+        return [client['nom'] for client in self.index.search(query)]
+
+    def test_prefix_search(self):
+        self.assertEqual(self._names('du'), ['Boulangerie Dupont', 'Garage Durand'])
+        self.assertEqual(self._names('gar dur'), ['Garage Durand'])
+        self.assertEqual(self._names('dupond'), [])
+
+    def test_refresh_publishes_new_structures(self):
+        before = self.index._data
+
+        self._refresh({'id': 2, 'nom': 'Garage Martin'}, {'id': 3, 'nom': 'Dupuis SARL'},
+                      {'id': 1, 'nom': 'Boulangerie Dupont', 'genre': 2})
+
+        # Une recherche en cours garde la version précédente, intacte
+        self.assertEqual(before.tokens, sorted(before.tokens))
+        self.assertEqual(set(before.names), {1, 2})
+        self.assertEqual(before.clients[2]['nom'], 'Garage Durand')
+        self.assertEqual(self._names('du'), ['Dupuis SARL'])
+        self.assertEqual(self._names('martin'), ['Garage Martin'])
+        self.assertEqual(self.index.version, 2)
+
+    def test_large_refresh_rebuilds_tokens(self):
+        threshold = client_index.ClientNameIndex.INCREMENTAL_REBUILD_THRESHOLD
+        rows = [{'id': 100 + i, 'nom': f'Client {i}'} for i in range(threshold + 1)]
+
+        self._refresh(*rows)
+
+        self.assertEqual(len(self.index.search('client', limit=1000)), len(rows))
+        self.assertEqual(self._names('garage'), ['Garage Durand'])
+
+
+class CachedJWTAuthenticationTests(SimpleTestCase):
+    """Cache des utilisateurs authentifiés par jeton"""
+
+    def setUp(self):
+        authentication._users.clear()
+        self.addCleanup(authentication._users.clear)
+        self.token = {'user_id': 5, 'iat': 1700000000}
+
+    def test_each_request_gets_its_own_user(self):
+        loaded = User(id=5, email='user@example.com', application_id=7)
+        auth = authentication.CachedJWTAuthentication()
+
+        with mock.patch.object(JWTAuthentication, 'get_user', return_value=loaded) as get_user:
+            first = auth.get_user(self.token)
+            second = auth.get_user(self.token)
+
+        get_user.assert_called_once()
+        self.assertIsNot(first, second)
+        self.assertIsNot(first._state, second._state)
+        # Modification en cours dans une vue : invisible des autres requêtes
+        first.application_id = 8
+        self.assertEqual(second.application_id, 7)
+        self.assertEqual(auth.get_user(self.token).application_id, 7)
+
+    def test_save_invalidates_cached_user(self):
+        auth = authentication.CachedJWTAuthentication()
+        with mock.patch.object(JWTAuthentication, 'get_user', return_value=User(id=5)) as get_user:
+            auth.get_user(self.token)
+            authentication.invalidate_user_on_change(User, User(id=5))
+            auth.get_user(self.token)
+
+        self.assertEqual(get_user.call_count, 2)
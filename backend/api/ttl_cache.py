@@ -0,0 +1,131 @@
+"""
+Cache mémoire à durée de vie limitée, local au worker
+
+Utilisé pour les données lues fréquemment dans les bases legacy (MyClic,
+Baïkal) : chaque worker gunicorn garde sa propre copie, sans aller-retour
+réseau. get_or_set() regroupe les calculs concurrents d'une même clé : un
+seul thread interroge la base, les autres attendent son résultat.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Union
+
+_MISSING = object()
+
+
+class _InFlight:
+    """Calcul en cours partagé entre les threads demandant la même clé"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Cache LRU thread-safe avec expiration par entrée"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retourne la valeur en cache, ou default si absente/expirée"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Enregistre une valeur (ttl par défaut du cache si non précisé)"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Invalide une entrée"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate: Callable[[Hashable], bool]):
+        """Invalide toutes les entrées dont la clé satisfait predicate"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._data.clear()
+
+    def get_or_join(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Valeur en cache, ou résultat du calcul en cours de cette clé
+
+        Ne lance aucun calcul : default si la clé n'est ni en cache ni en
+        cours de calcul, ou si le calcul en cours échoue.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            inflight = self._inflight.get(key)
+        if inflight is None:
+            # Calcul terminé entre les deux lectures
+            return self.get(key, default)
+        inflight.done.wait()
+        return default if inflight.error is not None else inflight.value
+
+    def get_or_set(self, key: Hashable, compute: Callable[[], Any],
+                   ttl: Union[None, float, Callable[[Any], Optional[float]]] = None) -> Any:
+        """
+        Retourne la valeur en cache ou la calcule une seule fois
+
+        Les appels concurrents sur une même clé absente attendent le calcul
+        du premier appelant au lieu de relancer la requête.
+
+        Args:
+            ttl: Durée de vie de l'entrée, ou fonction qui la déduit de la
+                valeur calculée (None : ttl par défaut du cache)
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = _InFlight()
+                self._inflight[key] = inflight
+
+        if not owner:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            inflight.value = compute()
+            self.set(key, inflight.value, ttl(inflight.value) if callable(ttl) else ttl)
+            return inflight.value
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.done.set()
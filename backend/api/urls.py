@@ -6,6 +6,7 @@ from .views import (
     login,
     user_profile,
     UserUpdateApplicationIdView,
+    db_pool_stats,
 )
 from .baikal_views import (
     BaikalCalendarViewSet,
@@ -13,6 +14,9 @@ from .baikal_views import (
     search_affairs,
     search_clients,
     get_client_affair_info,
+    get_client_affair_info_batch,
+    get_freebusy,
+    get_bootstrap,
 )
 
 # Router pour les ViewSets Baikal
@@ -27,6 +31,9 @@ urlpatterns = [
     path('auth/token/refresh/', csrf_exempt(TokenRefreshView.as_view()), name='token_refresh'),
     path('auth/update_application_id/<str:email>/', csrf_exempt(UserUpdateApplicationIdView.as_view()), name='update_application_id'),
 
+    # Supervision
+    path('health/db-pools/', db_pool_stats, name='db-pool-stats'),
+
     # Profil utilisateur
     path('auth/profile/', csrf_exempt(user_profile), name='user_profile'),
     path('search-clients/', csrf_exempt(search_clients), name='search-clients'),
@@ -34,6 +41,13 @@ urlpatterns = [
 
     # Client et Affaire info
     path('client-affair-info/', csrf_exempt(get_client_affair_info), name='client-affair-info'),
+    path('client-affair-info/batch/', csrf_exempt(get_client_affair_info_batch), name='client-affair-info-batch'),
+
+    # Disponibilités communes (free/busy)
+    path('baikal/freebusy/', csrf_exempt(get_freebusy), name='baikal-freebusy'),
+
+    # Premier affichage : calendriers, événements et libellés en une requête
+    path('baikal/bootstrap/', csrf_exempt(get_bootstrap), name='baikal-bootstrap'),
 
     # API Baikal - Routes REST
     path('', include(router.urls)),
@@ -1,13 +1,16 @@
 from django.contrib.auth import authenticate
+from django.db import connections
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
-
+from config.mysql_pool.pool import pool_stats
+from .baikal_transport import transport_stats
+from . import warmup
 from .models import User
-from .myclic_model import Application
+from .application_cache import get_application
 from .serializers import (
     UserSerializer,
 )
@@ -24,50 +27,35 @@ def login(request):
             'error': 'Veuillez fournir un nom d\'utilisateur et un mot de passe'
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        user_for_auth = User.objects.get(email=email)
-    except User.DoesNotExist:
-        return Response({'error': 'Identifiants invalides'}, status=status.HTTP_401_UNAUTHORIZED)
-
-    user = authenticate(username=user_for_auth.username, password=password)
-
-    application = Application.objects.using("myclic").get(id=user_for_auth.application_id)
-
-    print(f"Application: {application.id} (ID: {application.entreprise}), {application}")
-
-    print(f"User for auth: {user_for_auth}")
-
-    print("User", type(user.id))
-
-    if user is not None:
-        # ✅ Plus besoin de synchronisation !
-        # Les données sont lues directement depuis MySQL Baikal
-        print(f"✅ Login réussi pour {user.username} - Accès direct MySQL Baikal")
+    # ✅ authenticate() : backends d'authentification et signal user_login_failed.
+    # USERNAME_FIELD étant l'email, ModelBackend ne lit User qu'une fois
+    user = authenticate(request, username=email, password=password)
 
-        refresh = RefreshToken.for_user(user)
-        return Response({
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'username': user.username,
-                'prenom': user.prenom,
-                'application_id': user.application_id,
-            },
-            'application': {
-                'id': application.id,
-                'entreprise': application.entreprise,
-                'adresse': application.adresse,
-                'telephone': application.telephone,
-                'mail_resp': application.mail_resp,
-            },
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
-        })
-    else:
+    if user is None:
         return Response({
             'error': 'Identifiants invalides'
         }, status=status.HTTP_401_UNAUTHORIZED)
 
+    # Colonnes projetées de l'application, servies depuis le cache par application
+    application = get_application(user.application_id)
+
+    # 🔥 Client CalDAV et événements du mois préparés pendant le chargement du frontend
+    warmup.schedule(user)
+
+    refresh = RefreshToken.for_user(user)
+    return Response({
+        'user': {
+            'id': user.id,
+            'email': user.email,
+            'username': user.username,
+            'prenom': user.prenom,
+            'application_id': user.application_id,
+        },
+        'application': application,
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    })
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -87,4 +75,18 @@ class UserUpdateApplicationIdView(generics.UpdateAPIView):
     lookup_field = 'email'
 
     def patch(self, request, *args, **kwargs):
-        return self.partial_update(request, *args, **kwargs)
\ No newline at end of file
+        return self.partial_update(request, *args, **kwargs)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request):
+    """Métriques des pools de connexions et du transport Baïkal du worker qui répond"""
+    stats = dict(pool_stats())
+    try:
+        stats['default'] = connections['default'].pool.get_stats()
+    except Exception as e:
+        stats['default'] = {'error': str(e)}
+    # Limiteur de concurrence et disjoncteur vers Baïkal
+    stats['baikal_transport'] = transport_stats()
+    return Response(stats)
@@ -0,0 +1,115 @@
+"""
+Préchargement à la connexion
+
+Après un login réussi, un thread d'arrière-plan prépare ce que le tableau de
+bord demandera en premier : client CalDAV connecté (get_pooled_client),
+calendriers CalDAV et DB, puis les événements du mois affiché dans le cache
+des fenêtres (events_cache). La première requête /api/baikal/events/ est
+alors servie depuis la mémoire du worker.
+
+Le préchargement est facultatif : un seul par utilisateur à la fois (et pas
+deux fois en WARMUP_COOLDOWN secondes), abandonné quand la file est pleine
+ou que la machine est chargée.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Tuple
+
+from django.db import connections
+
+from . import events_cache
+from .caldav_service import get_pooled_client
+from .conditional import CalendarState
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+WARMUP_WORKERS = 2
+# Préchargements en attente ou en cours au-delà desquels les nouveaux sont abandonnés
+WARMUP_MAX_PENDING = 8
+WARMUP_COOLDOWN = 300
+
+_executor = ThreadPoolExecutor(max_workers=WARMUP_WORKERS, thread_name_prefix='warmup')
+_pending = set()
+_lock = threading.Lock()
+_recent = TTLCache(ttl=WARMUP_COOLDOWN, maxsize=10000)
+
+
+def dashboard_window(today: date) -> Tuple[datetime, datetime]:
+    """
+    Fenêtre du premier chargement du tableau de bord (loadEventsForPeriod)
+
+    Du 8e jour avant le début du mois au 7 du mois suivant, en dates
+    locales à minuit, comme les paramètres start_date / end_date envoyés.
+    """
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    start = datetime.combine(month_start - timedelta(days=8), datetime.min.time())
+    end = datetime.combine(next_month + timedelta(days=6), datetime.min.time())
+    return start, end
+
+
+def system_overloaded() -> bool:
+    """Charge moyenne sur une minute supérieure au nombre de CPU"""
+    try:
+        return os.getloadavg()[0] > (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return False
+
+
+def schedule(user) -> bool:
+    """
+    Planifie le préchargement de l'utilisateur
+
+    Returns:
+        True si le préchargement a été mis en file, False s'il est inutile
+        (pas de mot de passe Baïkal, déjà fait ou en cours) ou abandonné
+    """
+    if not user.baikal_password:
+        return False
+
+    email = user.email
+    with _lock:
+        if email in _pending or _recent.get(email):
+            return False
+        if len(_pending) >= WARMUP_MAX_PENDING or system_overloaded():
+            logger.info(f"Préchargement abandonné pour {email} (charge)")
+            return False
+        _pending.add(email)
+
+    try:
+        _executor.submit(_warm, user)
+    except RuntimeError:
+        # Arrêt de l'interpréteur en cours
+        with _lock:
+            _pending.discard(email)
+        return False
+    return True
+
+
+def _warm(user):
+    email = user.email
+    started = time.perf_counter()
+    try:
+        client = get_pooled_client(user)
+        client.load_caldav_calendars()
+
+        start_date, end_date = dashboard_window(datetime.now().date())
+        state = CalendarState.load(email)
+        window = events_cache.load_events(state, lambda: client, start_date, end_date, False)
+        logger.info(
+            f"🔥 Préchargement de {email}: {len(window.events)} événement(s) "
+            f"en {time.perf_counter() - started:.2f}s"
+        )
+    except Exception as e:
+        logger.warning(f"Préchargement échoué pour {email}: {e}")
+    finally:
+        _recent.set(email, True)
+        with _lock:
+            _pending.discard(email)
+        # Rendre au pool les connexions empruntées par ce thread
+        connections.close_all()
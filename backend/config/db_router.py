@@ -1,49 +1,127 @@
+import contextvars
+import random
+
+from django.conf import settings
+
+
+# Alias dont la requête courante a écrit sur le primaire (read-your-writes).
+# Variable de contexte : suivie par les threads lancés avec
+# contextvars.copy_context().run (recherches CalDAV) ou carry_pinning.
+_pinned = contextvars.ContextVar('pinned_aliases', default=None)
+
+
+def _pinned_aliases():
+    pinned = _pinned.get()
+    if pinned is None:
+        pinned = set()
+        _pinned.set(pinned)
+    return pinned
+
+
+def pin_to_primary(alias):
+    """Force les lectures suivantes de la requête courante sur le primaire de l'alias"""
+    _pinned_aliases().add(alias)
+
+
+def reset_pinning(aliases=()):
+    """Réinitialise l'épinglage (début de requête), éventuellement pré-épinglé"""
+    _pinned.set(set(aliases))
+
+
+def pinned_aliases():
+    """Alias épinglés sur le primaire pour la requête courante"""
+    return frozenset(_pinned_aliases())
+
+
+def carry_pinning(fn):
+    """
+    Enveloppe fn pour un thread d'arrière-plan (préchargement, création
+    différée) : il part de l'épinglage de la requête qui le lance
+    """
+    aliases = pinned_aliases()
+
+    def run(*args, **kwargs):
+        token = _pinned.set(set(aliases))
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _pinned.reset(token)
+
+    return run
+
+
 class DatabaseRouter:
     """
     Router multi-DB :
     - default : PostgreSQL (users, auth, core)
     - baikal  : MySQL Baikal (read/write, no migrations)
-    - legacy  : MySQL legacy Application (read/write, no migrations)
+    - myclic  : MySQL legacy Application (read/write, no migrations)
+
+    Le routage se fait par classe de modèle (tous les modèles ont
+    app_label == 'api'). Les lectures baikal / myclic sont réparties sur les
+    réplicas déclarés dans settings.DATABASE_REPLICAS (pondérés), sauf après
+    une écriture sur l'alias dans la même requête : la requête est alors
+    épinglée sur le primaire (read-your-writes). Les écritures CalDAV
+    (PUT, DELETE...) épinglent aussi baikal (api.baikal_transport).
     """
 
-    baikal_models = { 'baikaluser', 'baikalcalendar', 'baikalcalendarinstance', 'baikalcalendarobject', 'baikalprincipal'}
-    myclic_models = {"application", "compte", "affaire"}
+    def __init__(self):
+        # Import différé : les modèles ne sont pas chargés à l'import du router
+        self._model_aliases = None
+
+    def _alias_for(self, model):
+        if self._model_aliases is None:
+            from api.baikal_models import (
+                BaikalUser, BaikalPrincipal, BaikalCalendar, BaikalCalendarInstance, BaikalCalendarObject,
+            )
+            from api.myclic_model import Application, Compte, Affaire
+
+            self._model_aliases = {
+                BaikalUser: 'baikal',
+                BaikalPrincipal: 'baikal',
+                BaikalCalendar: 'baikal',
+                BaikalCalendarInstance: 'baikal',
+                BaikalCalendarObject: 'baikal',
+                Application: 'myclic',
+                Compte: 'myclic',
+                Affaire: 'myclic',
+            }
+        model = model._meta.concrete_model
+        return self._model_aliases.get(model, 'default')
+
+    def _replica_for(self, alias):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', {}).get(alias)
+        if not replicas or alias in _pinned_aliases():
+            return alias
+        aliases, weights = zip(*replicas)
+        return random.choices(aliases, weights=weights)[0]
 
     # -------------------------
     # READ
     # -------------------------
     def db_for_read(self, model, **hints):
-        if model._meta.app_label in self.baikal_models:
-            return "baikal"
-        if model._meta.app_label in self.myclic_models:
-            return "myclic"
-        return "default"
+        return self._replica_for(self._alias_for(model))
 
     # -------------------------
     # WRITE
     # -------------------------
     def db_for_write(self, model, **hints):
-        if model._meta.app_label in self.baikal_models:
-            return "baikal"
-        if model._meta.app_label in self.myclic_models:
-            return "myclic"
-        return "default"
+        alias = self._alias_for(model)
+        if alias != 'default':
+            pin_to_primary(alias)
+        return alias
 
     # -------------------------
     # RELATIONS
     # -------------------------
     def allow_relation(self, obj1, obj2, **hints):
-        # Autoriser relations UNIQUEMENT dans la même DB
-        if obj1._state.db == obj2._state.db:
-            return True
-        return False
+        # Autoriser relations UNIQUEMENT dans la même DB (réplicas inclus)
+        return self._alias_for(obj1) == self._alias_for(obj2)
 
     # -------------------------
     # MIGRATIONS
     # -------------------------
     def allow_migrate(self, db, app_label, model_name=None, **hints):
-        # ❌ Jamais de migration sur MySQL
-        if db in {"baikal", "myclic"}:
-            return False
+        # ❌ Jamais de migration sur MySQL ni sur les réplicas
         # ✅ Migrations uniquement sur PostgreSQL
         return db == "default"
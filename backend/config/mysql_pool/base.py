@@ -0,0 +1,47 @@
+"""
+Backend MySQL de Django avec pool de connexions
+
+ENGINE = 'config.mysql_pool'
+OPTIONS = {..., 'pool': {'min_size': 1, 'max_size': 10, 'max_lifetime': 1800, 'max_idle': 300, 'timeout': 10}}
+
+La fermeture d'une connexion par Django (fin de requête, close_all() en fin
+de thread) la rend au pool au lieu de couper la session MySQL.
+"""
+from django.db.backends.mysql import base as mysql_base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+
+    def _pool_options(self):
+        return dict(self.settings_dict.get('OPTIONS', {}).get('pool') or {})
+
+    @property
+    def pool(self):
+        conn_params = self.get_connection_params()
+        return get_pool(
+            self.alias,
+            lambda: mysql_base.DatabaseWrapper.get_new_connection(self, conn_params),
+            self._pool_options(),
+        )
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # L'option 'pool' est destinée au pool, pas à MySQLdb.connect()
+        kwargs.pop('pool', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        return get_pool(
+            self.alias,
+            lambda: mysql_base.DatabaseWrapper.get_new_connection(self, conn_params),
+            self._pool_options(),
+        ).getconn()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # Une connexion devenue inutilisable n'est pas rendue au pool
+                discard = self.errors_occurred and not self.is_usable()
+                self.pool.putconn(self.connection, discard=discard)
@@ -0,0 +1,240 @@
+"""
+Pool de connexions MySQL (MySQLdb) par alias de base et par processus
+
+- min_size / max_size : connexions gardées ouvertes / plafond par worker
+- health check au checkout : ping() avant de rendre une connexion inactive
+- max_lifetime / max_idle : recyclage des connexions anciennes ou inutilisées
+- fork : un pool n'est utilisé que par le processus qui l'a créé ; un worker
+  gunicorn forké recrée le sien sans toucher aux sockets hérités
+- threads : chaque thread (ex. création en arrière-plan de bulk_create)
+  emprunte sa propre connexion et la rend à la fermeture Django
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Aucune connexion disponible dans le délai imparti"""
+
+
+class _PooledConnection:
+    __slots__ = ('connection', 'created_at', 'returned_at')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+
+
+class ConnectionPool:
+    """Pool thread-safe de connexions DB-API"""
+
+    def __init__(self, name: str, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 max_lifetime: float = 1800, max_idle: float = 300, timeout: float = 10):
+        self.name = name
+        self.pid = os.getpid()
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._checked_out: Dict[int, _PooledConnection] = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'checkouts': 0,
+            'checkout_wait_ms': 0.0,
+            'checkout_timeouts': 0,
+            'health_check_failures': 0,
+            'connections_recycled': 0,
+        }
+
+    # -------------------------
+    # Checkout / retour
+    # -------------------------
+    def getconn(self):
+        """Emprunte une connexion saine (bloque jusqu'à timeout si le pool est plein)"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            pooled = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        pooled = self._idle.pop()  # LIFO : connexion la plus récemment utilisée
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['checkout_timeouts'] += 1
+                        raise PoolTimeout(
+                            f"Pool '{self.name}': aucune connexion disponible après {self.timeout}s "
+                            f"({self._size}/{self.max_size} utilisées)"
+                        )
+                    self._cond.wait(remaining)
+
+            if pooled is None:
+                pooled = self._open()
+            elif not self._is_healthy(pooled):
+                self._discard(pooled)
+                continue
+
+            with self._cond:
+                self._checked_out[id(pooled.connection)] = pooled
+                self._stats['checkouts'] += 1
+                self._stats['checkout_wait_ms'] += (time.monotonic() - started) * 1000
+            return pooled.connection
+
+    def putconn(self, connection, discard: bool = False):
+        """Rend une connexion au pool (ou la ferme si discard / trop ancienne)"""
+        with self._cond:
+            pooled = self._checked_out.pop(id(connection), None)
+        if pooled is None:
+            # Connexion inconnue (autre processus, pool recréé) : simple fermeture
+            self._close_connection(connection)
+            return
+
+        if not discard:
+            try:
+                # Ne jamais rendre une transaction ouverte
+                connection.rollback()
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        if discard or now - pooled.created_at > self.max_lifetime:
+            if not discard:
+                self._stats['connections_recycled'] += 1
+            self._discard(pooled)
+            return
+
+        pooled.returned_at = now
+        with self._cond:
+            self._idle.append(pooled)
+            self._trim_idle(now)
+            self._cond.notify()
+
+    # -------------------------
+    # Interne
+    # -------------------------
+    def _open(self) -> _PooledConnection:
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['connections_opened'] += 1
+        return _PooledConnection(connection)
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_lifetime:
+            self._stats['connections_recycled'] += 1
+            return False
+        try:
+            pooled.connection.ping()
+            return True
+        except Exception:
+            self._stats['health_check_failures'] += 1
+            return False
+
+    def _discard(self, pooled: _PooledConnection):
+        self._close_connection(pooled.connection)
+        with self._cond:
+            self._size -= 1
+            self._stats['connections_closed'] += 1
+            self._cond.notify()
+
+    def _close_connection(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _trim_idle(self, now: float):
+        """Ferme (sous verrou) les connexions inactives au-delà de min_size et de max_idle"""
+        while len(self._idle) > self.min_size and now - self._idle[0].returned_at > self.max_idle:
+            pooled = self._idle.popleft()
+            self._size -= 1
+            self._stats['connections_closed'] += 1
+            self._close_connection(pooled.connection)
+
+    def fill(self):
+        """Ouvre les connexions jusqu'à min_size (appelé en arrière-plan à la création)"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                pooled = self._open()
+            except Exception as e:
+                logger.warning(f"Pool '{self.name}': préchauffage impossible: {e}")
+                return
+            with self._cond:
+                self._idle.appendleft(pooled)
+                self._cond.notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métriques du pool pour le worker courant"""
+        with self._cond:
+            return {
+                **self._stats,
+                'pid': self.pid,
+                'pool_size': self._size,
+                'pool_available': len(self._idle),
+                'pool_in_use': len(self._checked_out),
+                'pool_min': self.min_size,
+                'pool_max': self.max_size,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+# Pools hérités d'un processus parent : gardés référencés pour ne jamais
+# fermer (ni laisser le GC fermer) des sockets partagés avec le parent
+_inherited = []
+
+
+def get_pool(alias: str, connect: Callable[[], Any], options: Dict[str, Any]) -> ConnectionPool:
+    """Retourne le pool de l'alias pour le processus courant (créé à la demande)"""
+    pid = os.getpid()
+    pool = _pools.get(alias)
+    if pool is not None and pool.pid == pid:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is not None and pool.pid == pid:
+            return pool
+        if pool is not None:
+            _inherited.append(pool)
+
+        pool = ConnectionPool(alias, connect, **options)
+        _pools[alias] = pool
+        if pool.min_size > 0:
+            threading.Thread(target=pool.fill, name=f"db-pool-fill-{alias}", daemon=True).start()
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Métriques de tous les pools MySQL du processus courant"""
+    pid = os.getpid()
+    return {alias: pool.get_stats() for alias, pool in _pools.items() if pool.pid == pid}
@@ -42,10 +42,19 @@ CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS").split(",")
 
+# En-têtes lisibles par le frontend : validateur et fraîcheur des listes (api.events_cache)
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Stale-Age', 'X-Calendar-Fetched-At']
+
 BAIKAL_SERVER_URL = os.getenv("BAIKAL_SERVER_URL")
 if not BAIKAL_SERVER_URL:
     raise ImproperlyConfigured("BAIKAL_SERVER_URL environment variable is not set.")
 
+# Transport Baïkal (api.baikal_transport), par worker : concurrence maximale adaptée
+# selon la latence (AIMD), latence cible en secondes, délai de lecture par requête
+BAIKAL_MAX_CONCURRENCY = int(os.getenv('BAIKAL_MAX_CONCURRENCY', 16))
+BAIKAL_TARGET_LATENCY = float(os.getenv('BAIKAL_TARGET_LATENCY', 3.0))
+BAIKAL_TIMEOUT = float(os.getenv('BAIKAL_TIMEOUT', 60))
+
 
 # Application definition
 
@@ -64,11 +73,15 @@ INSTALLED_APPS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 
@@ -90,6 +103,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.DatabasePinningMiddleware',
+    'api.middleware.BaikalBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -115,6 +130,39 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Pools de connexions (par worker gunicorn) :
+# - default : pool natif Django / psycopg_pool (health check au checkout)
+# - baikal, myclic : backend config.mysql_pool (voir config/mysql_pool/pool.py)
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+DB_POOL_MAX_IDLE = int(os.getenv('DB_POOL_MAX_IDLE', 300))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+
+# Pool natif de default : extra "pool" de psycopg (voir pyproject.toml) ; sans lui,
+# Django ouvre une connexion par requête
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+DEFAULT_POOL = {
+    'min_size': DB_POOL_MIN_SIZE,
+    'max_size': DB_POOL_MAX_SIZE,
+    'max_lifetime': DB_POOL_MAX_LIFETIME,
+    'max_idle': DB_POOL_MAX_IDLE,
+    'timeout': DB_POOL_TIMEOUT,
+    'check': ConnectionPool.check_connection,
+} if ConnectionPool is not None else None
+
+MYSQL_POOL = {
+    'min_size': DB_POOL_MIN_SIZE,
+    'max_size': DB_POOL_MAX_SIZE,
+    'max_lifetime': DB_POOL_MAX_LIFETIME,
+    'max_idle': DB_POOL_MAX_IDLE,
+    'timeout': DB_POOL_TIMEOUT,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -123,9 +171,10 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT', 5432),
+        'OPTIONS': {'pool': DEFAULT_POOL} if DEFAULT_POOL else {},
     },
     'baikal': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'config.mysql_pool',
         'NAME': os.getenv('BAIKAL_DB_NAME', 'baikal'),
         'USER': os.getenv('BAIKAL_DB_USER'),
         'PASSWORD': os.getenv('BAIKAL_DB_PASSWORD'),
@@ -133,10 +182,11 @@ DATABASES = {
         'PORT': os.getenv('BAIKAL_DB_PORT', 3306),
         'OPTIONS': {
             'charset': 'utf8mb4',
+            'pool': MYSQL_POOL,
         }
     },
-'myclic': {
-        'ENGINE': 'django.db.backends.mysql',
+    'myclic': {
+        'ENGINE': 'config.mysql_pool',
         'NAME': os.getenv('MYCLIC_DB_NAME', 'baikal'),
         'USER': os.getenv('BAIKAL_DB_USER'),
         'PASSWORD': os.getenv('BAIKAL_DB_PASSWORD'),
@@ -144,11 +194,45 @@ DATABASES = {
         'PORT': os.getenv('BAIKAL_DB_PORT', 3306),
         'OPTIONS': {
             'charset': 'utf8mb4',
+            'pool': MYSQL_POOL,
         }
     }
 }
 
-# Database Router pour utiliser MySQL Baikal pour les modèles Baikal
+
+
+def _replica_settings(primary, alias, env_var):
+    """
+    Déclare les réplicas en lecture d'un alias MySQL
+    Format de la variable : "hote[:port][@poids],hote2..." (ex. "db-ro1:3306@2,db-ro2")
+    """
+    replicas = []
+    for index, spec in enumerate(filter(None, os.getenv(env_var, '').split(',')), start=1):
+        address, _, weight = spec.strip().partition('@')
+        host, _, port = address.partition(':')
+        replica_alias = f"{alias}_replica_{index}"
+        DATABASES[replica_alias] = {**primary, 'HOST': host, 'PORT': port or primary['PORT']}
+        replicas.append((replica_alias, int(weight or 1)))
+    return replicas
+
+
+DATABASE_REPLICAS = {
+    'baikal': _replica_settings(DATABASES['baikal'], 'baikal', 'BAIKAL_DB_REPLICAS'),
+    'myclic': _replica_settings(
+        DATABASES['myclic'], 'myclic',
+        'MYCLIC_DB_REPLICAS' if os.getenv('MYCLIC_DB_REPLICAS') else 'BAIKAL_DB_REPLICAS'
+    ),
+}
+
+# Durée pendant laquelle un client ayant écrit continue de lire sur le primaire
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# Extraction iCalendar des grandes fenêtres : processus par worker gunicorn (< 2 = désactivé)
+# et taille de lot minimale avant de recourir au pool (voir api.parse_pool)
+ICAL_PARSE_PROCESSES = int(os.getenv('ICAL_PARSE_PROCESSES', max((os.cpu_count() or 1) // 2, 1)))
+ICAL_PARSE_MIN_BATCH = int(os.getenv('ICAL_PARSE_MIN_BATCH', 2000))
+
+# Database Router : routage par modèle (Baikal -> baikal, MyClic -> myclic) et réplicas
 DATABASE_ROUTERS = ['config.db_router.DatabaseRouter']
 
 
@@ -5,7 +5,7 @@ import { useRouter } from 'next/navigation';
 import { useAppDispatch, useAppSelector } from '@/store/hooks';
 import { logout } from '@/store/authSlice';
 import {
-  fetchCalendars,
+  fetchBootstrap,
   fetchEvents,
   fetchAllGroupEvents,
   fetchAllCalendars,
@@ -21,6 +21,7 @@ import { Calendar as CalendarIcon, LogOut, Plus } from 'lucide-react';
 import Calendar from '@/components/Calendar';
 import TaskModal from '@/components/TaskModal';
 import { Task, ViewMode } from '@/lib/types';
+import { baikalAPI } from '@/lib/api';
 import {format} from "date-fns";
 
 // Helper pour parser les dates ISO locales sans conversion timezone
@@ -78,6 +79,16 @@ const addMinutesLocal = (date: Date, minutes: number): Date => {
   return result;
 };
 
+// Événement d'une liste allégée (detail=summary) : charger sa description avant de
+// l'éditer ou de le copier (par identifiant, puis par URL CalDAV si l'id n'est pas résolu)
+const withDescription = async (task: Task): Promise<Task> => {
+  if (task.description !== null) {
+    return task;
+  }
+  const response = await baikalAPI.getEvent(task.id, task.url);
+  return { ...task, description: response.data.description || '' };
+};
+
 // ✅ Helper pour formater les dates en local SANS conversion timezone
 const formatLocalDateTime = (date: Date): string => {
   const year = date.getFullYear();
@@ -144,14 +155,19 @@ export default function DashboardPage() {
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, [isCalendarDropdownOpen]);
 
-  // Charger les calendriers UNE SEULE FOIS au montage
+  // Charger les calendriers et les événements du mois UNE SEULE FOIS au montage (une requête)
   useEffect(() => {
     if (user && !calendarsLoaded.current) {
       calendarsLoaded.current = true;
-      console.log('📅 Chargement initial des calendriers');
-      dispatch(fetchCalendars(false)); // ✅ Utilise le cache automatiquement
+      console.log('📅 Chargement initial des calendriers et des événements');
+      const year = currentDate.getFullYear();
+      const month = currentDate.getMonth();
+      dispatch(fetchBootstrap({
+        start_date: formatLocalDate(new Date(year, month, -7)),
+        end_date: formatLocalDate(new Date(year, month + 1, 7))
+      }));
     }
-  }, [user, dispatch]);
+  }, [user, currentDate, dispatch]);
 
   // Charger TOUS les calendriers en arrière-plan après le chargement initial
   useEffect(() => {
@@ -256,13 +272,16 @@ export default function DashboardPage() {
   }, [isNavigating, loadEventsForPeriod]);
 
   // Charger les événements pour la période visible au montage initial uniquement
+  // (en mode personnel, le bootstrap les a déjà chargés avec les calendriers)
   const initialLoadDone = useRef(false);
   useEffect(() => {
     if (user && !initialLoadDone.current) {
       initialLoadDone.current = true;
-      loadEventsForPeriod(currentDate);
+      if (mainViewMode === 'group') {
+        loadEventsForPeriod(currentDate);
+      }
     }
-  }, [user, currentDate, loadEventsForPeriod]);
+  }, [user, currentDate, mainViewMode, loadEventsForPeriod]);
 
   // Sélectionner les événements à utiliser selon le mode et filtrer par date visible
   const eventsToUse = useMemo(() => {
@@ -401,10 +420,18 @@ export default function DashboardPage() {
     }
   }, [handleDeleteTask]);
 
-  const handleTaskClick = useCallback((task: Task) => {
+  const handleTaskClick = useCallback(async (task: Task) => {
     // ✅ D'abord fermer le modal pour réinitialiser l'état
     setIsModalOpen(false);
 
+    try {
+      task = await withDescription(task);
+    } catch (error) {
+      // Sans description, un enregistrement l'effacerait : ne pas ouvrir le modal
+      console.error('❌ Impossible de charger la description de l\'événement:', error);
+      return;
+    }
+
     // ✅ Utiliser un micro-délai pour s'assurer que l'état est bien réinitialisé
     setTimeout(() => {
       setModalInitialDate(undefined);
@@ -462,6 +489,9 @@ export default function DashboardPage() {
     try {
       console.log('📋 Duplication de l\'événement:', task.title);
 
+      // Copier la description complète (absente des listes allégées)
+      task = await withDescription(task);
+
       // Parser les dates de l'événement original
       const originalStartDate = parseLocalDate(task.start_date);
       const originalEndDate = parseLocalDate(task.end_date);
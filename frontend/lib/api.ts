@@ -78,11 +78,17 @@ export const baikalAPI = {
     updateCalendar: (calendarId: number, data: Partial<CalendarSource>) =>
         api.patch(`/baikal/calendars/${calendarId}/`, data),
 
-    getEvents: (params?: { start_date?: string; end_date?: string; include_all?: boolean }) =>
+    // detail 'summary' : liste allégée, description à null (chargée via getEvent)
+    getEvents: (params?: { start_date?: string; end_date?: string; include_all?: boolean; with_labels?: boolean; detail?: 'summary' | 'full' }) =>
         api.get('/baikal/events/', {params}),
 
-    // Récupérer un événement spécifique
-    getEvent: (eventId: number) => api.get(`/baikal/events/${eventId}/`),
+    // Premier affichage : calendriers, événements et libellés en une requête
+    getBootstrap: (params: { start_date: string; end_date: string }) =>
+        api.get('/baikal/bootstrap/', {params}),
+
+    // Récupérer un événement spécifique (url : repli si l'identifiant n'est pas résolu)
+    getEvent: (eventId: number | string, url?: string) =>
+        api.get(`/baikal/events/${eventId}/`, {params: url ? {url} : undefined}),
 
     // Créer un événement
     createEvent: (data: Partial<Task>) => api.post('/baikal/events/', data),
@@ -196,6 +202,22 @@ export const baikalAPI = {
                 ...(affairId && { affair_id: affairId })
             }
         }),
+
+    // Récupérer en un seul appel les libellés de plusieurs clients et affaires
+    getClientAffairInfoBatch: (pairs: Array<{ client_id?: number; affair_id?: number }>) =>
+        api.post('/client-affair-info/batch/', { pairs }),
+
+    // Disponibilités communes de plusieurs calendriers / collègues
+    getFreeBusy: (params: {
+        start: string;
+        end: string;
+        calendar_ids?: number[];
+        user_emails?: string[];
+        duration?: number;
+        day_start?: string;
+        day_end?: string;
+        weekdays?: number[];
+    }) => api.post('/baikal/freebusy/', params),
 };
 
 export default api;
@@ -34,7 +34,7 @@ export interface CalendarSource {
 export interface Task {
     id: string;
     title: string;
-    description: string;
+    description: string | null; // null : non chargée (liste detail=summary)
     location?: string;
     start_date: string;
     end_date: string;
@@ -139,6 +139,25 @@ export const fetchEvents = createAsyncThunk(
     }
 );
 
+// Premier affichage : calendriers et événements de la période en une seule requête
+export const fetchBootstrap = createAsyncThunk(
+    'calendar/fetchBootstrap',
+    async (params: { start_date: string; end_date: string }, {rejectWithValue}) => {
+        try {
+            console.log(`🔄 [Bootstrap] Calendriers et événements pour ${params.start_date} à ${params.end_date}`);
+            const response = await baikalAPI.getBootstrap(params);
+            return {
+                calendars: response.data.calendars as CalendarSource[],
+                events: response.data.events as Task[],
+                range: { start: params.start_date, end: params.end_date },
+            };
+        } catch (error: unknown) {
+            const err = error as { response?: { data?: unknown } };
+            return rejectWithValue(err.response?.data || 'Erreur lors du chargement initial');
+        }
+    }
+);
+
 // Récupérer TOUS les événements de TOUS les calendriers (pour le mode groupe)
 export const fetchAllGroupEvents = createAsyncThunk(
     'calendar/fetchAllGroupEvents',
@@ -156,7 +175,8 @@ export const fetchAllGroupEvents = createAsyncThunk(
             const response = await baikalAPI.getEvents({
                 start_date: params.start_date,
                 end_date: params.end_date,
-                include_all: true  // ✅ Récupérer TOUS les calendriers sans filtre display
+                include_all: true,  // ✅ Récupérer TOUS les calendriers sans filtre display
+                detail: 'summary'  // Vue groupe : sans description (chargée à l'ouverture)
             });
 
             return {
@@ -180,7 +200,8 @@ export const fetchAllEventsBackground = createAsyncThunk(
             const response = await baikalAPI.getEvents({
                 start_date: params.start_date,
                 end_date: params.end_date,
-                include_all: true  // ✅ Récupérer TOUS les calendriers sans filtre display
+                include_all: true,  // ✅ Récupérer TOUS les calendriers sans filtre display
+                detail: 'summary'  // Vue groupe : sans description (chargée à l'ouverture)
             });
 
             return response.data;
@@ -454,6 +475,31 @@ const calendarSlice = createSlice({
             state.error = action.payload as string;
         });
 
+        // Bootstrap (calendriers + événements de la période)
+        builder.addCase(fetchBootstrap.pending, (state) => {
+            state.loading = true;
+            state.eventsLoading = true;
+            state.error = null;
+        });
+        builder.addCase(fetchBootstrap.fulfilled, (state, action) => {
+            state.loading = false;
+            state.eventsLoading = false;
+            state.calendars = action.payload.calendars;
+
+            const existingIds = new Set(state.events.map(e => e.id));
+            const eventsToAdd = action.payload.events.filter(e => !existingIds.has(e.id));
+            state.events = [...state.events, ...eventsToAdd];
+            state.loadedRanges = mergeRanges(state.loadedRanges, action.payload.range);
+            state.lastFetch = Date.now();
+
+            console.log(`✅ [Bootstrap] ${action.payload.calendars.length} calendriers, ${eventsToAdd.length} événements`);
+        });
+        builder.addCase(fetchBootstrap.rejected, (state, action) => {
+            state.loading = false;
+            state.eventsLoading = false;
+            state.error = action.payload as string;
+        });
+
         // Fetch événements
         builder.addCase(fetchEvents.pending, (state) => {
             state.eventsLoading = true;